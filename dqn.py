@@ -1,5 +1,6 @@
 from collections import deque
 import random
+import sys
 import time
 
 
@@ -49,9 +50,8 @@ class DQN:
     def __init__(self, env: gym.Env) -> None:
         self.env = env
 
-        flattened_obs = env.unwrapped.flatten_observation_space()
-
-        self.num_states = flattened_obs.shape[0]
+        # Flat observations, see game/RiskEnv-Flat-V0
+        self.num_states = env.observation_space.shape[0]
         self.num_actions = env.action_space.n
 
         self.memory = ReplayMemory(self.replay_memory_size)
@@ -74,24 +74,21 @@ class DQN:
         model.compile(optimizer=self.optimizer, loss=self.loss_function)
         return model
 
-    def select_action(self, state, episode_nb):
-        valid_actions = self.env.unwrapped.get_masked_action_space()
-        logger.debug(f"Valid actions: {valid_actions}")
-        if episode_nb < self.start_decay:
-            action = np.random.choice(valid_actions)
-        elif np.random.random() < self.epsilon:
-            action = np.random.choice(valid_actions)
+    def select_action(self, state, action_mask, episode_nb):
+        """
+        action_mask: info["action_mask"] of the env, bool (num_actions,)
+        """
+        logger.debug("Mask: {}", action_mask)
+        if episode_nb < self.start_decay or np.random.random() < self.epsilon:
+            action = np.random.choice(np.flatnonzero(action_mask))
         else:
             q_values = self.target_dqn.predict(state.reshape(1, -1), verbose=0)
-            logger.debug(f"Q_values: {q_values}")
-            mask = np.zeros(self.num_actions, dtype=int)
-            mask[valid_actions] = 1
-            logger.debug(f"Mask: {mask}")
+            logger.debug("Q_values: {}", q_values)
 
-            valid_q_values = np.where(mask == 1, q_values, -np.inf)
-            logger.debug(f"Valid_q_values: {valid_q_values}")
-            action = np.argmax(valid_q_values[0])
-            logger.debug(f"Selected action: {action}")
+            valid_q_values = np.where(action_mask, q_values[0], -np.inf)
+            logger.debug("Valid_q_values: {}", valid_q_values)
+            action = np.argmax(valid_q_values)
+            logger.debug("Selected action: {}", action)
 
         return action
 
@@ -138,12 +135,13 @@ class DQN:
             episode_reward = 0
 
             logger.info(f"Simulating episode {i}, epsilon={self.epsilon}")
-            state = self.env.reset()[0]
+            state, info = self.env.reset()
 
             # Because on super small maps 1v1 sometimes random player can win turn 1
             while self.env.unwrapped.game.is_game_over():
-                state = self.env.reset()[0]
-            state = self.env.unwrapped.flatten_obs(state)
+                state, info = self.env.reset()
+            # The env reuses its observation buffer
+            state = state.copy()
 
             terminated = False  # True when agent reach the target
             truncated = False  # True when agent takes too long
@@ -152,11 +150,11 @@ class DQN:
 
             while not terminated and not truncated:
 
-                action = self.select_action(state, i)
+                action = self.select_action(state, info["action_mask"], i)
                 # Inference might take up to 0.05s
 
-                new_state, reward, terminated, truncated, _ = env.step(action)
-                new_state = self.env.unwrapped.flatten_obs(new_state)
+                new_state, reward, terminated, truncated, info = env.step(action)
+                new_state = new_state.copy()
 
                 self.memory.append((state, action, new_state, reward, terminated))
 
@@ -256,10 +254,14 @@ class DQN:
 
 
 if __name__ == "__main__":
+    # The game itself logs nothing, see game/events.py to trace it
+    logger.remove()
+    logger.add(sys.stdout, level="INFO")
+
     p1 = Player_Random("p1")
     p2 = Player_RL("p2")
     game = Game("test_map_v0", [p1, p2])
 
-    env = gym.make("game/RiskEnv-V0", game=game, agent_player=p2, render_mode=None)
+    env = gym.make("game/RiskEnv-Flat-V0", game=game, agent_player=p2, render_mode=None)
     RL_bot = DQN(env)
     RL_bot.train(300)
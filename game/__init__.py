@@ -5,3 +5,11 @@ register(
     entry_point="game.custom_risk_env_v0:RiskEnv_Choice_is_attack_territory",
     max_episode_steps=100,
 )
+
+# Same env, observations are directly the flat vector of flatten_obs
+register(
+    id="game/RiskEnv-Flat-V0",
+    entry_point="game.custom_risk_env_v0:RiskEnv_Choice_is_attack_territory",
+    max_episode_steps=100,
+    kwargs={"flat_obs": True},
+)
@@ -0,0 +1,90 @@
+"""
+Typed actions, played with Game.apply_action(action) by the active player in its phase.
+Reversible actions: Game.apply(action) returns a Delta that Game.undo(delta) reverts.
+Deltas only hold what the action touched, for depth first tree search without copying the board.
+"""
+
+from dataclasses import dataclass
+
+from game.state import NO_OWNER
+
+
+@dataclass(frozen=True, slots=True)
+class Deploy:
+    territory_id: int
+    troops: int
+
+
+@dataclass(frozen=True, slots=True)
+class TradeCards:
+    """
+    cards: per type counts of the set, see game/cards.py
+    """
+
+    cards: tuple
+
+
+@dataclass(frozen=True, slots=True)
+class Attack:
+    """
+    blitz: roll until one side runs out of troops, attack_dice_nb then caps the dices of each roll
+    move: troops moved into the target on conquest, all but 1 if None.
+        Must be between 1 and the source troops - 1 before the attack, then it's clamped to what the rolls
+        leave: at least the dices of the last roll, at most all but 1
+    """
+
+    source_id: int
+    target_id: int
+    attack_dice_nb: int = 3
+    blitz: bool = True
+    move: int = None
+
+
+@dataclass(frozen=True, slots=True)
+class Fortify:
+    source_id: int
+    target_id: int
+    troops: int
+
+
+@dataclass(frozen=True, slots=True)
+class EndPhase:
+    pass
+
+
+@dataclass(slots=True)
+class ActionResult:
+    action: object
+    game_phase: str = None  # phase after the action
+    # Outcome of an attack
+    attack_remaining: int = 0
+    defender_remaining: int = 0
+    attack_dice_nb: int = 0  # dices of the last roll
+    conquered: bool = False
+    eliminated: bool = False
+    game_over: bool = False
+
+
+@dataclass(slots=True)
+class Delta:
+    action: object
+    player_id: int
+    # Touched territories & their troops before the action
+    territory_ids: tuple
+    troops: tuple
+    # Random stream before the action: bit generator state, or DicePool state
+    rng_state: object
+    # Outcome of an attack
+    attack_remaining: int = 0
+    defender_remaining: int = 0
+    # Owner of the target before it got conquered, NO_OWNER if it wasn't
+    previous_owner: int = NO_OWNER
+    # Position of the target in the previous owner's controlled_territories
+    previous_position: int = -1
+    eliminated: bool = False
+    # Hand of the defender before the action
+    defender_cards: tuple = None
+
+    @property
+    def conquered(self):
+        return self.previous_owner != NO_OWNER
@@ -0,0 +1,402 @@
+"""
+Plays N independent games in lockstep, over (N, T) arrays, for policy evaluation at scale:
+
+    batch = BatchedGame("test_map_v0", 10_000, policies=["heuristic", "random"], seed=0)
+    winners = batch.run()
+    print(batch.win_rates())
+
+Draft & attack follow Game (draft income, blitz or single rolls, all troops but 1 move on conquest),
+but the players are array kernels instead of Player objects, see DRAFT_POLICIES & ATTACK_POLICIES.
+Not played here, so games differ from Game's:
+    . no fortify phase, turns end after the attack phase
+    . no territory cards: no draws on conquest, no trade-ins, and deployment_troops has no card income
+"""
+
+import numpy as np
+
+from game.map import load_map_topology
+from game.dice_rolls import MAX_ATTACK_DICES
+from game.kernels import get_kernels, roll_battles
+from game.rng import make_rng
+
+NO_WINNER = -1
+
+
+def draft_random(batch, rows, player_ids, income):
+    """
+    Like Player_Random: random chunks of the remaining troops on random owned territories
+    """
+    remaining = income.copy()
+    owned = batch.owners[rows] == player_ids[:, None]
+    while True:
+        deploying = remaining > 0
+        if not deploying.any():
+            return
+        sub = np.flatnonzero(deploying)
+        chunk = np.where(
+            remaining[sub] == 1,
+            1,
+            batch.rng.integers(1, np.maximum(remaining[sub], 2)),
+        )
+        territory = _random_choice(batch.rng, owned[sub])
+        batch.troops[rows[sub], territory] += chunk
+        remaining[sub] -= chunk
+
+
+def draft_heuristic(batch, rows, player_ids, income):
+    """
+    Everything on the strongest territory that has an enemy neighbor
+    """
+    frontier = batch.enemy_neighbors(rows, player_ids)
+    troops = np.where(frontier, batch.troops[rows], -1)
+    batch.troops[rows, troops.argmax(axis=1)] += income
+
+
+def attack_random(batch, rows, player_ids, valid_edges):
+    """
+    Like Player_Random: keeps attacking half of the time, from a random attacker to a random target,
+    with a random number of dices, blitz half of the time.
+    Returns tuple of arrays (n,): (edge, -1 to stop attacking; attack dices; blitz)
+    """
+    rng = batch.rng
+    n = len(rows)
+    # Territories with at least one valid edge. CSR edges are grouped by source
+    sources = batch.edges_to_territories(valid_edges)
+    attacker = _random_choice(rng, sources)
+    from_attacker = valid_edges & (batch.edge_sources == attacker[:, None])
+    edge = _random_choice(rng, from_attacker)
+
+    stop = ~valid_edges.any(axis=1) | (rng.integers(2, size=n) == 0)
+    edge[stop] = -1
+    dices = rng.integers(1, MAX_ATTACK_DICES + 1, size=n)
+    blitz = rng.integers(2, size=n).astype(np.bool_)
+    return edge, dices, blitz
+
+
+def attack_heuristic(batch, rows, player_ids, valid_edges):
+    """
+    Blitz from the edge with the largest troops advantage, as long as it's at least 2
+    """
+    advantage = (
+        batch.troops[rows][:, batch.edge_sources]
+        - batch.troops[rows][:, batch.edge_targets]
+    )
+    advantage = np.where(valid_edges, advantage, np.iinfo(np.int64).min)
+    edge = advantage.argmax(axis=1)
+    edge[advantage[np.arange(len(rows)), edge] < 2] = -1
+    n = len(rows)
+    return edge, np.full(n, MAX_ATTACK_DICES), np.ones(n, dtype=np.bool_)
+
+
+DRAFT_POLICIES = {"random": draft_random, "heuristic": draft_heuristic}
+ATTACK_POLICIES = {"random": attack_random, "heuristic": attack_heuristic}
+POLICIES = tuple(DRAFT_POLICIES)
+
+
+def _random_choice(rng, mask):
+    """
+    (n,) index of a uniformly chosen True of each row of mask (n, k). Rows must have one
+    """
+    keys = rng.random(mask.shape)
+    keys[~mask] = -1.0
+    return keys.argmax(axis=1)
+
+
+class BatchedGame:
+    """
+    State of game g:
+        . troops[g], owners[g]: (T,) like GameState
+        . order[g]: (P,) player ids in playing order, active[g] index of the active player in it
+        . dead[g]: (P,) eliminated players
+        . done[g], winner[g] (NO_WINNER until the game ends)
+    policies: one name of POLICIES for every player, or one per player id
+    backend: "python", "numba" or "auto" for the inner loops, see game/kernels.py. Same results either way
+    No fortify & no cards, see the module docstring
+    """
+
+    def __init__(
+        self,
+        map_name: str,
+        num_games: int,
+        num_players: int = 2,
+        policies="random",
+        seed=None,
+        max_attacks_per_turn: int = 100,
+        backend: str = "auto",
+    ) -> None:
+        topology = load_map_topology(map_name)
+        if num_players > topology.max_players:
+            raise ValueError(
+                f"Maximum number of players for this map is {topology.max_players}"
+            )
+        if isinstance(policies, str):
+            policies = [policies] * num_players
+        if len(policies) != num_players:
+            raise ValueError(f"Expected {num_players} policies, got {len(policies)}")
+        for policy in policies:
+            if policy not in POLICIES:
+                raise ValueError(f"Unknown policy {policy}. Use one of {POLICIES}")
+
+        self.topology = topology
+        self.num_games = num_games
+        self.num_players = num_players
+        self.policies = list(policies)
+        self.max_attacks_per_turn = max_attacks_per_turn
+        self.kernels = get_kernels(backend)
+
+        self.num_territories = topology.num_territories
+        self.adjacency_indptr = topology.adjacency_indptr
+        self.edge_sources = np.repeat(
+            np.arange(self.num_territories), np.diff(topology.adjacency_indptr)
+        )
+        self.edge_targets = np.asarray(topology.adjacency_indices)
+        self._has_edges = np.diff(topology.adjacency_indptr) > 0
+        self.territory_continents = topology.territory_continents
+        self.continent_sizes = topology.continent_sizes
+        self.continent_rewards = np.asarray(topology.continent_rewards)
+
+        shape = (num_games, self.num_territories)
+        self.troops = np.zeros(shape, dtype=np.int64)
+        self.owners = np.zeros(shape, dtype=np.int64)
+        self.order = np.zeros((num_games, num_players), dtype=np.int64)
+        self.active = np.zeros(num_games, dtype=np.int64)
+        self.dead = np.zeros((num_games, num_players), dtype=np.bool_)
+        self.done = np.zeros(num_games, dtype=np.bool_)
+        self.winner = np.full(num_games, NO_WINNER, dtype=np.int64)
+        self.turn_number = np.zeros(num_games, dtype=np.int64)
+        self.seed(seed)
+        self.reset()
+
+    def seed(self, seed=None):
+        self.rng = make_rng(seed)
+
+    def reset(self, seed=None, rows=None):
+        """
+        Same setup as Game.init_players, in every game: shuffled order, territories dealt
+        in turn with 1 troop, then the starting troops left put one by one at random
+        rows: games to reset, all of them if None
+        """
+        if seed is not None:
+            self.seed(seed)
+        if rows is None:
+            rows = np.arange(self.num_games)
+        rng = self.rng
+        n, t, p = len(rows), self.num_territories, self.num_players
+        games = np.arange(n)
+
+        order = rng.random((n, p)).argsort(axis=1)
+        self.order[rows] = order
+        # The k-th territory dealt goes to the (k % p)-th player in order
+        dealt = rng.random((n, t)).argsort(axis=1)
+        owners = np.empty((n, t), dtype=np.int64)
+        owners[games[:, None], dealt] = order[:, np.arange(t) % p]
+        troops = np.ones((n, t), dtype=np.int64)
+
+        starting_troops = 40 - (p - 2) * 5
+        counts = self.territory_counts(rows, owners)
+        remaining = np.maximum(starting_troops - counts, 0)
+        # Owned territories of each player, grouped: player j's are by_owner[g, starts[g, j]:starts[g, j + 1]]
+        by_owner = owners.argsort(axis=1, kind="stable")
+        starts = np.zeros_like(counts)
+        starts[:, 1:] = np.cumsum(counts, axis=1)[:, :-1]
+        picks = (
+            rng.random((n, p, max(int(remaining.max(initial=0)), 1)))
+            * counts[:, :, None]
+        ).astype(np.int64) + starts[:, :, None]
+        placed = np.arange(picks.shape[2]) < remaining[:, :, None]
+        game_idx = np.broadcast_to(games[:, None, None], picks.shape)[placed]
+        territory_idx = by_owner[game_idx, picks[placed]]
+        np.add.at(troops, (game_idx, territory_idx), 1)
+        self.owners[rows] = owners
+        self.troops[rows] = troops
+
+        self.active[rows] = 0
+        self.dead[rows] = False
+        self.done[rows] = False
+        self.winner[rows] = NO_WINNER
+        self.turn_number[rows] = 0
+
+    @property
+    def active_players(self):
+        return self.order[np.arange(self.num_games), self.active]
+
+    def territory_counts(self, rows=None, owners=None):
+        """
+        (n, P) number of territories of each player
+        owners: (n, T) to count instead of the games' owners
+        """
+        if owners is None:
+            owners = self.owners if rows is None else self.owners[rows]
+        n = len(owners)
+        flat = (np.arange(n)[:, None] * self.num_players + owners).ravel()
+        return np.bincount(flat, minlength=n * self.num_players).reshape(
+            n, self.num_players
+        )
+
+    def deployment_troops(self, rows, player_ids):
+        """
+        Same as Game.get_deployment_troops, without cards
+        """
+        return self.kernels.deployment_income(
+            self.owners[rows],
+            player_ids,
+            self.territory_continents,
+            self.continent_sizes,
+            self.continent_rewards,
+        )
+
+    def edges_to_territories(self, edges):
+        """
+        (n, E) bool over edges -> (n, T) bool, True where any edge starting from the territory is
+        """
+        result = np.logical_or.reduceat(edges, self.adjacency_indptr[:-1], axis=1)
+        return result & self._has_edges
+
+    def enemy_neighbors(self, rows, player_ids):
+        """
+        (n, T) owned territories with at least one enemy neighbor
+        """
+        owners = self.owners[rows]
+        enemy_edges = (owners[:, self.edge_sources] == player_ids[:, None]) & (
+            owners[:, self.edge_targets] != player_ids[:, None]
+        )
+        return self.edges_to_territories(enemy_edges)
+
+    def valid_attacks(self, rows, player_ids):
+        """
+        (n, E) edges the players can attack along: owned source with more than 1 troop, enemy target
+        """
+        owners = self.owners[rows]
+        return (
+            (owners[:, self.edge_sources] == player_ids[:, None])
+            & (self.troops[rows][:, self.edge_sources] > 1)
+            & (owners[:, self.edge_targets] != player_ids[:, None])
+        )
+
+    def _by_policy(self, rows, player_ids):
+        """
+        Yields (policy name, mask over rows) for the policies of the active players.
+        Sorted, so random draws happen in the same order from one run to the next
+        """
+        policies = sorted(set(self.policies))
+        if len(policies) == 1:
+            yield policies[0], np.ones(len(rows), dtype=np.bool_)
+            return
+        for policy in policies:
+            mask = np.isin(
+                player_ids, [i for i, p in enumerate(self.policies) if p == policy]
+            )
+            if mask.any():
+                yield policy, mask
+
+    def draft(self, rows):
+        player_ids = self.active_players[rows]
+        income = self.deployment_troops(rows, player_ids)
+        for policy, mask in self._by_policy(rows, player_ids):
+            DRAFT_POLICIES[policy](self, rows[mask], player_ids[mask], income[mask])
+
+    def attack(self, rows):
+        """
+        Attack phase of the active players, until every one of them stops or runs out of attacks
+        """
+        attacking = rows
+        for _ in range(self.max_attacks_per_turn):
+            if len(attacking) == 0:
+                return
+            player_ids = self.active_players[attacking]
+            valid_edges = self.valid_attacks(attacking, player_ids)
+
+            edge = np.full(len(attacking), -1)
+            dices = np.zeros(len(attacking), dtype=np.int64)
+            blitz = np.zeros(len(attacking), dtype=np.bool_)
+            for policy, mask in self._by_policy(attacking, player_ids):
+                edge[mask], dices[mask], blitz[mask] = ATTACK_POLICIES[policy](
+                    self, attacking[mask], player_ids[mask], valid_edges[mask]
+                )
+
+            going = edge >= 0
+            attacking, player_ids, edge = (
+                attacking[going],
+                player_ids[going],
+                edge[going],
+            )
+            self.resolve_attacks(
+                attacking, player_ids, edge, dices[going], blitz[going]
+            )
+            attacking = attacking[~self.done[attacking]]
+
+    def resolve_attacks(self, rows, player_ids, edge, dices, blitz):
+        """
+        One attack per game: a single roll, or rolls until one side can't go on for blitz.
+        Conquest moves all troops but 1, a player losing its last territory is eliminated
+        """
+        source = self.edge_sources[edge]
+        target = self.edge_targets[edge]
+        attack_troops = self.troops[rows, source]
+        defend_troops = self.troops[rows, target]
+
+        roll_battles(attack_troops, defend_troops, dices, blitz, self.rng, self.kernels)
+
+        conquered = defend_troops == 0
+        defenders = self.owners[rows, target]
+        self.troops[rows, source] = np.where(conquered, 1, attack_troops)
+        self.troops[rows, target] = np.where(
+            conquered, attack_troops - 1, defend_troops
+        )
+        self.owners[rows[conquered], target[conquered]] = player_ids[conquered]
+
+        rows, defenders = rows[conquered], defenders[conquered]
+        if len(rows) == 0:
+            return
+        eliminated = ~(self.owners[rows] == defenders[:, None]).any(axis=1)
+        self.dead[rows[eliminated], defenders[eliminated]] = True
+
+        over = rows[(~self.dead[rows]).sum(axis=1) == 1]
+        self.done[over] = True
+        self.winner[over] = (~self.dead[over]).argmax(axis=1)
+
+    def next_turn(self, rows):
+        """
+        Hands over to the next player alive, in playing order
+        """
+        previous = self.active[rows]
+        active = previous.copy()
+        pending = np.ones(len(rows), dtype=np.bool_)
+        for _ in range(self.num_players):
+            active[pending] = (active[pending] + 1) % self.num_players
+            pending = self.dead[rows, self.order[rows, active]]
+            if not pending.any():
+                break
+        self.active[rows] = active
+        self.turn_number[rows] += active <= previous
+
+    def play_turn(self):
+        """
+        Draft & attack for the active player of every running game
+        """
+        rows = np.flatnonzero(~self.done)
+        if len(rows) == 0:
+            return
+        self.draft(rows)
+        self.attack(rows)
+        rows = rows[~self.done[rows]]
+        self.next_turn(rows)
+
+    def run(self, max_turns: int = 1000):
+        """
+        Plays until every game is over, or max_turns rounds
+        Returns array (N,): winner id of each game, NO_WINNER if unfinished
+        """
+        while not self.done.all():
+            self.play_turn()
+            if self.turn_number[~self.done].min(initial=max_turns) >= max_turns:
+                break
+        return self.winner
+
+    def win_rates(self):
+        """
+        (P,) fraction of the games won by each player
+        """
+        return np.bincount(
+            self.winner[self.winner != NO_WINNER], minlength=self.num_players
+        ) / max(self.num_games, 1)
@@ -0,0 +1,142 @@
+"""
+Territory cards. Cards are only told apart by their type, so hands & the deck are per type counts:
+    hand[INFANTRY], hand[CAVALRY], hand[ARTILLERY], hand[WILD]
+
+A set is 3 cards of a type or 1 of each, wilds standing for any type.
+The best set of a hand is a table lookup (see best_set), over the hands capped at what a set can use.
+"""
+
+import numpy as np
+
+INFANTRY = 0
+CAVALRY = 1
+ARTILLERY = 2
+WILD = 3
+NUM_CARD_TYPES = 4
+CARD_TYPE_NAMES = ("infantry", "cavalry", "artillery", "wild")
+
+WILD_CARDS = 2
+# Troops of the n-th set traded in the game, then 5 more for each set
+TRADE_IN_BONUSES = (4, 6, 8, 10, 12, 15)
+# Hand size from which a set has to be traded before deploying
+MUST_TRADE_CARDS = 5
+
+
+# Every set as per type counts, the ones using the fewest wilds first
+CARD_SETS = (
+    (3, 0, 0, 0),
+    (0, 3, 0, 0),
+    (0, 0, 3, 0),
+    (1, 1, 1, 0),
+    (2, 0, 0, 1),
+    (0, 2, 0, 1),
+    (0, 0, 2, 1),
+    (0, 1, 1, 1),
+    (1, 0, 1, 1),
+    (1, 1, 0, 1),
+    (1, 0, 0, 2),
+    (0, 1, 0, 2),
+    (0, 0, 1, 2),
+)
+_CAPS = (3, 3, 3, WILD_CARDS)
+
+
+def _hand_index(hand):
+    infantry, cavalry, artillery, wild = hand
+    index = (min(infantry, 3) * 4 + min(cavalry, 3)) * 4 + min(artillery, 3)
+    return index * 3 + min(wild, WILD_CARDS)
+
+
+def _build_best_sets():
+    table = np.full(4 * 4 * 4 * 3, -1, dtype=np.int64)
+    for hand in np.ndindex(*(c + 1 for c in _CAPS)):
+        for i, cards in enumerate(CARD_SETS):
+            if all(h >= c for h, c in zip(hand, cards)):
+                table[_hand_index(hand)] = i
+                break
+    table.flags.writeable = False
+    return table
+
+
+# Capped hand index -> index in CARD_SETS of its best set, -1 if there is none
+_BEST_SETS = _build_best_sets()
+_BEST_SETS_LIST = _BEST_SETS.tolist()
+
+
+def best_set(hand) -> tuple:
+    """
+    Set of the hand using the fewest wilds, None if there is none
+    """
+    i = _BEST_SETS_LIST[_hand_index(hand)]
+    return CARD_SETS[i] if i >= 0 else None
+
+
+def best_sets(hands: np.ndarray) -> np.ndarray:
+    """
+    Vectorized best_set for (n, 4) hands.
+    Returns (n,) indexes in CARD_SETS, -1 for hands without a set
+    """
+    capped = np.minimum(hands, _CAPS)
+    return _BEST_SETS[
+        ((capped[:, 0] * 4 + capped[:, 1]) * 4 + capped[:, 2]) * 3 + capped[:, 3]
+    ]
+
+
+def is_set(cards) -> bool:
+    return tuple(cards) in CARD_SETS
+
+
+def trade_in_bonus(sets_traded: int) -> int:
+    """
+    Troops for trading a set, when sets_traded sets were traded before in the game
+    """
+    if sets_traded < len(TRADE_IN_BONUSES):
+        return TRADE_IN_BONUSES[sets_traded]
+    return TRADE_IN_BONUSES[-1] + 5 * (sets_traded - len(TRADE_IN_BONUSES) + 1)
+
+
+class Deck:
+    """
+    1 card per territory, types dealt in turn, plus the wilds.
+    Traded cards are discarded, and shuffled back in when the deck runs out
+    """
+
+    def __init__(self, num_territories: int) -> None:
+        self.num_territories = num_territories
+        self.reset()
+
+    def reset(self):
+        # Territory t gets type t % 3
+        self.cards = [len(range(t, self.num_territories, 3)) for t in range(3)]
+        self.cards.append(WILD_CARDS)
+        self.discarded = [0] * NUM_CARD_TYPES
+
+    def __len__(self):
+        return sum(self.cards)
+
+    def draw(self, rng: np.random.Generator):
+        """
+        Returns the type of the drawn card, None if every card is in a hand
+        """
+        total = sum(self.cards)
+        if total == 0:
+            self.cards, self.discarded = self.discarded, [0] * NUM_CARD_TYPES
+            total = sum(self.cards)
+            if total == 0:
+                return None
+        r = int(rng.integers(total))
+        for card_type, count in enumerate(self.cards):
+            if r < count:
+                self.cards[card_type] -= 1
+                return card_type
+            r -= count
+
+    def discard(self, cards):
+        for card_type, count in enumerate(cards):
+            self.discarded[card_type] += count
+
+    def get_state(self):
+        return tuple(self.cards), tuple(self.discarded)
+
+    def set_state(self, state):
+        self.cards, self.discarded = list(state[0]), list(state[1])
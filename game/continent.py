@@ -10,6 +10,11 @@ class Continent:
         self.id_ = id_
         self.territories = territories
         self.troops_rewards = troops_reward
+        for t in territories:
+            t.continent = self
 
     def is_controlled_by(self, player: Player):
-        return all(t.occupying_player_name == player.name for t in self.territories)
+        """
+        O(1), from the player's count of owned territories in this continent
+        """
+        return player.controls_continent(self)
@@ -1,5 +1,4 @@
-import os
-import sys
+import functools
 
 import numpy as np
 
@@ -7,18 +6,10 @@ import gymnasium as gym
 from gymnasium import spaces
 from gymnasium.spaces.utils import flatten_space
 
-from loguru import logger
-
-logger.remove()
-
-logger.add(
-    os.path.join(os.path.dirname(os.path.abspath(__file__)), f"env.log"),
-    level="DEBUG",
-    mode="w",
-)
-logger.add(sys.stdout, level="INFO")
-
+from game.actions import Attack, Deploy, EndPhase
 from game.game import Game
+from game.map import MapTopology
+from game.events import DEBUG, TRACE
 from game.player import Player, Player_Random
 
 LOSE_GAME_REWARD = -1e10
@@ -26,19 +17,39 @@ WIN_GAME_REWARD = 1e10
 TERRITORY_GAIN_REWARD = 1e9
 
 
+@functools.lru_cache(maxsize=None)
+def static_observation_blocks(topology: MapTopology):
+    """
+    Observation blocks that never change for a map, built once & shared by every env on it (read only)
+    Returns tuple: (connexions (t * t,), continent_territories (c * t,))
+    """
+    connexions = topology.adjacency_matrix.astype(np.int64).ravel()
+    continent_territories = topology.continent_masks.astype(np.int64).ravel()
+    connexions.flags.writeable = False
+    continent_territories.flags.writeable = False
+    return connexions, continent_territories
+
+
 class RiskEnv_Choice_is_attack_territory(gym.Env):
     metadata = {"render_modes": ["human"], "render_fps": 1}
 
-    def __init__(self, game: Game, agent_player: Player, render_mode=None) -> None:
+    def __init__(
+        self, game: Game, agent_player: Player, render_mode=None, flat_obs=False
+    ) -> None:
+        """
+        flat_obs: observations are the float32 vector of flatten_obs instead of the dict,
+        written directly in a buffer (see _get_flat_obs)
+        """
         self.game = game
         self.agent_player = agent_player
+        self.flat_obs = flat_obs
 
         num_territories = len(game.game_map.territories)
         num_continents = len(game.game_map.continents)
         max_troops = 10e4
         num_players = game.player_nb
 
-        self.observation_space = spaces.Dict(
+        self.dict_observation_space = spaces.Dict(
             {
                 "num_troops": spaces.MultiDiscrete(
                     [max_troops for _ in range(num_territories)]
@@ -62,12 +73,31 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
             }
         )
 
+        self.observation_space = (
+            self.flatten_observation_space()
+            if flat_obs
+            else self.dict_observation_space
+        )
+
         # We can only chose which territory to attack
         self.action_space = spaces.Discrete(len(self.game.game_map.territories))
 
         assert render_mode is None or render_mode in self.metadata["render_modes"]
         self.render_mode = render_mode
 
+        # Observation buffers, see _get_obs
+        self._connexions, self._continent_territories = static_observation_blocks(
+            game.game_map.topology
+        )
+        self._num_troops = np.zeros(num_territories, dtype=np.int64)
+        self._player_ids_territory = np.zeros(num_territories, dtype=np.int64)
+        # Valid targets, see _update_action_mask
+        self._adjacency = game.game_map.adjacency_matrix
+        self._action_mask = np.zeros(num_territories, dtype=np.bool_)
+        self._action_mask_key = None
+        if flat_obs:
+            self._build_flat_obs(num_territories, num_continents, num_players)
+
     def flatten_observation_space(self):
         flattened_space_shape = self._calculate_flattened_space_shape()
         return gym.spaces.Box(
@@ -76,7 +106,7 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
 
     def _calculate_flattened_space_shape(self):
         flattened_shape = 0
-        for key, space in self.observation_space.spaces.items():
+        for key, space in self.dict_observation_space.spaces.items():
             if key == "num_troops":
                 flattened_shape += len(self.game.game_map.territories)
             else:
@@ -128,32 +158,65 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
         )
         return flattened_obs
 
+    def _build_flat_obs(self, num_territories, num_continents, num_players):
+        """
+        Buffer & views on its blocks, in the order of flatten_obs. The static blocks are written once
+        """
+        self._flat_obs = np.zeros(
+            self.observation_space.shape[0], dtype=self.observation_space.dtype
+        )
+        sizes = [
+            num_territories * num_players,  # owners one hot
+            num_continents * num_territories,
+            num_players,  # player one hot
+            num_territories,  # attacking territory one hot
+            num_territories * num_territories,
+            num_territories,  # troops
+            1,  # troops to deploy
+        ]
+        (
+            self._flat_owners,
+            continent_territories,
+            self._flat_player,
+            self._flat_attacking,
+            connexions,
+            self._flat_troops,
+            self._flat_troops_to_deploy,
+        ) = np.split(self._flat_obs, np.cumsum(sizes)[:-1])
+        continent_territories[:] = self._continent_territories
+        connexions[:] = self._connexions
+        # Owner one hot of territory i is at i * num_players + owner
+        self._owner_offsets = np.arange(num_territories) * num_players
+
+    def _get_flat_obs(self):
+        """
+        Same vector as flatten_obs(dict observation), without building the dict.
+        No copy either: it's the env's buffer, overwritten by the next step() / reset()
+        """
+        state = self.game.game_map.state
+        self._flat_owners.fill(0)
+        self._flat_owners[self._owner_offsets + state.owners] = 1
+        self._flat_player.fill(0)
+        self._flat_player[self.game.active_player.id_] = 1
+        self._flat_attacking.fill(0)
+        self._flat_attacking[self.game.attacking_territory.id_] = 1
+        self._flat_troops[:] = state.troops
+        self._flat_troops_to_deploy[0] = 0
+        return self._flat_obs
+
     def _get_obs(self):
         """
         Compute the observation state
+        No copy: the arrays are buffers of the env, overwritten by the next step() / reset().
+        Copy them to keep an observation around. connexions & continent_territories are read only
         """
+        if self.flat_obs:
+            return self._get_flat_obs()
 
-        num_troops = []
-        player_ids_territory = []
-        connexions = []
-        for t in self.game.game_map.territories:
-            num_troops.append(t.troops)
-            player_ids_territory.append(
-                self.game.get_player_by_name(t.occupying_player_name).id_
-            )
-            t_connexions = [0] * len(self.game.game_map.territories)
-            for t_name in t.adjacent_territories_names:
-                t_id = self.game.game_map.get_territory_from_name(t_name).id_
-                t_connexions[t_id] = 1
-            connexions.extend(t_connexions)
-
-        continent_territories = []  # Binaries of length num_territories
-        for c in self.game.game_map.continents:
-            c_territories = [0] * len(self.game.game_map.territories)
-            c_terr_ids = [t.id_ for t in c.territories]
-            for idx in c_terr_ids:
-                c_territories[idx] = 1
-            continent_territories.extend(c_territories)
+        state = self.game.game_map.state
+        np.copyto(self._num_troops, state.troops)
+        # Owner ids are the player ids
+        np.copyto(self._player_ids_territory, state.owners)
 
         player = self.game.active_player.id_
 
@@ -164,27 +227,52 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
             troops_to_deploy = 0
 
         return {
-            "num_troops": np.array(num_troops),
-            "player_ids_territory": np.array(player_ids_territory),
-            "continent_territories": np.array(continent_territories),
+            "num_troops": self._num_troops,
+            "player_ids_territory": self._player_ids_territory,
+            "continent_territories": self._continent_territories,
             "player": player,
             "attacking_territory": attacking_territory,
-            "connexions": np.array(connexions),
+            "connexions": self._connexions,
             "troops_to_deploy": troops_to_deploy,
         }
 
+    def _update_action_mask(self):
+        """
+        Targets adjacent to the attacking territory & not owned by the agent, as a bool array.
+        Only recomputed when the attacker or the owners changed since the last call
+        """
+        attacker = self.game.attacking_territory
+        key = (
+            attacker.id_ if attacker is not None else None,
+            self.game.game_map.state.owner_changes,
+        )
+        if key != self._action_mask_key:
+            self._action_mask_key = key
+            if attacker is None:
+                self._action_mask.fill(False)
+            else:
+                np.logical_and(
+                    self._adjacency[attacker.id_],
+                    self.game.game_map.state.owners != self.agent_player.id_,
+                    out=self._action_mask,
+                )
+        return self._action_mask
+
     def _get_info(self):
-        return {}
+        """
+        action_mask: (num_actions,) bool, the env's buffer like the observations
+        """
+        return {"action_mask": self._update_action_mask()}
 
     def reset(self, seed=None, options=None):
         # We need the following line to seed self.np_random
         super().reset(seed=seed)
 
-        np.random.seed(seed=seed)
-
-        self.game.reset()
+        self.game.reset(seed=seed)
 
-        logger.debug(f"Player turn: {self.game.active_player.name}")
+        events = self.game.events
+        if events.debug:
+            events.emit(DEBUG, "turn", player=self.game.active_player.name)
 
         terminated = self.play_other_player_turn()
         if terminated:
@@ -193,28 +281,13 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
 
         # It's back to the agent_player's turn again
         if self.game.game_phase == "DRAFT":
-            troops_to_deploy = self.game.get_deployment_troops(self.game.active_player)
-
-            while (
-                troops_to_deploy > 0
-            ):  # To be replaced whenever the player will actually choose
-                # Doing random for now. Need to plug in player methods.
-                deploying = self.game.active_player.draft_choose_troops_to_deploy(
-                    troops_to_deploy
-                )
-                # TODO here return a choice to deploy troops on which territory
-                # This should end the reset()
-                territory = self.game.active_player.draft_choose_territory_to_deploy()
-                # return here obs etc
-
-                territory.add_troops(deploying)
-                troops_to_deploy -= deploying
-                logger.debug(
-                    f"{self.game.active_player.name} deployed {deploying} troops in {territory.name}"
-                )
+            # To be replaced whenever the player will actually choose
+            # TODO here return a choice to deploy troops on which territory
+            # This should end the reset()
+            self.deploy_agent_troops()
 
             # We are now in ATTACK phase
-            self.game.next_phase()
+            self.game.apply_action(EndPhase())
             # If the player can't attack or doesn't want to
             if (
                 not self.game.active_player.attack_wants_attack()
@@ -227,9 +300,13 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
             # We choose the attacking territory
             attacker = self.game.active_player.attack_choose_attack_territory()
             self.game.attacking_territory = attacker
-            logger.debug(
-                f"{self.game.active_player.name} attacking from {attacker.name}"
-            )
+            if events.debug:
+                events.emit(
+                    DEBUG,
+                    "attacker",
+                    player=self.game.active_player.name,
+                    source=attacker.name,
+                )
 
         else:
             raise f"Incorrect phase: {self.game.game_phase}"
@@ -240,7 +317,13 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
         if self.render_mode == "human":
             self._render_frame()
 
-        logger.debug(self.game)
+        if events.trace:
+            events.emit(
+                TRACE,
+                "board",
+                troops=self.game.game_map.state.troops.tolist(),
+                owners=self.game.game_map.state.owners.tolist(),
+            )
         return observation, info
 
     def get_masked_action_space(self):
@@ -249,22 +332,26 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
 
         Currently, only choosing the attack territory.
         Available actions is the list of territories that are adjacent to the attacking territory AND are not owned by the player
+        Prefer info["action_mask"], this is the same as a list
         """
         # TODO will need to differentiate based on choice phase (deploy or attack etc)
-        attacking_player = self.agent_player
-        attacker = self.game.attacking_territory
+        return np.flatnonzero(self._update_action_mask()).tolist()
 
-        adjacent_territories_names = attacker.adjacent_territories_names
-        adjacent_territories = [
-            self.game.game_map.get_territory_from_name(t)
-            for t in adjacent_territories_names
-        ]
-        valid_actions = [
-            t.id_
-            for t in adjacent_territories
-            if t.occupying_player_name != attacking_player.name
-        ]
-        return valid_actions
+    def deploy_agent_troops(self):
+        """
+        Doing random for now. Need to plug in player methods.
+        """
+        self.game.card_phase(self.game.active_player)
+        while self.game.troops_to_deploy > 0:
+            deploying = self.game.active_player.draft_choose_troops_to_deploy(
+                self.game.troops_to_deploy
+            )
+            territory = self.game.active_player.draft_choose_territory_to_deploy()
+            self.game.apply_action(Deploy(territory.id_, deploying))
+
+    def end_turn(self):
+        # Fortify like the bots for now, then next player's DRAFT
+        self.game.fortify_phase(self.game.active_player)
 
     def play_other_player_turn(self):
 
@@ -277,32 +364,23 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
                 terminated = True
                 return terminated
 
-            self.game.next_turn()
+            self.end_turn()
         return False
 
     def play_from_agent_player_draft(self):
 
         if self.game.game_phase == "DRAFT":
-            troops_to_deploy = self.game.get_deployment_troops(self.game.active_player)
-
-            while troops_to_deploy > 0:
-                deploying = self.game.active_player.draft_choose_troops_to_deploy(
-                    troops_to_deploy
-                )
-
-                # TODO break here in two parts: play_from_agent_player_draft and play_from_agent_player_deployed
-                territory = self.game.active_player.draft_choose_territory_to_deploy()
-                territory.add_troops(deploying)
-                troops_to_deploy -= deploying
+            # TODO break here in two parts: play_from_agent_player_draft and play_from_agent_player_deployed
+            self.deploy_agent_troops()
 
             # We are now in ATTACK phase
-            self.game.next_phase()
+            self.game.apply_action(EndPhase())
             # If the player can't attack or doesn't want to
             while (
                 not self.game.active_player.attack_wants_attack()
                 or not self.game.has_valid_attack(self.game.active_player)
             ):
-                self.game.next_turn()
+                self.end_turn()
                 terminated = self.play_other_player_turn()
                 if terminated:
                     return terminated
@@ -330,13 +408,10 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
         # if draft: play_from_agent_player_deployed
         # elif attack: what we already have
 
-        initial_player_terr_numbers = len(
-            self.game.active_player.controlled_territories
-        )
+        initial_player_terr_numbers = self.game.active_player.territory_count
 
-        masked_action_space = self.get_masked_action_space()
-
-        if action not in masked_action_space:
+        action_mask = self._update_action_mask()
+        if not 0 <= action < len(action_mask) or not action_mask[action]:
             raise ValueError(f"Invalid action {action} selected.")
 
         done = False
@@ -346,19 +421,13 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
         target_territory_id = action
         target_territory = self.game.game_map.get_territory_from_id(target_territory_id)
 
-        attack_remaining, defender_remaining, dice_nb = self.game.perform_attack(
-            self.agent_player, self.game.attacking_territory, target_territory
+        attacker = self.game.attacking_territory
+        attack_dice_nb, blitz = self.agent_player.attack_choose_attack_dices(
+            attacker.troops
+        )
+        self.game.apply_action(
+            Attack(attacker.id_, target_territory.id_, attack_dice_nb, blitz)
         )
-
-        attack_info = {
-            "attack_remaining": attack_remaining,
-            "defender_remaining": defender_remaining,
-            "target": target_territory,
-            "attacker": self.game.attacking_territory,
-            "player": self.agent_player,
-            "attack_dice_nb": dice_nb,
-        }
-        self.game.after_attack(attack_info=attack_info)
         # TODO add reward if territory conquered ?
 
         if self.game.is_game_over():
@@ -378,7 +447,7 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
             attacker = self.game.active_player.attack_choose_attack_territory()
             self.game.attacking_territory = attacker
 
-            current_terr_nb = len(self.game.active_player.controlled_territories)
+            current_terr_nb = self.game.active_player.territory_count
             reward = (
                 current_terr_nb - initial_player_terr_numbers
             ) * TERRITORY_GAIN_REWARD
@@ -395,10 +464,8 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
             obs = self._get_obs()
             return obs, reward, terminated, False, self._get_info()
 
-        self.game.next_phase()
         # TODO What do in reinforce phase?
-
-        self.game.next_turn()
+        self.end_turn()
 
         terminated = self.play_other_player_turn()
 
@@ -419,7 +486,7 @@ class RiskEnv_Choice_is_attack_territory(gym.Env):
             obs = self._get_obs()
             return obs, reward, terminated, False, self._get_info()
 
-        current_terr_nb = len(self.game.active_player.controlled_territories)
+        current_terr_nb = self.game.active_player.territory_count
         reward = (current_terr_nb - initial_player_terr_numbers) * TERRITORY_GAIN_REWARD
 
         # It should be now back up to the agent making a new choice
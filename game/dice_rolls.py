@@ -1,7 +1,141 @@
+import functools
+
 import numpy as np
 
 from game.player import Player
 from game.territory import Territory
+from game.rng import get_default_rng
+
+# Dices are drawn like np.random.randint(DICE_LOW, DICE_HIGH), high is exclusive
+DICE_LOW = 1
+DICE_HIGH = 6
+DICE_FACES = DICE_HIGH - DICE_LOW
+MAX_ATTACK_DICES = 3
+MAX_DEFEND_DICES = 2
+
+# Every roll uses at most 3 attack + 2 defend dices. Each possible outcome of those 5 dices
+# is encoded as one integer, so a roll is a single draw in [0, DICE_COMBINATIONS)
+DICE_COMBINATIONS = DICE_FACES ** (MAX_ATTACK_DICES + MAX_DEFEND_DICES)
+
+DICE_POOL_BLOCK_SIZE = 4096
+
+
+def _build_loss_tables():
+    """
+    Precompute the losses for every (attack dices, defend dices, encoded roll)
+    Returns tuple of arrays of shape (MAX_ATTACK_DICES + 1, MAX_DEFEND_DICES + 1, DICE_COMBINATIONS)
+    """
+    codes = np.arange(DICE_COMBINATIONS)
+    dices = np.stack(
+        [
+            (codes // DICE_FACES**i) % DICE_FACES + DICE_LOW
+            for i in range(MAX_ATTACK_DICES + MAX_DEFEND_DICES)
+        ],
+        axis=1,
+    )
+    shape = (MAX_ATTACK_DICES + 1, MAX_DEFEND_DICES + 1, DICE_COMBINATIONS)
+    attack_losses = np.zeros(shape, dtype=np.int64)
+    defender_losses = np.zeros(shape, dtype=np.int64)
+
+    for a in range(MAX_ATTACK_DICES + 1):
+        for d in range(MAX_DEFEND_DICES + 1):
+            # Sort both dices, highest first
+            attack_dices = -np.sort(-dices[:, :a], axis=1)
+            defender_dices = -np.sort(
+                -dices[:, MAX_ATTACK_DICES : MAX_ATTACK_DICES + d], axis=1
+            )
+            # Compare pairs of highest dices, defender wins ties
+            pairs = min(a, d)
+            defender_loss = (attack_dices[:, :pairs] > defender_dices[:, :pairs]).sum(
+                axis=1
+            )
+            defender_losses[a, d] = defender_loss
+            attack_losses[a, d] = pairs - defender_loss
+
+    attack_losses.flags.writeable = False
+    defender_losses.flags.writeable = False
+    return attack_losses, defender_losses
+
+
+_ATTACK_LOSSES, _DEFENDER_LOSSES = _build_loss_tables()
+
+
+class DicePool:
+    """
+    Draws encoded rolls from the generator by large blocks, to cut the per call overhead.
+    Same seed gives the same game, but not the same rolls as drawing from the generator directly.
+    """
+
+    def __init__(
+        self, rng: np.random.Generator, block_size: int = DICE_POOL_BLOCK_SIZE
+    ) -> None:
+        self.rng = rng
+        self.block_size = block_size
+        self._block = np.empty(0, dtype=np.int64)
+        self._position = 0
+
+    def _refill(self, needed: int):
+        remaining = self._block[self._position :]
+        new_rolls = self.rng.integers(
+            DICE_COMBINATIONS, size=max(self.block_size, needed)
+        )
+        self._block = np.concatenate([remaining, new_rolls])
+        # Blocks are replaced, never modified, so states can share them without copies
+        self._block.flags.writeable = False
+        self._position = 0
+
+    def rolls(self, size=()):
+        n = int(np.prod(size))
+        if self._position + n > len(self._block):
+            self._refill(n)
+        start = self._position
+        self._position += n
+        if size == ():
+            return self._block[start]
+        return self._block[start : start + n].reshape(size)
+
+    def random(self):
+        return self.rng.random()
+
+    def get_state(self):
+        return self.rng.bit_generator.state, self._block, self._position
+
+    def set_state(self, state):
+        rng_state, block, position = state
+        self.rng.bit_generator.state = rng_state
+        self._block = block
+        self._position = position
+
+
+def draw_rolls(rng, size=()):
+    """
+    Encoded rolls in [0, DICE_COMBINATIONS), from a Generator or a DicePool
+    """
+    if rng is None:
+        rng = get_default_rng()
+    if isinstance(rng, DicePool):
+        return rng.rolls(size)
+    return rng.integers(DICE_COMBINATIONS, size=size)
+
+
+def roll_dices_batch(attack_dice_nb, defender_troops, rng=None):
+    """
+    Resolve many independent dice rolls at once, with a single draw.
+
+    Args:
+        attack_dice_nb: array (n,) of attack dices for each roll (1 to 3)
+        defender_troops: array (n,) of troops on each target. Defender rolls min(troops, 2) dices
+        rng: np.random.Generator or DicePool, process default generator if None
+
+    Returns tuple of arrays (n,): (attacker_loss, defender_loss)
+    Scalars are accepted as well and give scalar results.
+    """
+    defender_dice_nb = np.minimum(defender_troops, MAX_DEFEND_DICES)
+    rolls = draw_rolls(rng, np.shape(attack_dice_nb))
+    return (
+        _ATTACK_LOSSES[attack_dice_nb, defender_dice_nb, rolls],
+        _DEFENDER_LOSSES[attack_dice_nb, defender_dice_nb, rolls],
+    )
 
 
 def roll_dices_sanity_checks(
@@ -38,6 +172,7 @@ def roll_dices(
     target: Territory,
     attack_dice_nb: int,
     true_random=True,
+    rng=None,
 ):
     """
     Returns tuple: [attacker_loss, defender_loss]
@@ -50,27 +185,32 @@ def roll_dices(
         . From inverse order, look at highest dice values
         . For each pair of dice, add loosing troop
         . Return loosing troops
+    Single roll version of roll_dices_batch
     """
-    if true_random:
-
-        attack_loss = 0
-        defender_loss = 0
+    attack_loss = 0
+    defender_loss = 0
 
-        attack_dices = []
-        defender_dices = []
-
-        for i in range(attack_dice_nb):
-            attack_dices.append(np.random.randint(1, 6))
-        for i in range(min(target.troops, 2)):
-            defender_dices.append(np.random.randint(1, 6))
+    if true_random:
+        attack_loss, defender_loss = roll_dices_batch(
+            attack_dice_nb, target.troops, rng
+        )
 
-        attack_dices = sorted(attack_dices, reverse=True)
-        defender_dices = sorted(defender_dices, reverse=True)
+    return (int(attack_loss), int(defender_loss))
 
-        for j in range(min(len(attack_dices), len(defender_dices))):
-            if attack_dices[j] > defender_dices[j]:
-                defender_loss += 1
-            else:
-                attack_loss += 1
 
-    return (attack_loss, defender_loss)
+@functools.lru_cache(maxsize=None)
+def roll_outcome_probabilities(attack_dice_nb: int, defend_dice_nb: int):
+    """
+    Exact distribution of a single roll
+    Returns list of tuples (attacker_loss, defender_loss, probability)
+    """
+    outcomes = {}
+    attack_losses = _ATTACK_LOSSES[attack_dice_nb, defend_dice_nb]
+    defender_losses = _DEFENDER_LOSSES[attack_dice_nb, defend_dice_nb]
+    for attack_loss, defender_loss in zip(attack_losses, defender_losses):
+        key = (int(attack_loss), int(defender_loss))
+        outcomes[key] = outcomes.get(key, 0) + 1
+    return [
+        (attack_loss, defender_loss, count / DICE_COMBINATIONS)
+        for (attack_loss, defender_loss), count in sorted(outcomes.items())
+    ]
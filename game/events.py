@@ -0,0 +1,186 @@
+"""
+Structured game events, with a level fixed at construction so disabled events cost a single attribute check:
+
+    if self.events.debug:
+        self.events.emit(DEBUG, "deploy", player=player.name, troops=deploying)
+
+Nothing is formatted at emit time, records are plain dicts handed to the sinks.
+For traces, JsonLinesSink writes them from a background thread, by batches, with rotation:
+
+    events = EventLog("DEBUG", [JsonLinesSink("game.jsonl")])
+    game = Game("test_map_v0", players, events=events)
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+TRACE = 5  # Board dumps, very verbose
+DEBUG = 10
+INFO = 20
+WARNING = 30
+OFF = 100
+
+LEVELS = {"TRACE": TRACE, "DEBUG": DEBUG, "INFO": INFO, "WARNING": WARNING, "OFF": OFF}
+LEVEL_NAMES = {v: k for k, v in LEVELS.items()}
+
+
+class EventLog:
+    """
+    level: name or number, events below it are dropped. Can't be changed afterwards,
+    the trace / debug / info flags are meant to be checked before building an event.
+    With no sink, every flag is False.
+    """
+
+    __slots__ = ("level", "sinks", "trace", "debug", "info")
+
+    def __init__(self, level="OFF", sinks: list = None) -> None:
+        self.level = LEVELS[level] if isinstance(level, str) else int(level)
+        self.sinks = list(sinks or [])
+        enabled = len(self.sinks) > 0
+        self.trace = enabled and self.level <= TRACE
+        self.debug = enabled and self.level <= DEBUG
+        self.info = enabled and self.level <= INFO
+
+    def emit(self, level: int, event: str, **fields):
+        if level < self.level or not self.sinks:
+            return
+        record = {"time": time.time(), "level": LEVEL_NAMES[level], "event": event}
+        record.update(fields)
+        for sink in self.sinks:
+            sink.write(record)
+
+    def close(self):
+        for sink in self.sinks:
+            sink.close()
+
+
+class ListSink:
+    """
+    Keeps the records in memory, for tests & analysis
+    """
+
+    def __init__(self) -> None:
+        self.records = []
+
+    def write(self, record: dict):
+        self.records.append(record)
+
+    def close(self):
+        pass
+
+
+class LoguruSink:
+    """
+    Forwards the records to loguru, formatted on the way out
+    """
+
+    def __init__(self, logger=None) -> None:
+        if logger is None:
+            from loguru import logger
+        self.logger = logger
+
+    def write(self, record: dict):
+        fields = " ".join(
+            f"{k}={v}" for k, v in record.items() if k not in ("time", "level", "event")
+        )
+        self.logger.log(record["level"], f"{record['event']} {fields}")
+
+    def close(self):
+        pass
+
+
+def _json_default(value):
+    # numpy scalars & arrays, without importing numpy here
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    return str(value)
+
+
+class JsonLinesSink:
+    """
+    Non blocking JSON lines file sink: write() only queues the record, a daemon thread
+    serializes & writes them by batches. When the file exceeds max_bytes it's rotated
+    to path.1, path.2 ... keeping backup_count of them.
+    Records must not be modified after being emitted.
+    """
+
+    _STOP = object()
+
+    def __init__(
+        self,
+        path: str,
+        max_bytes: int = 100 * 1024**2,
+        backup_count: int = 3,
+        batch_size: int = 1024,
+        flush_interval: float = 0.5,
+    ) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.SimpleQueue()
+        self._file = open(path, "a", encoding="utf-8")
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="JsonLinesSink", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def write(self, record: dict):
+        self._queue.put(record)
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(self._STOP)
+        self._thread.join()
+        self._file.close()
+        atexit.unregister(self.close)
+
+    def _run(self):
+        stop = False
+        while not stop:
+            batch = []
+            record = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if record is self._STOP:
+                    stop = True
+                    break
+                batch.append(record)
+                timeout = deadline - time.monotonic()
+                if len(batch) >= self.batch_size or timeout <= 0:
+                    break
+                try:
+                    record = self._queue.get(timeout=timeout)
+                except queue.Empty:
+                    break
+            if batch:
+                self._write_batch(batch)
+
+    def _write_batch(self, batch: list):
+        self._file.write(
+            "".join(json.dumps(r, default=_json_default) + "\n" for r in batch)
+        )
+        self._file.flush()
+        if self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self):
+        self._file.close()
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+        self._file = open(self.path, "a", encoding="utf-8")
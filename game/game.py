@@ -1,19 +1,54 @@
-import time
-import os
-import json
-import numpy as np
-
-from loguru import logger
+from dataclasses import dataclass
 
+import numpy as np
 
 from game.player import Player
-from game.map import Map
+from game.actions import (
+    ActionResult,
+    Attack,
+    Delta,
+    Deploy,
+    EndPhase,
+    Fortify,
+    TradeCards,
+)
+from game.cards import Deck, MUST_TRADE_CARDS, is_set, trade_in_bonus
+from game.map import Map, load_map_topology
+from game.state import NO_OWNER
 from game.territory import Territory
 from game.continent import Continent
 from game.utils import wait_for_cmd_action, attack_once
-from game.dice_rolls import roll_dices_sanity_checks
-
-PAUSE_BTW_ACTIONS = 2
+from game.dice_rolls import roll_dices_sanity_checks, DicePool, MAX_ATTACK_DICES
+from game.rng import make_seed_sequence
+from game.blitz import BLITZ_TROOPS_CAP, get_blitz_resolver
+from game.events import EventLog, TRACE, DEBUG
+from game.kernels import get_kernels
+
+
+@dataclass(frozen=True)
+class GameSnapshot:
+    """
+    Complete mutable state of a game, see Game.snapshot
+    Everything else (player territory lists, continents, frontier) is derived from it on restore
+    """
+
+    troops: np.ndarray
+    owners: np.ndarray
+    # Position of each territory in its owner's controlled_territories, so random picks replay the same
+    territory_positions: np.ndarray
+    player_order: tuple  # player ids, in playing order
+    dead: tuple  # is_dead of each player, by id
+    active_player_id: int
+    active_player_idx: int
+    turn_number: int
+    game_phase: str
+    troops_to_deploy: int
+    cards: tuple  # hand of each player, by id
+    deck: tuple  # Deck.get_state
+    sets_traded: int
+    conquered_this_turn: bool
+    attacking_territory_id: int  # NO_OWNER if None
+    rng_state: object  # bit generator state, or DicePool state
 
 
 class Game:
@@ -23,38 +58,174 @@ class Game:
         players: list[Player],
         fixed: bool = True,
         true_random: bool = True,
+        blitz_troops_cap: int = BLITZ_TROOPS_CAP,
+        seed=None,
+        dice_pool_size: int = 0,
+        events: EventLog = None,
+        backend: str = "python",
     ) -> None:
+        """
+        seed: None, int or np.random.SeedSequence (see game.rng.spawn_seeds for parallel games)
+        dice_pool_size: if > 0, dices are prefetched from the generator by blocks of this size
+        events: where game events go, see game/events.py. Nothing is logged by default
+        backend: "python", "numba" or "auto" for the inner loops, see game/kernels.py. Same results either way.
+            python by default: a single game barely batches anything, and numba costs a JIT compile
+            the first time a process uses it
+        """
+        self.events = events if events is not None else EventLog()
         self.player_nb = len(players)
         self.players = players
         self._set_players_id()
+        self.dice_pool_size = dice_pool_size
+        self.seed(seed)
         self.map_name = map_name
-        self.deck = None
         self.fixed = fixed
         self.true_random = true_random
+        self.kernels = get_kernels(backend)
+        self.blitz_resolver = get_blitz_resolver(blitz_troops_cap, backend)
         self.turn_number = 0
         self.game_phase = None
         self.active_player = None
         self.active_player_idx = None
+        self.remaining_players = list(players)
+        # Left to deploy by the active player, in DRAFT
+        self.troops_to_deploy = 0
+        # Sets traded by everyone so far, for the trade-in bonus
+        self.sets_traded = 0
+        # The active player draws a card at the end of its turn if it conquered a territory
+        self.conquered_this_turn = False
 
         # Usefull to construct observation space
         self.attacking_territory = None
 
         self.game_map = self.load_map(map_name)
+        self.deck = Deck(len(self.game_map.territories))
 
-    def reset(self):
+    def seed(self, seed=None):
+        """
+        Every random decision of the game, players included, comes from self.rng
+        """
+        self.seed_sequence = make_seed_sequence(seed)
+        self.rng = np.random.default_rng(self.seed_sequence)
+        # What dices are drawn from: the generator itself or a prefetching pool on top of it
+        self.dice = (
+            DicePool(self.rng, self.dice_pool_size) if self.dice_pool_size else self.rng
+        )
+        for p in self.players:
+            p.rng = self.rng
+
+    def reset(self, seed=None):
         """
         Called by the environment
+        A new seed restarts the random streams, otherwise they carry on from the previous game
         """
+        if seed is not None:
+            self.seed(seed)
         self.turn_number = 0
         self.game_phase = None
         self.active_player = None
         self.attacking_territory = None
-        self.game_map = self.load_map(self.map_name)
+        self.game_map.reset()
+        self.deck.reset()
+        self.sets_traded = 0
+        self.conquered_this_turn = False
         for p in self.players:
             p.reset()
         self.init_players()
-        self.remaining_players = self.players
+        # Kept up to date on eliminations
+        self.remaining_players = list(self.players)
         self.game_phase = "DRAFT"
+        self.troops_to_deploy = self.get_deployment_troops(self.active_player)
+
+    def snapshot(self) -> GameSnapshot:
+        """
+        Cheap copy of the mutable state, to branch rollouts from the same position with restore()
+        """
+        state = self.game_map.state
+        territory_positions = np.zeros(state.num_territories, dtype=np.int64)
+        for player in self.players:
+            ids, positions = player.get_territory_positions()
+            territory_positions[ids] = positions
+        return GameSnapshot(
+            troops=state.troops.copy(),
+            owners=state.owners.copy(),
+            territory_positions=territory_positions,
+            player_order=tuple(p.id_ for p in self.players),
+            dead=tuple(
+                self.get_player_by_id(i).is_dead for i in range(len(self.players))
+            ),
+            active_player_id=(
+                self.active_player.id_ if self.active_player is not None else NO_OWNER
+            ),
+            active_player_idx=self.active_player_idx,
+            turn_number=self.turn_number,
+            game_phase=self.game_phase,
+            troops_to_deploy=self.troops_to_deploy,
+            cards=tuple(
+                tuple(self.get_player_by_id(i).cards) for i in range(len(self.players))
+            ),
+            deck=self.deck.get_state(),
+            sets_traded=self.sets_traded,
+            conquered_this_turn=self.conquered_this_turn,
+            attacking_territory_id=(
+                self.attacking_territory.id_
+                if self.attacking_territory is not None
+                else NO_OWNER
+            ),
+            rng_state=self._get_rng_state(),
+        )
+
+    def restore(self, snap: GameSnapshot):
+        """
+        Back to the snapshot's position. The snapshot isn't modified and can be restored again
+        """
+        game_map = self.game_map
+        state = game_map.state
+        np.copyto(state.troops, snap.troops)
+        np.copyto(state.owners, snap.owners)
+        state.rebuild_frontier()
+
+        # Players ownership, from the board
+        topology = game_map.topology
+        for player in self.players:
+            owned_ids = np.flatnonzero(snap.owners == player.id_)
+            owned_ids = owned_ids[np.argsort(snap.territory_positions[owned_ids])]
+            counts = np.bincount(
+                topology.territory_continents[owned_ids],
+                minlength=topology.num_continents,
+            )
+            controlled = np.flatnonzero(counts == topology.continent_sizes)
+            player.set_territories(
+                [game_map.get_territory_from_id(i) for i in owned_ids.tolist()],
+                {c: int(counts[c]) for c in np.flatnonzero(counts).tolist()},
+                controlled.tolist(),
+                int(topology.continent_rewards[controlled].sum()),
+            )
+            player.is_dead = snap.dead[player.id_]
+
+        self.players = [self.get_player_by_id(i) for i in snap.player_order]
+        self.remaining_players = [p for p in self.players if not p.is_dead]
+        self.active_player = (
+            self.get_player_by_id(snap.active_player_id)
+            if snap.active_player_id != NO_OWNER
+            else None
+        )
+        self.active_player_idx = snap.active_player_idx
+        self.turn_number = snap.turn_number
+        self.game_phase = snap.game_phase
+        self.troops_to_deploy = snap.troops_to_deploy
+        for player in self.players:
+            player.cards = list(snap.cards[player.id_])
+        self.deck.set_state(snap.deck)
+        self.sets_traded = snap.sets_traded
+        self.conquered_this_turn = snap.conquered_this_turn
+        self.attacking_territory = (
+            game_map.get_territory_from_id(snap.attacking_territory_id)
+            if snap.attacking_territory_id != NO_OWNER
+            else None
+        )
+
+        self._set_rng_state(snap.rng_state)
 
     def _set_players_id(self):
         for i, p in enumerate(self.players):
@@ -68,28 +239,48 @@ class Game:
         raise ValueError(f"No such player with id: {id}")
 
     def next_turn(self):
-        logger.debug(self)
+        if self.events.trace:
+            self.events.emit(
+                TRACE,
+                "board",
+                troops=self.game_map.state.troops.tolist(),
+                owners=self.game_map.state.owners.tolist(),
+            )
 
-        self.active_player_idx += 1
-        if self.active_player_idx >= len(self.players):
-            self.active_player_idx = 0
+        if self.conquered_this_turn:
+            self.draw_card(self.active_player)
+            self.conquered_this_turn = False
+
+        # Dead players are skipped
+        while True:
+            self.active_player_idx += 1
+            if self.active_player_idx >= len(self.players):
+                self.active_player_idx = 0
+                self.turn_number += 1
+            if not self.players[self.active_player_idx].is_dead:
+                break
 
         self.active_player = self.players[self.active_player_idx]
         self.game_phase = "DRAFT"
-        if self.active_player == self.players[0]:
-            self.turn_number += 1
-            logger.debug(f"Turn {self.turn_number}")
-        logger.debug(f"Player turn: {self.active_player.name}")
+        self.troops_to_deploy = self.get_deployment_troops(self.active_player)
+        if self.events.debug:
+            self.events.emit(
+                DEBUG,
+                "turn",
+                turn=self.turn_number,
+                player=self.active_player.name,
+            )
 
     def next_phase(self):
         if self.game_phase == "DRAFT":
             self.game_phase = "ATTACK"
         elif self.game_phase == "ATTACK":
-            self.game_phase == "FORTIFY"
+            self.game_phase = "FORTIFY"
         elif self.game_phase == "FORTIFY":
             self.game_phase = "DRAFT"
 
-        logger.debug(f"Phase: {self.game_phase}")
+        if self.events.debug:
+            self.events.emit(DEBUG, "phase", phase=self.game_phase)
 
     def render(self):
         """
@@ -104,7 +295,7 @@ class Game:
         print("--------------------------")
         for player in self.players:
             print(
-                f"{player.name} - Territories: {len(player.controlled_territories)} - Troops: {player.get_total_troops()}"
+                f"{player.name} - Territories: {player.territory_count} - Troops: {player.get_total_troops()}"
             )
         print("\n**************************************\n\n")
         return
@@ -113,49 +304,25 @@ class Game:
         """
         loads the map data based on the name
         Create according classes and objects
+        The map file itself is only parsed once per process (see load_map_topology)
         """
-        path = os.path.join(
-            os.path.dirname(os.path.abspath(__file__)), "maps", f"{map_name}.json"
-        )
-        if not os.path.exists(path):
-            raise ValueError(f"The map does not exist at {path}")
-        with open(path, "r") as map_file:
-            map_metadata = json.loads(map_file.read())
+        topology = load_map_topology(map_name)
 
-        if len(self.players) > map_metadata["max_players"]:
+        if len(self.players) > topology.max_players:
             raise ValueError(
-                f"Maximum number of players for this map is {map_metadata['max_players']}"
+                f"Maximum number of players for this map is {topology.max_players}"
             )
 
-        continents = []
-        territories = []
-
-        # for ids
-        i = 0
-
-        for name, t_data in map_metadata["territories"].items():
-            territory = Territory(name, i, t_data["adjacent_territories_names"])
-            territories.append(territory)
-            i += 1
-
-        i = 0
-
-        game_map = Map(map_name, territories, continents)
-
-        for name, c_data in map_metadata["continents"].items():
-            c_territories = [
-                game_map.get_territory_from_name(t) for t in c_data["territories"]
-            ]
+        self.map_repr = topology.repr
+        game_map = Map.from_topology(topology)
 
-            continent = Continent(
-                name, i, c_territories, troops_reward=c_data["troops_reward"]
-            )
-            continents.append(continent)
-            i += 1
-
-        game_map.update_continents(continents)
-
-        self.map_repr = map_metadata["repr"]
+        # So that the owner ids of the board are the player ids
+        game_map.state.register_players(
+            [self.get_player_by_id(i).name for i in range(len(self.players))]
+        )
+        game_map.state.kernels = self.kernels
+        for p in self.players:
+            p.state = game_map.state
         return game_map
 
     def draft_phase(self, player: Player):
@@ -164,22 +331,18 @@ class Game:
             1. Cards sets
             2. Deploy troops on territories
         """
-        self.game_phase = "DRAFT"
-
-        # TODO CARD system
+        if self.active_player is not player or self.game_phase != "DRAFT":
+            self.active_player = player
+            self.game_phase = "DRAFT"
+            self.troops_to_deploy = self.get_deployment_troops(player)
 
-        troops_to_deploy = self.get_deployment_troops(player)
+        self.card_phase(player)
 
-        while troops_to_deploy > 0:
+        while self.troops_to_deploy > 0:
             # Doing random for now. Need to plug in player methods.
-            deploying = player.draft_choose_troops_to_deploy(troops_to_deploy)
+            deploying = player.draft_choose_troops_to_deploy(self.troops_to_deploy)
             territory = player.draft_choose_territory_to_deploy()
-            territory.add_troops(deploying)
-            troops_to_deploy -= deploying
-            logger.debug(
-                f"{player.name} deployed {deploying} troops in {territory.name}"
-            )
-            # time.sleep(PAUSE_BTW_ACTIONS)
+            self.apply_action(Deploy(territory.id_, deploying))
 
     def get_deployment_troops(self, player: Player, card_troops=0):
         """
@@ -189,210 +352,392 @@ class Game:
             3. Continents
         """
 
-        territory_count = max(3, len(player.controlled_territories) // 3)
-        continent_count = 0
-        for continent in self.game_map.continents:
-            if continent.is_controlled_by(player):
-                continent_count += continent.troops_rewards
+        territory_count = max(3, player.territory_count // 3)
+        continent_count = player.continents_troops_reward
         result = card_troops + territory_count + continent_count
-        logger.debug(
-            f"{player.name} got {result} troops to deploy. {card_troops} from cards. {territory_count} from territories. {continent_count} from continents."
-        )
+        if self.events.debug:
+            self.events.emit(
+                DEBUG,
+                "deployment_troops",
+                player=player.name,
+                troops=result,
+                cards=card_troops,
+                territories=territory_count,
+                continents=continent_count,
+            )
         return result
 
-    def setup_attack_phase(self, player: Player):
-        self.game_phase = "ATTACK"
-
-        if not self.has_valid_attack(player):
-            return
+    def _emit_attack(self, player, attacker, target, attack_dice_nb, blitz):
+        self.events.emit(
+            DEBUG,
+            "attack",
+            player=player.name,
+            source=attacker.name,
+            target=target.name,
+            dices=attack_dice_nb,
+            blitz=blitz,
+        )
 
-    def perform_attack(self, player: Player, attacker: Territory, target: Territory):
-        attack_dice_nb, blitz = player.attack_choose_attack_dices(attacker.troops)
+    def _emit_attack_result(self, attack_remaining, defender_remaining):
+        self.events.emit(
+            DEBUG,
+            "attack_result",
+            attack_remaining=int(attack_remaining),
+            defender_remaining=int(defender_remaining),
+        )
 
-        # Sanity checks
-        is_valid = roll_dices_sanity_checks(player, attacker, target, attack_dice_nb)
-        logger.debug(
-            f"{player.name} trying to attack from {attacker.name} to {target.name} with {attack_dice_nb} troops. Blitz? {blitz}"
+    def blitz(self, attacker: Territory, target: Territory, attack_dice_nb: int):
+        """
+        Roll until the target or the attacker runs out of troops, in a single draw
+        Returns tuple: (attack_remaining, defender_remaining, attack_dice_nb of the last roll)
+        """
+        attack_remaining, defender_remaining = self.blitz_resolver.resolve(
+            attacker.troops, target.troops, attack_dice_nb, self.dice
         )
-        # time.sleep(PAUSE_BTW_ACTIONS)
-        if not is_valid:
+        attacker.set_troops(attack_remaining)
+        target.set_troops(defender_remaining)
+        return (
+            attack_remaining,
+            defender_remaining,
+            min(attack_dice_nb, attack_remaining - 1),
+        )
+
+    def _attack(self, player: Player, action: Attack):
+        """
+        Rolls the dices of a validated attack, and conquers the target if it fell.
+        The one attack path, shared by apply_action & apply
+        Returns tuple: (attack_remaining, defender_remaining, attack_dice_nb of the last roll,
+        (defender, position, eliminated) of the conquest or None)
+        """
+        game_map = self.game_map
+        attacker = game_map.get_territory_from_id(action.source_id)
+        target = game_map.get_territory_from_id(action.target_id)
+        attack_dice_nb = action.attack_dice_nb
+        if action.blitz:
+            attack_dice_nb = min(attack_dice_nb, attacker.troops - 1)
+        if not roll_dices_sanity_checks(player, attacker, target, attack_dice_nb):
             raise ValueError(
-                f"Invalid attack: {attack_dice_nb} dices with {attacker.troops} troops."
+                f"Invalid attack: {action} with {attacker.troops} troops by {player.name}"
             )
+        # Before any roll: a rejected attack leaves the board as is
+        if action.move is not None and not 1 <= action.move <= attacker.troops - 1:
+            raise ValueError(
+                f"Can't move {action.move} troops, must be between 1 and {attacker.troops - 1}"
+            )
+        if self.events.debug:
+            self._emit_attack(player, attacker, target, attack_dice_nb, action.blitz)
 
-        defender_remaining = target.troops
-
-        if blitz:
-            while defender_remaining > 0 and attack_dice_nb > 0:
-                if not roll_dices_sanity_checks(
-                    player, attacker, target, attack_dice_nb
-                ):
-                    attack_dice_nb -= 1
-                    continue
-                attacker_loss, defender_loss = attack_once(
-                    player, attacker, target, attack_dice_nb, self.true_random
-                )
-                attack_remaining = attacker.remove_troops(attacker_loss)
-                defender_remaining = target.remove_troops(defender_loss)
-            logger.debug(f"Remaining: A: {attack_remaining}, D: {defender_remaining}")
-            # time.sleep(PAUSE_BTW_ACTIONS)
-
+        if action.blitz:
+            attack_remaining, defender_remaining, attack_dice_nb = self.blitz(
+                attacker, target, attack_dice_nb
+            )
         else:
             attacker_loss, defender_loss = attack_once(
-                player, attacker, target, attack_dice_nb, self.true_random
+                player, attacker, target, attack_dice_nb, self.true_random, self.dice
             )
             attack_remaining = attacker.remove_troops(attacker_loss)
             defender_remaining = target.remove_troops(defender_loss)
-            logger.debug(f"Remaining: A: {attack_remaining}, D: {defender_remaining}")
-            # time.sleep(PAUSE_BTW_ACTIONS)
+        if self.events.debug:
+            self._emit_attack_result(attack_remaining, defender_remaining)
 
-        return attack_remaining, defender_remaining, attack_dice_nb
-
-    def after_attack(self, attack_info: dict):
-        (
-            attack_remaining,
-            defender_remaining,
-            target,
-            attacker,
-            player,
-            attack_dice_nb,
-        ) = (
-            attack_info["attack_remaining"],
-            attack_info["defender_remaining"],
-            attack_info["target"],
-            attack_info["attacker"],
-            attack_info["player"],
-            attack_info["attack_dice_nb"],
-        )
+        conquest = None
         if defender_remaining == 0:
-            logger.debug(f"{player.name} conquered {target.name}")
-            # Update ownership
-            target_player = self.get_player_by_name(target.occupying_player_name)
-            target_player.remove_territory(target)
-            player.assign_territory(target)
-
-            # Move attaker troops
-            # We move a minimum of (remaining_troops -1, attack_dice_nb)
-            min_to_move = min(attack_dice_nb, attack_remaining - 1)
-            max_to_move = attack_remaining - 1
+            conquest = self._conquer(
+                player, attacker, target, attack_dice_nb, action.move
+            )
+        return attack_remaining, defender_remaining, attack_dice_nb, conquest
 
+    def _conquer(
+        self,
+        player: Player,
+        attacker: Territory,
+        target: Territory,
+        attack_dice_nb: int,
+        moving: int = None,
+    ):
+        """
+        The target fell: ownership change, troops move in, and the defender dies if it was its last territory
+        moving: troops moved into the target, the maximum if None. Already checked against the troops
+        before the attack, so clamped here to what the rolls left
+        Returns tuple: (defender, position of the target in the defender's territories, eliminated)
+        """
+        # Move attaker troops
+        # We move a minimum of (remaining_troops -1, attack_dice_nb)
+        attack_remaining = attacker.troops
+        min_to_move = min(attack_dice_nb, attack_remaining - 1)
+        max_to_move = attack_remaining - 1
+        if moving is None:
             # For now we move the maximum we can
-            mooving = max_to_move
-            attacker.remove_troops(mooving)
-            target.add_troops(mooving)
+            moving = max_to_move
+        else:
+            moving = min(max(moving, min_to_move), max_to_move)
+
+        if self.events.debug:
+            self.events.emit(DEBUG, "conquer", player=player.name, target=target.name)
+        # Update ownership
+        target_player = self.get_player_by_id(target.owner_id)
+        position = target_player.remove_territory(target)
+        player.assign_territory(target)
+        attacker.remove_troops(moving)
+        target.add_troops(moving)
+
+        # If we killed the target
+        eliminated = target_player.territory_count == 0
+        if eliminated:
+            target_player.is_dead = True
+            for card_type, count in enumerate(target_player.cards):
+                player.cards[card_type] += count
+            target_player.cards = [0] * len(target_player.cards)
+            self.remaining_players.remove(target_player)
+        return target_player, position, eliminated
+
+    def apply_action(self, action) -> ActionResult:
+        """
+        Plays an action of game/actions.py for the active player, in its phase:
+            . TradeCards: DRAFT, adds the trade-in bonus to troops_to_deploy
+            . Deploy: DRAFT, at most troops_to_deploy
+            . Attack: ATTACK
+            . Fortify: FORTIFY, between territories linked by the player's territories. Ends the turn
+            . EndPhase: DRAFT (once every troop is deployed & the hand is under MUST_TRADE_CARDS)
+              -> ATTACK -> FORTIFY -> next player's DRAFT
+        Raises ValueError if the action isn't legal
+        """
+        player = self.active_player
+        if self.events.debug:
+            self.events.emit(
+                DEBUG, "action", player=player.name, action=type(action).__name__
+            )
+        result = ActionResult(action)
+
+        if isinstance(action, Deploy):
+            if self.game_phase != "DRAFT":
+                raise ValueError(f"Can't deploy in phase {self.game_phase}")
+            territory = self.game_map.get_territory_from_id(action.territory_id)
+            if not player.owns(territory.id_):
+                raise ValueError(f"{player.name} doesn't own {territory.name}")
+            if not 1 <= action.troops <= self.troops_to_deploy:
+                raise ValueError(
+                    f"Can't deploy {action.troops} troops, {self.troops_to_deploy} left"
+                )
+            territory.add_troops(action.troops)
+            self.troops_to_deploy -= action.troops
+            if self.events.debug:
+                self.events.emit(
+                    DEBUG,
+                    "deploy",
+                    player=player.name,
+                    territory=territory.name,
+                    troops=action.troops,
+                )
+
+        elif isinstance(action, TradeCards):
+            if self.game_phase != "DRAFT":
+                raise ValueError(f"Can't trade cards in phase {self.game_phase}")
+            self._trade_cards(player, action.cards)
+
+        elif isinstance(action, Attack):
+            if self.game_phase != "ATTACK":
+                raise ValueError(f"Can't attack in phase {self.game_phase}")
+            (
+                result.attack_remaining,
+                result.defender_remaining,
+                result.attack_dice_nb,
+                conquest,
+            ) = self._attack(player, action)
+            if conquest is not None:
+                result.conquered = True
+                result.eliminated = conquest[2]
+                self.conquered_this_turn = True
+
+        elif isinstance(action, Fortify):
+            if self.game_phase != "FORTIFY":
+                raise ValueError(f"Can't fortify in phase {self.game_phase}")
+            self._fortify(player, action)
+            self.next_turn()
+
+        elif isinstance(action, EndPhase):
+            if self.game_phase == "DRAFT":
+                if self.troops_to_deploy > 0:
+                    raise ValueError(f"{self.troops_to_deploy} troops left to deploy")
+                if sum(player.cards) >= MUST_TRADE_CARDS:
+                    raise ValueError(f"{player.name} must trade cards in")
+            if self.game_phase == "FORTIFY":
+                self.next_turn()
+            else:
+                self.next_phase()
+
+        else:
+            raise ValueError(f"Unknown action {action}")
+
+        result.game_phase = self.game_phase
+        result.game_over = self.is_game_over()
+        return result
 
-            # If we killed the target
-            if len(target_player.controlled_territories) == 0:
-                target_player.is_dead = True
+    def _trade_cards(self, player: Player, cards: tuple):
+        if not is_set(cards):
+            raise ValueError(f"Not a set of cards: {cards}")
+        hand = player.cards
+        if any(count > held for count, held in zip(cards, hand)):
+            raise ValueError(f"{player.name} doesn't have {cards}, only {hand}")
+        for card_type, count in enumerate(cards):
+            hand[card_type] -= count
+        self.deck.discard(cards)
+        bonus = trade_in_bonus(self.sets_traded)
+        self.sets_traded += 1
+        self.troops_to_deploy += bonus
+        if self.events.debug:
+            self.events.emit(
+                DEBUG, "trade_cards", player=player.name, cards=cards, troops=bonus
+            )
+
+    def draw_card(self, player: Player):
+        card_type = self.deck.draw(self.rng)
+        if card_type is None:
+            return
+        player.cards[card_type] += 1
+        if self.events.debug:
+            self.events.emit(DEBUG, "draw_card", player=player.name, card=card_type)
+
+    def _fortify(self, player: Player, action: Fortify):
+        game_map = self.game_map
+        source = game_map.get_territory_from_id(action.source_id)
+        target = game_map.get_territory_from_id(action.target_id)
+        if not (player.owns(source.id_) and player.owns(target.id_)):
+            raise ValueError(f"{player.name} must own both territories of {action}")
+        if source.id_ == target.id_ or not game_map.state.connected(
+            source.id_, target.id_
+        ):
+            raise ValueError(f"Can't fortify {target.name} from {source.name}")
+        if not 1 <= action.troops <= source.troops - 1:
+            raise ValueError(
+                f"Can't move {action.troops} troops out of {source.troops} from {source.name}"
+            )
+        source.remove_troops(action.troops)
+        target.add_troops(action.troops)
+        if self.events.debug:
+            self.events.emit(
+                DEBUG,
+                "fortify",
+                player=player.name,
+                source=source.name,
+                target=target.name,
+                troops=action.troops,
+            )
 
-                # TODO transfer cards
+    def _get_rng_state(self):
+        if isinstance(self.dice, DicePool):
+            return self.dice.get_state()
+        return self.rng.bit_generator.state
 
-        self.remaining_players = [
-            player for player in self.players if not player.is_dead
-        ]
+    def _set_rng_state(self, rng_state):
+        # In place, players share the generator
+        if isinstance(self.dice, DicePool):
+            self.dice.set_state(rng_state)
+        else:
+            self.rng.bit_generator.state = rng_state
+
+    def apply(self, action) -> Delta:
+        """
+        Plays a Deploy or Attack (see game/actions.py) for the owner of the territory, whatever the phase.
+        Returns the Delta to give to undo() to revert it
+        """
+        game_map = self.game_map
+        rng_state = self._get_rng_state()
+
+        if isinstance(action, Deploy):
+            territory = game_map.get_territory_from_id(action.territory_id)
+            if territory.owner_id == NO_OWNER or action.troops < 1:
+                raise ValueError(f"Invalid deploy: {action}")
+            delta = Delta(
+                action,
+                territory.owner_id,
+                (territory.id_,),
+                (territory.troops,),
+                rng_state,
+            )
+            territory.add_troops(action.troops)
+            return delta
+
+        if not isinstance(action, Attack):
+            raise ValueError(f"Unknown action {action}")
+
+        attacker = game_map.get_territory_from_id(action.source_id)
+        target = game_map.get_territory_from_id(action.target_id)
+        player = self.get_player_by_id(attacker.owner_id)
+        delta = Delta(
+            action,
+            player.id_,
+            (attacker.id_, target.id_),
+            (attacker.troops, target.troops),
+            rng_state,
+        )
+        if target.owner_id != NO_OWNER:
+            # Handed over if the defender gets eliminated
+            delta.defender_cards = tuple(self.get_player_by_id(target.owner_id).cards)
+        delta.attack_remaining, delta.defender_remaining, _, conquest = self._attack(
+            player, action
+        )
+        if conquest is not None:
+            target_player, delta.previous_position, delta.eliminated = conquest
+            delta.previous_owner = target_player.id_
+        return delta
+
+    def undo(self, delta: Delta):
+        """
+        Reverts the last applied action. Deltas must be undone in reverse order
+        """
+        game_map = self.game_map
+        if delta.conquered:
+            target = game_map.get_territory_from_id(delta.territory_ids[1])
+            self.get_player_by_id(delta.player_id).remove_territory(target)
+            target_player = self.get_player_by_id(delta.previous_owner)
+            target_player.assign_territory(target, delta.previous_position)
+            if delta.eliminated:
+                target_player.is_dead = False
+                self.remaining_players = [p for p in self.players if not p.is_dead]
+                player = self.get_player_by_id(delta.player_id)
+                for card_type, count in enumerate(delta.defender_cards):
+                    player.cards[card_type] -= count
+                target_player.cards = list(delta.defender_cards)
+        for t_id, troops in zip(delta.territory_ids, delta.troops):
+            game_map.get_territory_from_id(t_id).set_troops(troops)
+        self._set_rng_state(delta.rng_state)
 
     def attack_phase(self, player: Player):
         """
         For bot so far: choose randomly 1 territory to attack another
-        The sanity checks are out of the random choice, for later implementation
         """
+        self.active_player = player
         self.game_phase = "ATTACK"
 
         if not self.has_valid_attack(player):
-            logger.debug(f"You do not have any valid attack")
+            if self.events.debug:
+                self.events.emit(DEBUG, "no_valid_attack", player=player.name)
             return
 
         time_remaining = 100  # TODO: implement time function at some point
-        while time_remaining > 0 and len(self.get_remaining_players()) > 1:
+        while time_remaining > 0 and len(self.remaining_players) > 1:
             if not self.has_valid_attack(player):
                 break
             if not player.attack_wants_attack():
-                logger.debug(f"{player.name} does not want to attack")
+                if self.events.debug:
+                    self.events.emit(DEBUG, "stop_attack", player=player.name)
                 break
 
             attacker = player.attack_choose_attack_territory()
             self.attacking_territory = attacker
+            self.apply_action(self.choose_attack(player, attacker))
 
-            # ***
-            target_name = player.attack_choose_target_territory(attacker)
-            target = self.game_map.get_territory_from_name(target_name)
-            # ***
-
-            attack_dice_nb, blitz = player.attack_choose_attack_dices(attacker.troops)
-
-            if blitz:
-                attack_dice_nb = min(attacker.troops, 3)
-
-            # Sanity checks
-            is_valid = roll_dices_sanity_checks(
-                player, attacker, target, attack_dice_nb
-            )
-            logger.debug(
-                f"{player.name} trying to attack from {attacker.name} to {target.name} with {attack_dice_nb} troops. Blitz? {blitz}"
-            )
-            # time.sleep(PAUSE_BTW_ACTIONS)
-            if not is_valid:
-                continue
-
-            defender_remaining = target.troops
-
-            if blitz:
-                while defender_remaining > 0 and attack_dice_nb > 0:
-                    if not roll_dices_sanity_checks(
-                        player, attacker, target, attack_dice_nb
-                    ):
-                        attack_dice_nb -= 1
-                        continue
-                    attacker_loss, defender_loss = attack_once(
-                        player, attacker, target, attack_dice_nb, self.true_random
-                    )
-                    attack_remaining = attacker.remove_troops(attacker_loss)
-                    defender_remaining = target.remove_troops(defender_loss)
-                logger.debug(
-                    f"Remaining: A: {attack_remaining}, D: {defender_remaining}"
-                )
-                # time.sleep(PAUSE_BTW_ACTIONS)
-
-            else:
-                attacker_loss, defender_loss = attack_once(
-                    player, attacker, target, attack_dice_nb, self.true_random
-                )
-                attack_remaining = attacker.remove_troops(attacker_loss)
-                defender_remaining = target.remove_troops(defender_loss)
-                logger.debug(
-                    f"Remaining: A: {attack_remaining}, D: {defender_remaining}"
-                )
-                # time.sleep(PAUSE_BTW_ACTIONS)
-
-            if defender_remaining == 0:
-                logger.debug(f"{player.name} conquered {target.name}")
-                # Update ownership
-                target_player = self.get_player_by_name(target.occupying_player_name)
-                target_player.remove_territory(target)
-                player.assign_territory(target)
-
-                # Move attaker troops
-                # We move a minimum of (remaining_troops -1, attack_dice_nb)
-                min_to_move = min(attack_dice_nb, attack_remaining - 1)
-                max_to_move = attack_remaining - 1
-
-                # For now we move the maximum we can
-                mooving = max_to_move
-                attacker.remove_troops(mooving)
-                target.add_troops(mooving)
-
-                # If we killed the target
-                if len(target_player.controlled_territories) == 0:
-                    target_player.is_dead = True
-
-                    # TODO transfer cards
-
-                self.remaining_players = [
-                    player for player in self.players if not player.is_dead
-                ]
-
-    def attack(self, player: Player):
-        pass
+    def choose_attack(self, player: Player, attacker: Territory) -> Attack:
+        """
+        The player's choices of target & dices from attacker, as an action
+        """
+        target_name = player.attack_choose_target_territory(attacker)
+        target = self.game_map.get_territory_from_name(target_name)
+        attack_dice_nb, blitz = player.attack_choose_attack_dices(attacker.troops)
+        if blitz:
+            attack_dice_nb = MAX_ATTACK_DICES
+        return Attack(attacker.id_, target.id_, attack_dice_nb, blitz)
 
     def get_player_by_name(self, player_name):
         result = [p for p in self.players if p.name == player_name]
@@ -405,36 +750,39 @@ class Game:
         """
         True if there is at least 1 territory with 2 troops or more adjacent to another player's territory
         """
-        # Territories with more than 1 troop:
-        potential_attack_t = [t for t in player.controlled_territories if t.troops > 1]
-        if len(potential_attack_t) == 0:
-            return False
-
-        # If any has an adjacent territory that isn't controlled by player, then we have a valid attack possible
-        for t in potential_attack_t:
-            adjacent_territories_names = t.adjacent_territories_names
-            if any(
-                [
-                    adj_terr_name
-                    not in [p_t.name for p_t in player.controlled_territories]
-                    for adj_terr_name in adjacent_territories_names
-                ]
-            ):
-                return True
-        return False
+        return len(self.game_map.state.frontier(player.id_)) > 0
 
-    def fortify_phase(self, player):
+    def fortify_phase(self, player: Player):
+        """
+        For bots: at most 1 move between connected territories. Ends the turn
+        """
+        self.active_player = player
         self.game_phase = "FORTIFY"
 
-        pass
+        source = player.fortify_choose_from()
+        if source is None:
+            self.apply_action(EndPhase())
+            return
+        target = player.fortify_choose_to(source)
+        troops = player.fortify_choose_troops_nb(source, target)
+        self.apply_action(Fortify(source.id_, target.id_, troops))
 
-    def card_phase(self, player):
-        pass
+    def card_phase(self, player: Player):
+        """
+        For bots: trade sets in, at the start of the draft
+        """
+        cards = player.cards_choose_set()
+        while cards is not None:
+            self.apply_action(TradeCards(cards))
+            cards = player.cards_choose_set()
 
     def is_game_over(self):
         is_over = len(self.remaining_players) == 1
         if is_over:
-            logger.debug(f"{self.remaining_players[0].name} Won")
+            if self.events.debug:
+                self.events.emit(
+                    DEBUG, "game_over", winner=self.remaining_players[0].name
+                )
             return True
         return False
 
@@ -444,65 +792,40 @@ class Game:
         """
 
         while len(self.remaining_players) > 1:
-            for player in self.remaining_players:
-                self.active_player = player
-
-                if player.is_dead:
-                    continue
-
-                self.draft_phase(player)
-                self.attack_phase(player)
-                # self.fortify_phase(player)
-                # time.sleep(PAUSE_BTW_ACTIONS)
-                # self.card_phase(player)
-                # time.sleep(PAUSE_BTW_ACTIONS)
-                # self.render()
-                # time.sleep(PAUSE_BTW_ACTIONS)
-
-            self.remaining_players = [
-                player for player in self.players if not player.is_dead
-            ]
-            self.turn_number += 1
+            player = self.active_player
+            self.draft_phase(player)
+            self.attack_phase(player)
+            # self.render()
+            if len(self.remaining_players) > 1:
+                # On to the next player
+                self.fortify_phase(player)
 
     def play(self):
         """
         Start game loop for normal games
         """
-        self.init_players()
+        self.reset()
         # self.render()
 
-        remaining_players = self.players
-
-        while len(remaining_players) > 1:
-            for player in remaining_players:
-                self.active_player = player
-
-                if player.is_dead:
-                    continue
-
-                wait_for_cmd_action()
-                self.draft_phase(player)
-                # self.render()
+        while len(self.remaining_players) > 1:
+            player = self.active_player
+            wait_for_cmd_action()
+            self.draft_phase(player)
+            # self.render()
+            wait_for_cmd_action()
+            self.attack_phase(player)
+
+            # self.render()
+            if len(self.remaining_players) > 1:
                 wait_for_cmd_action()
-                self.attack_phase(player)
+                # On to the next player
+                self.fortify_phase(player)
 
-                # self.render()
-                # self.fortify_phase(player)
-                # time.sleep(PAUSE_BTW_ACTIONS)
-                # self.card_phase(player)
-                # time.sleep(PAUSE_BTW_ACTIONS)
-                # self.render()
-                # time.sleep(PAUSE_BTW_ACTIONS)
-
-            remaining_players = [
-                player for player in self.players if not player.is_dead
-            ]
-            self.turn_number += 1
-
-        logger.debug(f"Player: {remaining_players[0].name} Won!!")
+        if self.events.debug:
+            self.events.emit(DEBUG, "game_over", winner=self.remaining_players[0].name)
 
     def get_remaining_players(self):
-        return [player for player in self.players if not player.is_dead]
+        return list(self.remaining_players)
 
     def init_players(self):
         """
@@ -516,9 +839,12 @@ class Game:
         # Need to reset the original list order for seeding & deterministic behaviour
         player_list = [self.get_player_by_id(i) for i in range(len(self.players))]
         self.players = player_list
-        np.random.shuffle(self.players)
+        self.rng.shuffle(self.players)
 
-        logger.debug(f"Player order: {[p.name for p in self.players]}")
+        if self.events.debug:
+            self.events.emit(
+                DEBUG, "player_order", players=[p.name for p in self.players]
+            )
 
         self.active_player = self.players[0]
         self.active_player_idx = 0
@@ -530,7 +856,7 @@ class Game:
         i = 0
         while len(unassigned_territories) > 1:
             unassigned_territories = self.game_map.get_unassigned_territories()
-            t = np.random.choice(unassigned_territories)
+            t = unassigned_territories[self.rng.integers(len(unassigned_territories))]
             self.players[i].assign_territory(t)
 
             # Assign 1 troop
@@ -543,11 +869,12 @@ class Game:
 
         # Assign remaining troops randomly
         for player in self.players:
-            p_remaining_troops = starting_troops - len(
-                player.controlled_territories
-            )  # We already put 1 troop on each
+            # We already put 1 troop on each
+            p_remaining_troops = starting_troops - player.territory_count
             while p_remaining_troops > 0:
-                t = np.random.choice(player.controlled_territories)
+                t = player.controlled_territories[
+                    self.rng.integers(player.territory_count)
+                ]
                 t.add_troops(1)
                 p_remaining_troops -= 1
 
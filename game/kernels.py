@@ -0,0 +1,215 @@
+"""
+Inner loops of the engine over integer arrays, JIT compiled with numba when it's installed
+(pip install numba, or the "jit" extra). Without it, the same functions run as plain python / numpy.
+
+Randomness is never drawn inside a kernel: dice come in as encoded rolls (see dice_rolls.draw_rolls),
+so both backends give exactly the same results for the same seed.
+
+    kernels = get_kernels("auto")  # "numba" when available, "python" otherwise
+    roll_battles(attack_troops, defend_troops, attack_dice_cap, blitz, rng, kernels)
+"""
+
+import functools
+from types import SimpleNamespace
+
+import numpy as np
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+from game.dice_rolls import (
+    MAX_DEFEND_DICES,
+    _ATTACK_LOSSES,
+    _DEFENDER_LOSSES,
+    draw_rolls,
+)
+
+BACKENDS = ("python", "numba")
+
+
+def battle_offsets(attack_troops, defend_troops, blitz):
+    """
+    Each battle gets its own slice of the rolls, as long as the most rolls it can use:
+    every roll removes at least 1 troop, and a battle without blitz rolls once.
+    Returns tuple: (offsets (n,) of each slice, total number of rolls to draw)
+    """
+    bounds = np.where(
+        blitz,
+        np.maximum(attack_troops - 1, 0) + np.maximum(defend_troops, 0),
+        1,
+    )
+    offsets = np.zeros(len(bounds), dtype=np.int64)
+    np.cumsum(bounds[:-1], out=offsets[1:])
+    return offsets, int(bounds.sum())
+
+
+def _resolve_battles_loop(
+    attack_troops,
+    defend_troops,
+    attack_dice_cap,
+    blitz,
+    rolls,
+    offsets,
+    attack_losses,
+    defend_losses,
+):
+    for i in range(len(attack_troops)):
+        a = attack_troops[i]
+        d = defend_troops[i]
+        position = offsets[i]
+        while a > 1 and d > 0:
+            attack_dice = min(attack_dice_cap[i], a - 1)
+            defend_dice = min(d, MAX_DEFEND_DICES)
+            roll = rolls[position]
+            position += 1
+            a -= attack_losses[attack_dice, defend_dice, roll]
+            d -= defend_losses[attack_dice, defend_dice, roll]
+            if not blitz[i]:
+                break
+        attack_troops[i] = a
+        defend_troops[i] = d
+
+
+def _resolve_battles_numpy(
+    attack_troops,
+    defend_troops,
+    attack_dice_cap,
+    blitz,
+    rolls,
+    offsets,
+    attack_losses,
+    defend_losses,
+):
+    # Every battle still going rolls at the same time, round after round
+    fighting = np.flatnonzero((attack_troops > 1) & (defend_troops > 0))
+    position = offsets[fighting]
+    while len(fighting):
+        a = attack_troops[fighting]
+        d = defend_troops[fighting]
+        attack_dice = np.minimum(attack_dice_cap[fighting], a - 1)
+        defend_dice = np.minimum(d, MAX_DEFEND_DICES)
+        roll = rolls[position]
+        a = a - attack_losses[attack_dice, defend_dice, roll]
+        d = d - defend_losses[attack_dice, defend_dice, roll]
+        attack_troops[fighting] = a
+        defend_troops[fighting] = d
+        going = blitz[fighting] & (a > 1) & (d > 0)
+        fighting = fighting[going]
+        position = position[going] + 1
+
+
+def _enemy_neighbor_counts_loop(owners, indptr, indices):
+    num_territories = len(owners)
+    counts = np.zeros(num_territories, dtype=np.int64)
+    for t in range(num_territories):
+        for k in range(indptr[t], indptr[t + 1]):
+            if owners[indices[k]] != owners[t]:
+                counts[t] += 1
+    return counts
+
+
+def _enemy_neighbor_counts_numpy(owners, indptr, indices):
+    sources = np.repeat(np.arange(len(owners)), np.diff(indptr))
+    return np.bincount(
+        sources[owners[indices] != owners[sources]], minlength=len(owners)
+    ).astype(np.int64)
+
+
+def _deployment_income_loop(
+    owners, player_ids, territory_continents, continent_sizes, continent_rewards
+):
+    n, num_territories = owners.shape
+    num_continents = len(continent_sizes)
+    income = np.zeros(n, dtype=np.int64)
+    counts = np.zeros(num_continents, dtype=np.int64)
+    for g in range(n):
+        counts[:] = 0
+        territories = 0
+        for t in range(num_territories):
+            if owners[g, t] == player_ids[g]:
+                territories += 1
+                counts[territory_continents[t]] += 1
+        income[g] = max(3, territories // 3)
+        for c in range(num_continents):
+            if counts[c] == continent_sizes[c]:
+                income[g] += continent_rewards[c]
+    return income
+
+
+def _deployment_income_numpy(
+    owners, player_ids, territory_continents, continent_sizes, continent_rewards
+):
+    n = len(owners)
+    num_continents = len(continent_sizes)
+    owned = owners == player_ids[:, None]
+    flat = (np.arange(n)[:, None] * num_continents + territory_continents)[owned]
+    counts = np.bincount(flat, minlength=n * num_continents).reshape(n, num_continents)
+    return np.maximum(3, owned.sum(axis=1) // 3) + (
+        counts == continent_sizes
+    ) @ np.asarray(continent_rewards, dtype=np.int64)
+
+
+def has_numba() -> bool:
+    return numba is not None
+
+
+@functools.lru_cache(maxsize=None)
+def get_kernels(backend: str = "auto") -> SimpleNamespace:
+    """
+    Kernels of a backend:
+        . resolve_battles(attack_troops, defend_troops, attack_dice_cap, blitz, rolls, offsets,
+          attack_losses, defend_losses): resolves battles in place on the troops arrays (n,).
+          Each roll uses min(attack_dice_cap, attacker troops - 1) dices, blitz battles roll until
+          the defender is out or the attacker is down to 1 troop, the others roll once.
+          Battle i uses rolls[offsets[i]:], see battle_offsets
+        . enemy_neighbor_counts(owners (t,), indptr, indices) -> (t,) like GameState.enemy_neighbor_counts
+        . deployment_income(owners (n, t), player_ids (n,), territory_continents, continent_sizes,
+          continent_rewards) -> (n,) like Game.get_deployment_troops without cards
+    Compiled on first call, and cached on disk by numba
+    """
+    if backend == "auto":
+        backend = "numba" if has_numba() else "python"
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend}. Use one of {BACKENDS}")
+
+    if backend == "python":
+        return SimpleNamespace(
+            backend=backend,
+            resolve_battles=_resolve_battles_numpy,
+            enemy_neighbor_counts=_enemy_neighbor_counts_numpy,
+            deployment_income=_deployment_income_numpy,
+        )
+
+    if not has_numba():
+        raise ImportError("The numba backend needs numba: pip install numba")
+    jit = numba.njit(cache=True, nogil=True)
+    return SimpleNamespace(
+        backend=backend,
+        resolve_battles=jit(_resolve_battles_loop),
+        enemy_neighbor_counts=jit(_enemy_neighbor_counts_loop),
+        deployment_income=jit(_deployment_income_loop),
+    )
+
+
+def roll_battles(
+    attack_troops, defend_troops, attack_dice_cap, blitz, rng=None, kernels=None
+):
+    """
+    Draws the rolls & resolves the battles in place, see resolve_battles in get_kernels
+    rng: np.random.Generator or DicePool, process default generator if None
+    """
+    if kernels is None:
+        kernels = get_kernels()
+    offsets, num_rolls = battle_offsets(attack_troops, defend_troops, blitz)
+    kernels.resolve_battles(
+        attack_troops,
+        defend_troops,
+        attack_dice_cap,
+        blitz,
+        draw_rolls(rng, num_rolls),
+        offsets,
+        _ATTACK_LOSSES,
+        _DEFENDER_LOSSES,
+    )
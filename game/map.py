@@ -1,42 +1,427 @@
+import functools
+import json
+import os
+import struct
+import zipfile
+from dataclasses import dataclass
+
+import numpy as np
+
 from game.territory import Territory
 from game.continent import Continent
+from game.state import GameState, NO_OWNER
+
+MAPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "maps")
+
+
+def build_adjacency(adjacent_ids: list[list[int]]):
+    """
+    Adjacency over territory ids, from the list of neighbor ids of each territory
+    Returns tuple: (indptr, indices, matrix)
+        . CSR arrays: neighbors of t are indices[indptr[t]:indptr[t + 1]]
+        . dense (t, t) boolean matrix
+    """
+    num_territories = len(adjacent_ids)
+    indptr = np.zeros(num_territories + 1, dtype=np.int64)
+    indptr[1:] = np.cumsum([len(ids) for ids in adjacent_ids])
+    indices = np.array(
+        [i for ids in adjacent_ids for i in ids], dtype=np.int64
+    ).reshape(-1)
+    matrix = np.zeros((num_territories, num_territories), dtype=np.bool_)
+    matrix[np.repeat(np.arange(num_territories), np.diff(indptr)), indices] = True
+    return indptr, indices, matrix
+
+
+@dataclass(frozen=True, eq=False)
+class MapTopology:
+    """
+    Everything about a map that never changes during a game.
+    Parsed once per process and shared by every game, arrays are read only.
+    Can be saved to / memory-mapped from a compiled .npz file (see game/map_compiler.py)
+    """
+
+    name: str
+    max_players: int
+    territory_names: np.ndarray  # (t,) str
+    adjacency_indptr: np.ndarray  # (t + 1,) CSR, see build_adjacency
+    adjacency_indices: np.ndarray
+    continent_names: np.ndarray  # (c,) str
+    continent_masks: np.ndarray  # (c, t) bool, territories inside each continent
+    continent_rewards: np.ndarray  # (c,) int
+    repr: str
+
+    # Fields stored in compiled files, in this order
+    ARRAYS = (
+        "territory_names",
+        "adjacency_indptr",
+        "adjacency_indices",
+        "continent_names",
+        "continent_masks",
+        "continent_rewards",
+    )
+
+    @property
+    def num_territories(self):
+        return len(self.territory_names)
+
+    @property
+    def num_continents(self):
+        return len(self.continent_names)
+
+    @functools.cached_property
+    def adjacency_matrix(self):
+        """
+        Dense (t, t) boolean matrix, only built when needed as it grows quadratically
+        """
+        num_territories = self.num_territories
+        matrix = np.zeros((num_territories, num_territories), dtype=np.bool_)
+        matrix[
+            np.repeat(np.arange(num_territories), np.diff(self.adjacency_indptr)),
+            self.adjacency_indices,
+        ] = True
+        matrix.flags.writeable = False
+        return matrix
+
+    @functools.cached_property
+    def neighbor_ids(self):
+        """
+        Neighbor ids of each territory as python lists, shared by every game on the map: don't modify them
+        """
+        indptr = self.adjacency_indptr.tolist()
+        indices = self.adjacency_indices.tolist()
+        return tuple(
+            indices[indptr[i] : indptr[i + 1]] for i in range(self.num_territories)
+        )
+
+    @functools.cached_property
+    def edge_sources(self):
+        """
+        (e,) source territory of each CSR edge
+        """
+        sources = np.repeat(
+            np.arange(self.num_territories), np.diff(self.adjacency_indptr)
+        )
+        sources.flags.writeable = False
+        return sources
+
+    @functools.cached_property
+    def adjacent_territories_names(self):
+        names = self.territory_names.tolist()
+        indptr = self.adjacency_indptr.tolist()
+        indices = self.adjacency_indices.tolist()
+        return tuple(
+            tuple(names[j] for j in indices[indptr[i] : indptr[i + 1]])
+            for i in range(self.num_territories)
+        )
+
+    @functools.cached_property
+    def territory_continents(self):
+        """
+        (t,) continent id of each territory
+        """
+        return self.continent_masks.argmax(axis=0)
+
+    @functools.cached_property
+    def continent_sizes(self):
+        return self.continent_masks.sum(axis=1)
+
+    @functools.cached_property
+    def continent_territory_ids(self):
+        return tuple(
+            tuple(np.flatnonzero(mask).tolist()) for mask in self.continent_masks
+        )
+
+    @classmethod
+    def from_metadata(cls, map_metadata: dict, name: str = None):
+        """
+        Build from the content of a map json file
+        """
+        territory_names = list(map_metadata["territories"].keys())
+        ids = {name: i for i, name in enumerate(territory_names)}
+        indptr, indices, _ = build_adjacency(
+            [
+                [ids[name] for name in t_data["adjacent_territories_names"]]
+                for t_data in map_metadata["territories"].values()
+            ]
+        )
+
+        continents = map_metadata["continents"]
+        continent_masks = np.zeros((len(continents), len(ids)), dtype=np.bool_)
+        for i, c_data in enumerate(continents.values()):
+            continent_masks[i, [ids[t] for t in c_data["territories"]]] = True
+
+        return cls.from_arrays(
+            name=name or map_metadata["name"],
+            max_players=map_metadata["max_players"],
+            territory_names=np.array(territory_names, dtype=np.str_),
+            adjacency_indptr=indptr,
+            adjacency_indices=indices,
+            continent_names=np.array(list(continents.keys()), dtype=np.str_),
+            continent_masks=continent_masks,
+            continent_rewards=np.array(
+                [c_data["troops_reward"] for c_data in continents.values()],
+                dtype=np.int64,
+            ),
+            repr=map_metadata["repr"],
+        )
+
+    @classmethod
+    def from_arrays(cls, **fields):
+        for key in cls.ARRAYS:
+            if fields[key].flags.writeable:
+                fields[key].flags.writeable = False
+        return cls(**fields)
+
+    def to_npz(self, path: str):
+        """
+        Uncompressed on purpose: members of the archive can then be memory-mapped
+        """
+        np.savez(
+            path,
+            name=np.array(self.name),
+            max_players=np.array(self.max_players),
+            repr=np.array(self.repr),
+            **{key: getattr(self, key) for key in self.ARRAYS},
+        )
+
+    @classmethod
+    def from_npz(cls, path: str, mmap: bool = True):
+        """
+        With mmap, the arrays are read only views of the file, shared between processes by the OS
+        """
+        if mmap:
+            data = _memmap_npz(path)
+        else:
+            with np.load(path) as archive:
+                data = {key: archive[key] for key in archive.files}
+        return cls.from_arrays(
+            name=str(data["name"]),
+            max_players=int(data["max_players"]),
+            repr=str(data["repr"]),
+            **{key: data[key] for key in cls.ARRAYS},
+        )
+
+
+def _memmap_npz(path: str) -> dict:
+    """
+    np.load can't memory-map the members of an .npz. Uncompressed members are plain .npy files
+    stored as is inside the zip though, so we map them at their offset in the archive.
+    """
+    arrays = {}
+    with zipfile.ZipFile(path) as archive, open(path, "rb") as f:
+        for info in archive.infolist():
+            if info.compress_type != zipfile.ZIP_STORED:
+                raise ValueError(f"{path} is compressed, it can't be memory-mapped")
+            # Local file header: 30 bytes, then file name & extra field
+            f.seek(info.header_offset)
+            local_header = f.read(30)
+            name_length, extra_length = struct.unpack("<HH", local_header[26:30])
+            f.seek(info.header_offset + 30 + name_length + extra_length)
+
+            version = np.lib.format.read_magic(f)
+            if version == (1, 0):
+                shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(f)
+            else:
+                shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(f)
+
+            key = info.filename[: -len(".npy")]
+            if len(shape) == 0 or 0 in shape:
+                # Scalars & empty arrays can't be mapped, and are tiny anyway
+                arrays[key] = np.fromfile(
+                    f, dtype=dtype, count=int(np.prod(shape))
+                ).reshape(shape)
+            else:
+                arrays[key] = np.memmap(
+                    path,
+                    dtype=dtype,
+                    mode="r",
+                    offset=f.tell(),
+                    shape=shape,
+                    order="F" if fortran_order else "C",
+                )
+    return arrays
+
+
+def get_map_paths(map_name: str):
+    """
+    map_name is either the name of a map of game/maps, or the path to a .json / .npz map file
+    Returns tuple: (json path, compiled path)
+    """
+    root, extension = os.path.splitext(map_name)
+    if extension in (".json", ".npz"):
+        return f"{root}.json", f"{root}.npz"
+    return (
+        os.path.join(MAPS_DIR, f"{map_name}.json"),
+        os.path.join(MAPS_DIR, f"{map_name}.npz"),
+    )
+
+
+@functools.lru_cache(maxsize=None)
+def load_map_topology(map_name: str) -> MapTopology:
+    """
+    Loads game/maps/<map_name>, once per process.
+    The compiled .npz is memory-mapped when present and not older than the json
+    """
+    json_path, compiled_path = get_map_paths(map_name)
+    if os.path.exists(compiled_path) and (
+        not os.path.exists(json_path)
+        or os.path.getmtime(compiled_path) >= os.path.getmtime(json_path)
+    ):
+        return MapTopology.from_npz(compiled_path)
+
+    if not os.path.exists(json_path):
+        raise ValueError(f"The map does not exist at {json_path}")
+    with open(json_path, "r") as map_file:
+        map_metadata = json.loads(map_file.read())
+    return MapTopology.from_metadata(
+        map_metadata, os.path.splitext(os.path.basename(map_name))[0]
+    )
 
 
 class Map:
     def __init__(
-        self, name, territories: list[Territory], continents: list[Continent]
+        self,
+        name,
+        territories: list[Territory],
+        continents: list[Continent],
+        topology: MapTopology = None,
     ) -> None:
         self.name = name
         self.territories = territories
         self.continents = continents
+        self.topology = topology
+        self._build_territory_indexes()
+        self._build_continent_indexes()
+
+        # Mutable board, territories are views over it
+        self.state = GameState(
+            len(territories),
+            self.adjacency_indptr,
+            self.adjacency_indices,
+            topology=topology,
+        )
+        for t in self.territories:
+            t.bind_state(self.state, t.id_)
+
+    @classmethod
+    def from_topology(cls, topology: MapTopology):
+        """
+        Creates the per game territories & continents, without any file access
+        """
+        territories = [
+            Territory(name, i, list(adjacent_names))
+            for i, (name, adjacent_names) in enumerate(
+                zip(
+                    topology.territory_names.tolist(),
+                    topology.adjacent_territories_names,
+                )
+            )
+        ]
+        continents = [
+            Continent(
+                name,
+                i,
+                [territories[t_id] for t_id in t_ids],
+                troops_reward=reward,
+            )
+            for i, (name, t_ids, reward) in enumerate(
+                zip(
+                    topology.continent_names.tolist(),
+                    topology.continent_territory_ids,
+                    topology.continent_rewards.tolist(),
+                )
+            )
+        ]
+        return cls(topology.name, territories, continents, topology=topology)
+
+    def _build_territory_indexes(self):
+        """
+        Built once at load time:
+            . name & id -> territory dicts
+            . adjacency over territory ids (see build_adjacency), shared with the topology if any
+        """
+        self._territories_by_name = {t.name: t for t in self.territories}
+        self._territories_by_id = {t.id_: t for t in self.territories}
+        assert len(self._territories_by_name) == len(self.territories)
+        assert len(self._territories_by_id) == len(self.territories)
+
+        if self.topology is not None:
+            self.adjacency_indptr = self.topology.adjacency_indptr
+            self.adjacency_indices = self.topology.adjacency_indices
+        else:
+            self.adjacency_indptr, self.adjacency_indices, self._adjacency_matrix = (
+                build_adjacency(
+                    [
+                        [
+                            self._territories_by_name[name].id_
+                            for name in self._territories_by_id[
+                                i
+                            ].adjacent_territories_names
+                        ]
+                        for i in range(len(self.territories))
+                    ]
+                )
+            )
+
+        if self.topology is not None:
+            for t, neighbor_ids in zip(self.territories, self.topology.neighbor_ids):
+                t.adjacent_ids = neighbor_ids
+            return
+        for t in self.territories:
+            t.adjacent_ids = self.get_neighbor_ids(t.id_).tolist()
+
+    @property
+    def adjacency_matrix(self):
+        """
+        Dense (t, t) boolean adjacency matrix
+        """
+        if self.topology is not None:
+            return self.topology.adjacency_matrix
+        return self._adjacency_matrix
+
+    def _build_continent_indexes(self):
+        self._continents_by_id = {c.id_: c for c in self.continents}
+        assert len(self._continents_by_id) == len(self.continents)
+
+    def reset(self):
+        """
+        Back to an empty board: no owner & no troops
+        """
+        self.state.reset()
 
     def get_unassigned_territories(self):
         """
         return the list of unassigned territories.
         Used in game setup phase.
         """
-        return [t for t in self.territories if t.occupying_player_name is None]
+        return [
+            self._territories_by_id[i]
+            for i in np.flatnonzero(self.state.owners == NO_OWNER).tolist()
+        ]
 
     def get_territory_from_name(self, name):
         """
         Returns the territory object
         """
-        result = [t for t in self.territories if t.name == name]
-        assert len(result) == 1
-        return result[0]
+        return self._territories_by_name[name]
 
     def get_territory_from_id(self, id_):
-        result = [t for t in self.territories if t.id_ == id_]
-        assert len(result) == 1
-        return result[0]
+        return self._territories_by_id[id_]
 
     def get_continent_from_id(self, id_):
-        result = [c for c in self.continents if c.id_ == id_]
-        assert len(result) == 1
-        return result[0]
+        return self._continents_by_id[id_]
+
+    def get_neighbor_ids(self, id_):
+        """
+        Array of the territory ids adjacent to territory id_
+        """
+        return self.adjacency_indices[
+            self.adjacency_indptr[id_] : self.adjacency_indptr[id_ + 1]
+        ]
 
     def update_continents(self, continents: list[Continent]):
         """
         Used at load time for convenience, after init
         """
         self.continents = continents
+        self._build_continent_indexes()
@@ -0,0 +1,69 @@
+"""
+Compiles json maps into binary .npz files, memory-mapped by load_map_topology when present.
+
+    python -m game.map_compiler              # every map in game/maps
+    python -m game.map_compiler test_map_v0  # by name
+    python -m game.map_compiler path/to/map.json -o path/to/map.npz
+"""
+
+import argparse
+import glob
+import json
+import os
+
+from game.map import MAPS_DIR, MapTopology
+
+
+def compile_map(json_path: str, output_path: str = None) -> str:
+    """
+    Returns the path of the compiled map
+    """
+    map_name = os.path.splitext(os.path.basename(json_path))[0]
+    if output_path is None:
+        output_path = os.path.join(os.path.dirname(json_path), f"{map_name}.npz")
+
+    with open(json_path, "r") as map_file:
+        map_metadata = json.loads(map_file.read())
+    topology = MapTopology.from_metadata(map_metadata, map_name)
+
+    # Write next to the target then rename, so readers never see a partial file
+    tmp_path = f"{output_path}.tmp.npz"
+    topology.to_npz(tmp_path)
+    os.replace(tmp_path, output_path)
+    return output_path
+
+
+def resolve_map_path(map_arg: str) -> str:
+    if map_arg.endswith(".json"):
+        return map_arg
+    return os.path.join(MAPS_DIR, f"{map_arg}.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compile json maps to .npz")
+    parser.add_argument(
+        "maps",
+        nargs="*",
+        help="Map names or json paths. Every map of game/maps if empty.",
+    )
+    parser.add_argument(
+        "-o",
+        "--output",
+        type=str,
+        help="Output path, only when compiling a single map",
+    )
+    args = parser.parse_args()
+
+    json_paths = [resolve_map_path(m) for m in args.maps] or sorted(
+        glob.glob(os.path.join(MAPS_DIR, "*.json"))
+    )
+    if args.output is not None and len(json_paths) != 1:
+        parser.error("--output requires a single map")
+
+    for json_path in json_paths:
+        output_path = compile_map(json_path, args.output)
+        print(f"{json_path} -> {output_path}")
+
+
+if __name__ == "__main__":
+    main()
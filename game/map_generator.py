@@ -0,0 +1,248 @@
+"""
+Procedural map generator, for scaling benchmarks & curriculum training.
+
+    python -m game.map_generator -t 1000 -c 40 --degree 4 --seed 0
+    python -m game.map_generator -t 10000 --compiled  # also writes the memory-mappable .npz
+
+Generated maps follow the json schema of game/maps and are always connected and symmetric.
+"""
+
+import argparse
+import json
+import os
+from collections import deque
+
+import numpy as np
+
+from game.map import MAPS_DIR, MapTopology
+
+DEGREE_DISTRIBUTIONS = ("poisson", "uniform", "fixed")
+
+
+def sample_degrees(
+    rng: np.random.Generator,
+    num_territories: int,
+    mean_degree: float,
+    degree_distribution: str,
+):
+    """
+    Target number of neighbors of each territory, at least 1
+    """
+    if degree_distribution == "poisson":
+        degrees = 1 + rng.poisson(max(mean_degree - 1, 0), size=num_territories)
+    elif degree_distribution == "uniform":
+        high = max(int(round(2 * mean_degree)) - 1, 1)
+        degrees = rng.integers(1, high + 1, size=num_territories)
+    elif degree_distribution == "fixed":
+        degrees = np.full(num_territories, max(int(round(mean_degree)), 1))
+    else:
+        raise ValueError(
+            f"Unknown degree distribution {degree_distribution}. Use one of {DEGREE_DISTRIBUTIONS}"
+        )
+    return np.minimum(degrees, num_territories - 1)
+
+
+def generate_edges(rng: np.random.Generator, degrees: np.ndarray):
+    """
+    Random spanning tree (so the map is connected), then the remaining degree of each
+    territory is paired at random like in a configuration model.
+    Returns array (e, 2) of unique undirected edges (a < b)
+    """
+    num_territories = len(degrees)
+    order = rng.permutation(num_territories)
+    # Each territory of the random order connects to one territory placed before it
+    parents = order[
+        (rng.random(num_territories - 1) * np.arange(1, num_territories)).astype(
+            np.int64
+        )
+    ]
+    tree_edges = np.stack([order[1:], parents], axis=1)
+
+    tree_degrees = np.bincount(tree_edges.ravel(), minlength=num_territories)
+    stubs = np.repeat(np.arange(num_territories), np.maximum(degrees - tree_degrees, 0))
+    rng.shuffle(stubs)
+    stubs = stubs[: len(stubs) // 2 * 2].reshape(-1, 2)
+
+    edges = np.concatenate([tree_edges, stubs])
+    edges = edges[edges[:, 0] != edges[:, 1]]
+    edges = np.sort(edges, axis=1)
+    return np.unique(edges, axis=0)
+
+
+def grow_continents(
+    rng: np.random.Generator, adjacency: list[list[int]], num_continents: int
+):
+    """
+    Multi source BFS from random seeds, so every continent is connected
+    Returns array (t,) of continent ids
+    """
+    num_territories = len(adjacency)
+    continent_ids = np.full(num_territories, -1, dtype=np.int64)
+    queue = deque()
+    for c, seed in enumerate(
+        rng.choice(num_territories, size=num_continents, replace=False).tolist()
+    ):
+        continent_ids[seed] = c
+        queue.append(seed)
+
+    while queue:
+        t = queue.popleft()
+        neighbors = adjacency[t]
+        for i in rng.permutation(len(neighbors)).tolist():
+            n = neighbors[i]
+            if continent_ids[n] == -1:
+                continent_ids[n] = continent_ids[t]
+                queue.append(n)
+    return continent_ids
+
+
+def generate_map(
+    num_territories: int,
+    num_continents: int = None,
+    mean_degree: float = 4.0,
+    degree_distribution: str = "poisson",
+    max_players: int = 6,
+    seed=None,
+    name: str = None,
+) -> dict:
+    """
+    Returns the map as a dict, in the same schema as the json maps
+    Continents reward as many troops as they have border territories, like the classic board.
+    """
+    if num_territories < 2:
+        raise ValueError("A map needs at least 2 territories")
+    if num_continents is None:
+        num_continents = max(1, num_territories // 7)
+    if not 1 <= num_continents <= num_territories:
+        raise ValueError(
+            f"Can't make {num_continents} continents out of {num_territories} territories"
+        )
+    if name is None:
+        name = f"generated_t{num_territories}_c{num_continents}_s{seed}"
+
+    rng = np.random.default_rng(seed)
+    degrees = sample_degrees(rng, num_territories, mean_degree, degree_distribution)
+    edges = generate_edges(rng, degrees)
+
+    adjacency = [[] for _ in range(num_territories)]
+    for a, b in edges.tolist():
+        adjacency[a].append(b)
+        adjacency[b].append(a)
+
+    continent_ids = grow_continents(rng, adjacency, num_continents)
+
+    names = [f"territory_{i + 1}" for i in range(num_territories)]
+    territories = {
+        names[i]: {
+            "name": names[i],
+            "adjacent_territories_names": [names[n] for n in sorted(adjacency[i])],
+        }
+        for i in range(num_territories)
+    }
+
+    is_border = np.array(
+        [
+            any(continent_ids[n] != continent_ids[i] for n in adjacency[i])
+            for i in range(num_territories)
+        ],
+        dtype=np.bool_,
+    )
+    continents = {}
+    for c in range(num_continents):
+        c_name = f"continent_{c + 1}"
+        members = np.flatnonzero(continent_ids == c)
+        continents[c_name] = {
+            "name": c_name,
+            "territories": [names[i] for i in members.tolist()],
+            "troops_reward": max(1, int(is_border[members].sum())),
+        }
+
+    map_metadata = {
+        "name": name,
+        "territory_number": num_territories,
+        "max_players": max_players,
+        "continent_nb": num_continents,
+        "continents": continents,
+        "territories": territories,
+        "repr": f"\n{name}: {num_territories} territories, {num_continents} continents, {len(edges)} borders\n",
+    }
+    validate_map(map_metadata)
+    return map_metadata
+
+
+def validate_map(map_metadata: dict):
+    """
+    Raises ValueError if the map isn't symmetric, connected, or if continents don't partition the territories
+    """
+    territories = map_metadata["territories"]
+    for name, t_data in territories.items():
+        for adjacent in t_data["adjacent_territories_names"]:
+            if adjacent not in territories:
+                raise ValueError(f"{name} is adjacent to unknown territory {adjacent}")
+            if name not in territories[adjacent]["adjacent_territories_names"]:
+                raise ValueError(f"{name} -> {adjacent} isn't symmetric")
+
+    start = next(iter(territories))
+    seen = {start}
+    queue = deque([start])
+    while queue:
+        for adjacent in territories[queue.popleft()]["adjacent_territories_names"]:
+            if adjacent not in seen:
+                seen.add(adjacent)
+                queue.append(adjacent)
+    if len(seen) != len(territories):
+        raise ValueError(
+            f"Map isn't connected: {len(seen)} reachable territories out of {len(territories)}"
+        )
+
+    in_continents = [
+        t
+        for c_data in map_metadata["continents"].values()
+        for t in c_data["territories"]
+    ]
+    if sorted(in_continents) != sorted(territories):
+        raise ValueError("Every territory must belong to exactly one continent")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a random map")
+    parser.add_argument("-t", "--territories", type=int, required=True)
+    parser.add_argument("-c", "--continents", type=int, default=None)
+    parser.add_argument("--degree", type=float, default=4.0, help="Mean degree")
+    parser.add_argument(
+        "--distribution", type=str, default="poisson", choices=DEGREE_DISTRIBUTIONS
+    )
+    parser.add_argument("--max_players", type=int, default=6)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("-n", "--name", type=str, default=None)
+    parser.add_argument("-o", "--output_dir", type=str, default=MAPS_DIR)
+    parser.add_argument(
+        "--compiled",
+        action="store_true",
+        help="Also write the compiled .npz next to the json",
+    )
+    args = parser.parse_args()
+
+    map_metadata = generate_map(
+        args.territories,
+        args.continents,
+        mean_degree=args.degree,
+        degree_distribution=args.distribution,
+        max_players=args.max_players,
+        seed=args.seed,
+        name=args.name,
+    )
+    name = map_metadata["name"]
+    json_path = os.path.join(args.output_dir, f"{name}.json")
+    with open(json_path, "w") as map_file:
+        json.dump(map_metadata, map_file, indent=4)
+    print(f"Map saved to {json_path}")
+
+    if args.compiled:
+        compiled_path = os.path.join(args.output_dir, f"{name}.npz")
+        MapTopology.from_metadata(map_metadata, name).to_npz(compiled_path)
+        print(f"Compiled map saved to {compiled_path}")
+
+
+if __name__ == "__main__":
+    main()
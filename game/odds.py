@@ -0,0 +1,261 @@
+"""
+Battle odds oracle
+
+Exact outcome distributions of single rolls and blitz attacks, memoized in a bounded LRU cache.
+The cache can be pre-warmed from a file built with:
+    python -m game.odds -o odds.npz --max_troops 30
+"""
+
+import argparse
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from game.blitz import blitz_outcome_probabilities
+from game.dice_rolls import (
+    MAX_ATTACK_DICES,
+    MAX_DEFEND_DICES,
+    roll_outcome_probabilities,
+)
+
+ODDS_CACHE_SIZE = 100_000
+
+
+class BattleOdds(NamedTuple):
+    """
+    Possible ends of a battle, arrays of shape (outcomes,)
+    """
+
+    attack_remaining: np.ndarray
+    defender_remaining: np.ndarray
+    probabilities: np.ndarray
+
+    @property
+    def win_probability(self) -> float:
+        return float(self.probabilities[self.defender_remaining == 0].sum())
+
+    def expected_losses(self, attacker_troops: int, defender_troops: int):
+        return (
+            float(np.dot(attacker_troops - self.attack_remaining, self.probabilities)),
+            float(
+                np.dot(defender_troops - self.defender_remaining, self.probabilities)
+            ),
+        )
+
+
+def compute_battle_odds(
+    attacker_troops: int,
+    defender_troops: int,
+    blitz: bool = True,
+    attack_dice_nb: int = MAX_ATTACK_DICES,
+) -> BattleOdds:
+    """
+    Uncached computation of the outcome distribution
+    The attacker rolls min(attack_dice_nb, attacker_troops - 1) dices, like in the game.
+    """
+    if attacker_troops < 2 or defender_troops < 1:
+        return BattleOdds(
+            np.array([attacker_troops]), np.array([defender_troops]), np.array([1.0])
+        )
+
+    if blitz:
+        probabilities = blitz_outcome_probabilities(
+            attacker_troops, defender_troops, attack_dice_nb
+        )
+        attack_remaining = np.concatenate(
+            [np.arange(1, attacker_troops + 1), np.ones(defender_troops, dtype=int)]
+        )
+        defender_remaining = np.concatenate(
+            [np.zeros(attacker_troops, dtype=int), np.arange(1, defender_troops + 1)]
+        )
+    else:
+        outcomes = roll_outcome_probabilities(
+            min(attack_dice_nb, attacker_troops - 1),
+            min(defender_troops, MAX_DEFEND_DICES),
+        )
+        attack_remaining = np.array([attacker_troops - o[0] for o in outcomes])
+        defender_remaining = np.array([defender_troops - o[1] for o in outcomes])
+        probabilities = np.array([o[2] for o in outcomes])
+
+    return BattleOdds(attack_remaining, defender_remaining, probabilities)
+
+
+class OddsOracle:
+    """
+    LRU memoized battle odds, keyed by (attacker_troops, defender_troops, blitz, attack_dice_nb)
+    The arrays are shared between callers, so read only
+    """
+
+    def __init__(self, maxsize: int = ODDS_CACHE_SIZE, prewarm_path: str = None):
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        if prewarm_path is not None:
+            self.load(prewarm_path)
+
+    def __len__(self):
+        return len(self._cache)
+
+    def _store(self, key, odds: BattleOdds):
+        # Shared by every caller
+        for array in odds:
+            array.setflags(write=False)
+        self._cache[key] = odds
+        self._cache.move_to_end(key)
+        if len(self._cache) > self.maxsize:
+            self._cache.popitem(last=False)
+
+    def distribution(
+        self,
+        attacker_troops: int,
+        defender_troops: int,
+        blitz: bool = True,
+        attack_dice_nb: int = MAX_ATTACK_DICES,
+    ) -> BattleOdds:
+        key = (attacker_troops, defender_troops, bool(blitz), attack_dice_nb)
+        odds = self._cache.get(key)
+        if odds is None:
+            odds = compute_battle_odds(*key)
+            self._store(key, odds)
+        else:
+            self._cache.move_to_end(key)
+        return odds
+
+    def win_probability(
+        self,
+        attacker_troops: int,
+        defender_troops: int,
+        blitz: bool = True,
+        attack_dice_nb: int = MAX_ATTACK_DICES,
+    ) -> float:
+        """
+        Probability to conquer the target (in a single roll if not blitz)
+        """
+        return self.distribution(
+            attacker_troops, defender_troops, blitz, attack_dice_nb
+        ).win_probability
+
+    def expected_losses(
+        self,
+        attacker_troops: int,
+        defender_troops: int,
+        blitz: bool = True,
+        attack_dice_nb: int = MAX_ATTACK_DICES,
+    ):
+        """
+        Returns tuple: (expected attacker loss, expected defender loss)
+        """
+        return self.distribution(
+            attacker_troops, defender_troops, blitz, attack_dice_nb
+        ).expected_losses(attacker_troops, defender_troops)
+
+    def build(self, max_troops: int, attack_dice_nb: int = MAX_ATTACK_DICES):
+        """
+        Fill the cache for every battle with up to max_troops on each side
+        """
+        for blitz in (False, True):
+            for a in range(2, max_troops + 1):
+                for d in range(1, max_troops + 1):
+                    self.distribution(a, d, blitz, attack_dice_nb)
+
+    def save(self, path: str):
+        """
+        Dump the cache content to an .npz file
+        """
+        keys = np.array(list(self._cache.keys()), dtype=np.int64).reshape(-1, 4)
+        odds = list(self._cache.values())
+        offsets = np.cumsum([0] + [len(o.probabilities) for o in odds])
+
+        def concatenate(field):
+            if not odds:
+                return np.zeros(0)
+            return np.concatenate([getattr(o, field) for o in odds])
+
+        np.savez(
+            path,
+            keys=keys,
+            offsets=offsets,
+            attack_remaining=concatenate("attack_remaining"),
+            defender_remaining=concatenate("defender_remaining"),
+            probabilities=concatenate("probabilities"),
+        )
+
+    def load(self, path: str):
+        """
+        Pre-warm the cache from a file written by save()
+        """
+        with np.load(path) as data:
+            keys = data["keys"]
+            offsets = data["offsets"]
+            attack_remaining = data["attack_remaining"]
+            defender_remaining = data["defender_remaining"]
+            probabilities = data["probabilities"]
+
+        for i, (a, d, blitz, dices) in enumerate(keys.tolist()):
+            start, end = offsets[i], offsets[i + 1]
+            self._store(
+                (a, d, bool(blitz), dices),
+                BattleOdds(
+                    attack_remaining[start:end],
+                    defender_remaining[start:end],
+                    probabilities[start:end],
+                ),
+            )
+
+
+_oracle = OddsOracle()
+
+
+def get_oracle() -> OddsOracle:
+    return _oracle
+
+
+def prewarm(path: str):
+    _oracle.load(path)
+
+
+def outcome_distribution(
+    attacker_troops: int,
+    defender_troops: int,
+    blitz: bool = True,
+    attack_dice_nb: int = MAX_ATTACK_DICES,
+) -> BattleOdds:
+    return _oracle.distribution(attacker_troops, defender_troops, blitz, attack_dice_nb)
+
+
+def win_probability(
+    attacker_troops: int,
+    defender_troops: int,
+    blitz: bool = True,
+    attack_dice_nb: int = MAX_ATTACK_DICES,
+) -> float:
+    return _oracle.win_probability(
+        attacker_troops, defender_troops, blitz, attack_dice_nb
+    )
+
+
+def expected_losses(
+    attacker_troops: int,
+    defender_troops: int,
+    blitz: bool = True,
+    attack_dice_nb: int = MAX_ATTACK_DICES,
+):
+    return _oracle.expected_losses(
+        attacker_troops, defender_troops, blitz, attack_dice_nb
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Precompute battle odds")
+    parser.add_argument("-o", "--output", type=str, required=True)
+    parser.add_argument("--max_troops", type=int, default=30)
+    args = parser.parse_args()
+
+    oracle = OddsOracle(maxsize=2 * args.max_troops**2)
+    oracle.build(args.max_troops)
+    oracle.save(args.output)
+    print(f"Saved {len(oracle)} battles to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
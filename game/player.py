@@ -1,46 +1,188 @@
-from loguru import logger
-
 import numpy as np
 
+from game.cards import MUST_TRADE_CARDS, NUM_CARD_TYPES, best_set
 from game.territory import Territory
+from game.state import GameState
+from game.rng import get_default_rng
 
 
 class Player:
     def __init__(self, name) -> None:
         self.name = name
         self.id_ = None
-        self.controlled_territories: list[Territory] = []
-        self.cards = None
+        self._reset_territories()
+        # Number of cards of each type, see game/cards.py
+        self.cards = [0] * NUM_CARD_TYPES
         self.is_dead = False
+        self._reset_continents()
+        # Board of the game the player is in, set by the game
+        self.state: GameState = None
+        # Replaced by the game's generator when the player joins a game
+        self.rng: np.random.Generator = get_default_rng()
 
     def reset(self):
-        self.controlled_territories = []
-        self.cards = None
+        self._reset_territories()
+        self.cards = [0] * NUM_CARD_TYPES
         self.is_dead = False
+        self._reset_continents()
+
+    def _reset_territories(self):
+        # Owned territories, in a list for O(1) random picks, with the position of each
+        # territory id in it for O(1) membership & removal (swap with the last one)
+        self._territories: list[Territory] = []
+        self._territory_positions: dict[int, int] = {}
 
-    def assign_territory(self, territory: Territory):
+    @property
+    def controlled_territories(self) -> list[Territory]:
+        """
+        Owned territories. This is the internal list, don't modify it
+        """
+        return self._territories
+
+    @property
+    def territory_count(self) -> int:
+        return len(self._territories)
+
+    def owns(self, territory_id: int) -> bool:
+        return territory_id in self._territory_positions
+
+    def get_attack_frontier(self) -> list[Territory]:
+        """
+        Territories with more than one troop & at least one adjacent territory that isn't owned by us.
+        Sorted by id, so picks don't depend on the order the frontier was built in
+        """
+        if self.state is None:
+            return [
+                t
+                for t in self._territories
+                if t.troops > 1 and not all(self.owns(t_id) for t_id in t.adjacent_ids)
+            ]
+        return [
+            self._territories[self._territory_positions[t_id]]
+            for t_id in sorted(self.state.frontier(self.id_))
+        ]
+
+    def get_fortify_sources(self) -> list[Territory]:
+        """
+        Territories with more than one troop & another of our territories connected to them. Sorted by id
+        """
+        return [
+            self._territories[self._territory_positions[t_id]]
+            for t_id in self.state.fortify_sources(self.id_)
+        ]
+
+    def get_fortify_targets(self, source: Territory) -> list[Territory]:
+        """
+        Territories troops can be moved to from source, through our territories. Sorted by id
+        """
+        return [
+            self._territories[self._territory_positions[t_id]]
+            for t_id in sorted(self.state.component(source.id_))
+            if t_id != source.id_
+        ]
+
+    def _reset_continents(self):
+        # Continent id -> number of territories owned in it
+        self.continent_territory_counts: dict[int, int] = {}
+        # Bit c is set when the player controls continent c
+        self.controlled_continents_mask = 0
+        # Sum of the troops rewards of the controlled continents
+        self.continents_troops_reward = 0
+
+    def set_territories(
+        self,
+        territories: list[Territory],
+        continent_counts: dict[int, int],
+        controlled_continents: list[int],
+        continents_troops_reward: int,
+    ):
+        """
+        Overwrites the ownership tracking in one go, when restoring a snapshot.
+        Doesn't touch the board, territories must already be owned by the player there
+        """
+        self._territories = territories
+        self._territory_positions = {t.id_: i for i, t in enumerate(territories)}
+        self.continent_territory_counts = continent_counts
+        self.controlled_continents_mask = sum(1 << c for c in controlled_continents)
+        self.continents_troops_reward = continents_troops_reward
+
+    def get_territory_positions(self):
+        """
+        Returns tuple: (territory ids, their position in controlled_territories) arrays
+        """
+        n = len(self._territories)
+        return (
+            np.fromiter(self._territory_positions.keys(), dtype=np.int64, count=n),
+            np.fromiter(self._territory_positions.values(), dtype=np.int64, count=n),
+        )
+
+    def controls_continent(self, continent) -> bool:
+        return bool(self.controlled_continents_mask >> continent.id_ & 1)
+
+    def assign_territory(self, territory: Territory, position: int = None):
         """
         Puts the territory under player's control
+        position: where to put it in controlled_territories, to undo a remove_territory. Last by default
         """
-        self.controlled_territories.append(territory)
+        assert not self.owns(
+            territory.id_
+        ), f"{self.name} already owns {territory.name}"
+        if position is None or position == len(self._territories):
+            self._territory_positions[territory.id_] = len(self._territories)
+            self._territories.append(territory)
+        else:
+            # Inverse of the swap in remove_territory
+            moved = self._territories[position]
+            self._territory_positions[moved.id_] = len(self._territories)
+            self._territories.append(moved)
+            self._territories[position] = territory
+            self._territory_positions[territory.id_] = position
         territory.assign_to_player(self.name)
 
-    def remove_territory(self, territory: Territory):
-        og_terr_nb = len(self.controlled_territories)
-        self.controlled_territories = [
-            t for t in self.controlled_territories if t != territory
-        ]
-        assert (
-            og_terr_nb == len(self.controlled_territories) + 1
+        continent = territory.continent
+        if continent is not None:
+            count = self.continent_territory_counts.get(continent.id_, 0) + 1
+            self.continent_territory_counts[continent.id_] = count
+            if count == len(continent.territories):
+                self.controlled_continents_mask |= 1 << continent.id_
+                self.continents_troops_reward += continent.troops_rewards
+
+    def remove_territory(self, territory: Territory) -> int:
+        """
+        Returns the position the territory had in controlled_territories
+        """
+        assert self.owns(
+            territory.id_
         ), f"Seems like {territory.name} wasn't under {self.name} control."
+        position = self._territory_positions.pop(territory.id_)
+        last = self._territories.pop()
+        if last is not territory:
+            self._territories[position] = last
+            self._territory_positions[last.id_] = position
         territory.occupying_player_name = None
 
+        continent = territory.continent
+        if continent is not None:
+            if self.controls_continent(continent):
+                self.controlled_continents_mask &= ~(1 << continent.id_)
+                self.continents_troops_reward -= continent.troops_rewards
+            self.continent_territory_counts[continent.id_] -= 1
+        return position
+
     def get_total_troops(self):
+        if self.state is not None:
+            return self.state.total_troops(self.id_)
         result = 0
         for t in self.controlled_territories:
             result += t.troops
         return result
 
+    def cards_choose_set(self) -> tuple:
+        """
+        Set to trade in, as per type counts. None to stop trading
+        """
+        raise NotImplementedError
+
     def attack_wants_attack(self):
         raise NotImplementedError
 
@@ -69,13 +211,16 @@ class Player:
     def attack_choose_transfert_nb(self) -> bool:
         raise NotImplementedError
 
-    def fortify_choose_from(self):
+    def fortify_choose_from(self) -> Territory:
+        """
+        None to skip fortifying
+        """
         raise NotImplementedError
 
-    def fortify_choose_to(self):
+    def fortify_choose_to(self, source: Territory) -> Territory:
         raise NotImplementedError
 
-    def fortify_choose_troops_nb(self):
+    def fortify_choose_troops_nb(self, source: Territory, target: Territory) -> int:
         raise NotImplementedError
 
 
@@ -83,63 +228,72 @@ class Player_Random(Player):
     def __init__(self, name) -> None:
         super().__init__(name)
 
+    def cards_choose_set(self):
+        cards = best_set(self.cards)
+        if cards is None:
+            return
+        # Trades when it has to, or half the time
+        if sum(self.cards) < MUST_TRADE_CARDS and not self.rng.integers(2):
+            return
+        return cards
+
     def attack_wants_attack(self):
-        return np.random.choice([True, False])
+        return bool(self.rng.integers(2))
 
     def draft_choose_troops_to_deploy(self, troops_to_deploy):
         if troops_to_deploy == 1:
             return 1
-        return np.random.randint(1, troops_to_deploy)
+        return int(self.rng.integers(1, troops_to_deploy))
 
     def draft_choose_territory_to_deploy(self) -> Territory:
-        return np.random.choice(self.controlled_territories)
+        return self.controlled_territories[
+            self.rng.integers(len(self.controlled_territories))
+        ]
 
     def attack_choose_attack_territory(self):
 
-        t_with_more_than_one_troop = [
-            t for t in self.controlled_territories if t.troops > 1
-        ]
-
-        # Getting player controlled territories names
-        player_t = [t.name for t in self.controlled_territories]
-        # Filtering on territories having at least one adjacent territory that isn't owned by us
-        t_with_valid_attack = list(
-            filter(
-                lambda x: any(
-                    [t_n not in player_t for t_n in x.adjacent_territories_names]
-                ),
-                t_with_more_than_one_troop,
-            )
-        )
+        t_with_valid_attack = self.get_attack_frontier()
         if len(t_with_valid_attack) == 0:
             return
 
-        return np.random.choice(t_with_valid_attack)
+        return t_with_valid_attack[self.rng.integers(len(t_with_valid_attack))]
 
     def attack_choose_target_territory(self, attack_territory: Territory) -> str:
         """
         Return territory name
         """
-        adjacent_territories = attack_territory.adjacent_territories_names
         # Target randomly an adjacent territory that isn't our own
-        try:
-            target = np.random.choice(
-                [
-                    t
-                    for t in adjacent_territories
-                    if t not in [p_t.name for p_t in self.controlled_territories]
-                ]
+        targets = [
+            t_name
+            for t_id, t_name in zip(
+                attack_territory.adjacent_ids,
+                attack_territory.adjacent_territories_names,
             )
-            return target
-        except ValueError:
+            if not self.owns(t_id)
+        ]
+        if len(targets) == 0:
             # all adjacent territories are player's
             return []
+        return targets[self.rng.integers(len(targets))]
 
     def attack_choose_attack_dices(self, attacker_troops):
-        return min(np.random.randint(1, 4), attacker_troops - 1), np.random.choice(
-            [True, False]
+        return min(int(self.rng.integers(1, 4)), attacker_troops - 1), bool(
+            self.rng.integers(2)
         )
 
+    def fortify_choose_from(self):
+        sources = self.get_fortify_sources()
+        if len(sources) == 0:
+            return
+        return sources[self.rng.integers(len(sources))]
+
+    def fortify_choose_to(self, source: Territory):
+        targets = self.get_fortify_targets(source)
+        return targets[self.rng.integers(len(targets))]
+
+    def fortify_choose_troops_nb(self, source: Territory, target: Territory):
+        return int(self.rng.integers(1, source.troops))
+
 
 class Player_Human(Player):
     def __init__(self, name) -> None:
@@ -150,6 +304,10 @@ class Player_RL(Player):
     def __init__(self, name) -> None:
         super().__init__(name)
 
+    def cards_choose_set(self):
+        # Always trades as soon as it can
+        return best_set(self.cards)
+
     def attack_wants_attack(self):
         # Random player always attack as long as it can
         return True
@@ -157,51 +315,51 @@ class Player_RL(Player):
     def draft_choose_troops_to_deploy(self, troops_to_deploy):
         if troops_to_deploy == 1:
             return 1
-        return np.random.randint(1, troops_to_deploy)
+        return int(self.rng.integers(1, troops_to_deploy))
 
     def draft_choose_territory_to_deploy(self) -> Territory:
-        return np.random.choice(self.controlled_territories)
-
-    def attack_choose_attack_territory(self):
-        t_with_more_than_one_troop = [
-            t for t in self.controlled_territories if t.troops > 1
+        return self.controlled_territories[
+            self.rng.integers(len(self.controlled_territories))
         ]
 
-        # Getting player controlled territories names
-        player_t = [t.name for t in self.controlled_territories]
-        # Filtering on territories having at least one adjacent territory that isn't owned by us
-        t_with_valid_attack = list(
-            filter(
-                lambda x: any(
-                    [t_n not in player_t for t_n in x.adjacent_territories_names]
-                ),
-                t_with_more_than_one_troop,
-            )
-        )
+    def attack_choose_attack_territory(self):
+        t_with_valid_attack = self.get_attack_frontier()
         if len(t_with_valid_attack) == 0:
             return
 
-        return np.random.choice(t_with_valid_attack)
+        return t_with_valid_attack[self.rng.integers(len(t_with_valid_attack))]
 
     def attack_choose_target_territory(self, attack_territory: Territory) -> str:
         """
         Return territory name
         """
-        adjacent_territories = attack_territory.adjacent_territories_names
         # Target randomly an adjacent territory that isn't our own
-        try:
-            target = np.random.choice(
-                [
-                    t
-                    for t in adjacent_territories
-                    if t not in [p_t.name for p_t in self.controlled_territories]
-                ]
+        targets = [
+            t_name
+            for t_id, t_name in zip(
+                attack_territory.adjacent_ids,
+                attack_territory.adjacent_territories_names,
             )
-            return target
-        except ValueError:
+            if not self.owns(t_id)
+        ]
+        if len(targets) == 0:
             # all adjacent territories are player's
             return []
+        return targets[self.rng.integers(len(targets))]
 
     def attack_choose_attack_dices(self, attacker_troops):
         # RL player always blitz with maximum troops
         return min(3, attacker_troops - 1), True
+
+    def fortify_choose_from(self):
+        sources = self.get_fortify_sources()
+        if len(sources) == 0:
+            return
+        return sources[self.rng.integers(len(sources))]
+
+    def fortify_choose_to(self, source: Territory):
+        targets = self.get_fortify_targets(source)
+        return targets[self.rng.integers(len(targets))]
+
+    def fortify_choose_troops_nb(self, source: Territory, target: Territory):
+        return int(self.rng.integers(1, source.troops))
@@ -0,0 +1,34 @@
+import numpy as np
+
+_default_rng = np.random.default_rng()
+
+
+def get_default_rng() -> np.random.Generator:
+    """
+    Process wide generator, used when no rng is given
+    """
+    return _default_rng
+
+
+def make_seed_sequence(seed=None) -> np.random.SeedSequence:
+    """
+    seed can be None (fresh entropy), an int or an existing SeedSequence
+    """
+    if isinstance(seed, np.random.SeedSequence):
+        return seed
+    return np.random.SeedSequence(seed)
+
+
+def make_rng(seed=None) -> np.random.Generator:
+    return np.random.default_rng(make_seed_sequence(seed))
+
+
+def spawn_seeds(seed, n: int) -> list[np.random.SeedSequence]:
+    """
+    N independent and reproducible seeds, one per worker. Pass them to Game(seed=...)
+    """
+    return make_seed_sequence(seed).spawn(n)
+
+
+def spawn_rngs(seed, n: int) -> list[np.random.Generator]:
+    return [np.random.default_rng(s) for s in spawn_seeds(seed, n)]
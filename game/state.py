@@ -0,0 +1,313 @@
+import numpy as np
+
+NO_OWNER = -1
+
+
+class GameState:
+    """
+    Struct of arrays storage of the mutable board, indexed by territory id:
+        . troops: (t,) int
+        . owners: (t,) int, id of the owning player, NO_OWNER if unassigned
+
+    Territory objects are views over these arrays, so observations, validity checks
+    and bots heuristics can work on whole arrays instead of walking objects.
+    Player ids are registered in order, so for a game owners[t] == player.id_
+
+    With an adjacency, the attack frontier is maintained incrementally: for each player,
+    the set of owned territories with more than 1 troop and at least 1 enemy neighbor.
+    So are the connected components of each player's territories, for fortify (see component).
+    Writes must go through set_troops / set_owner (Territory does) to keep them in sync,
+    call rebuild_frontier after writing the arrays directly.
+    """
+
+    def __init__(
+        self,
+        num_territories: int,
+        adjacency_indptr: np.ndarray = None,
+        adjacency_indices: np.ndarray = None,
+        topology=None,
+    ) -> None:
+        """
+        topology: MapTopology of the adjacency, its neighbor lists are then shared instead of rebuilt
+        """
+        self.troops = np.zeros(num_territories, dtype=np.int64)
+        self.owners = np.full(num_territories, NO_OWNER, dtype=np.int64)
+        self.player_names: list[str] = []
+        self._player_ids: dict[str, int] = {}
+        # Bumped on every ownership change, for caches of what depends on owners (see the env's action mask)
+        self.owner_changes = 0
+
+        # Adjacency CSR, see Map. Optional for standalone territories
+        self.adjacency_indptr = adjacency_indptr
+        self.adjacency_indices = adjacency_indices
+        # Optional kernels (see game/kernels.py) for whole board recomputations, set by the Game
+        self.kernels = None
+        self._frontiers: list[set[int]] = []
+        self._neighbors = None
+        if topology is not None:
+            self._edge_sources = topology.edge_sources
+            self._neighbors = topology.neighbor_ids
+        elif adjacency_indptr is not None:
+            self._edge_sources = np.repeat(
+                np.arange(num_territories), np.diff(adjacency_indptr)
+            )
+            # Python lists, single element updates on numpy arrays are slow
+            indptr = adjacency_indptr.tolist()
+            indices = adjacency_indices.tolist()
+            self._neighbors = [
+                indices[indptr[i] : indptr[i + 1]] for i in range(num_territories)
+            ]
+        if self._neighbors is not None:
+            # Per territory, number of neighbors with another owner
+            self._enemy_counts = [0] * num_territories
+            # Components: label of each territory & territories of each label.
+            # Conquests merge the new owner's components (smaller into larger), but can split
+            # the previous owner's: that player is then marked stale & rebuilt on its next query
+            self._labels = [0] * num_territories
+            self._members: dict[int, set[int]] = {}
+            self._next_label = 0
+            self._stale_components: set[int] = set()
+
+    @property
+    def num_territories(self):
+        return len(self.troops)
+
+    def reset(self):
+        self.troops.fill(0)
+        self.owners.fill(NO_OWNER)
+        self.rebuild_frontier()
+
+    def set_troops(self, idx: int, num_troops: int):
+        self.troops[idx] = num_troops
+        if self._neighbors is not None:
+            self._update_frontier(idx)
+
+    def set_owner(self, idx: int, player_id: int):
+        old_id = int(self.owners[idx])
+        if old_id == player_id:
+            return
+        self.owners[idx] = player_id
+        self.owner_changes += 1
+        if self._neighbors is None:
+            return
+
+        # Only idx & its neighbors can change
+        owners = self.owners
+        enemy_counts = self._enemy_counts
+        old_links = 0
+        for n in self._neighbors[idx]:
+            n_owner = owners[n]
+            if n_owner == old_id:
+                enemy_counts[n] += 1
+                enemy_counts[idx] += 1
+                old_links += 1
+            elif n_owner == player_id:
+                enemy_counts[n] -= 1
+                enemy_counts[idx] -= 1
+            else:
+                continue
+            self._update_frontier(n)
+        if old_id != NO_OWNER:
+            self._frontiers[old_id].discard(idx)
+        self._update_frontier(idx)
+        self._move_component(idx, old_id, player_id, old_links)
+
+    def _update_frontier(self, idx: int):
+        owner = self.owners[idx]
+        if owner == NO_OWNER:
+            return
+        if self.troops[idx] > 1 and self._enemy_counts[idx] > 0:
+            self._frontiers[owner].add(idx)
+        else:
+            self._frontiers[owner].discard(idx)
+
+    def _new_component(self, idx: int):
+        label = self._next_label
+        self._next_label += 1
+        self._labels[idx] = label
+        self._members[label] = {idx}
+        return label
+
+    def _move_component(self, idx: int, old_id: int, player_id: int, old_links: int):
+        """
+        old_links: neighbors of idx still owned by old_id
+        """
+        members = self._members
+        if old_id != NO_OWNER:
+            component = members.pop(self._labels[idx], None)
+            if component is not None and len(component) > 1:
+                component.discard(idx)
+                members[self._labels[idx]] = component
+                # With a single link left, idx was a dead end: the rest stays connected
+                if old_links > 1:
+                    self._stale_components.add(old_id)
+        if player_id == NO_OWNER:
+            return
+
+        label = self._new_component(idx)
+        if player_id in self._stale_components:
+            return
+        owners = self.owners
+        labels = self._labels
+        for n in self._neighbors[idx]:
+            n_label = labels[n]
+            if owners[n] != player_id or n_label == label:
+                continue
+            # Smaller into larger
+            if len(members[n_label]) > len(members[label]):
+                label, n_label = n_label, label
+            merged = members.pop(n_label)
+            for t in merged:
+                labels[t] = label
+            members[label] |= merged
+
+    def _rebuild_components(self, player_id: int):
+        members = self._members
+        labels = self._labels
+        neighbors = self._neighbors
+        owned = np.flatnonzero(self.owners == player_id).tolist()
+        for t in owned:
+            members.pop(labels[t], None)
+            labels[t] = -1
+        for t in owned:
+            if labels[t] != -1:
+                continue
+            label = self._new_component(t)
+            component = members[label]
+            stack = [t]
+            while stack:
+                for n in neighbors[stack.pop()]:
+                    if labels[n] == -1 and self.owners[n] == player_id:
+                        labels[n] = label
+                        component.add(n)
+                        stack.append(n)
+        self._stale_components.discard(player_id)
+
+    def component(self, idx: int) -> set[int]:
+        """
+        Territory ids connected to idx through territories of its owner, idx included.
+        This is the internal set, don't modify it
+        """
+        owner = int(self.owners[idx])
+        if owner in self._stale_components:
+            self._rebuild_components(owner)
+        return self._members[self._labels[idx]]
+
+    def fortify_sources(self, player_id: int) -> list[int]:
+        """
+        Territory ids the player can fortify from, in id order:
+        more than 1 troop & in a component of more than 1 territory
+        """
+        if player_id in self._stale_components:
+            self._rebuild_components(player_id)
+        members = self._members
+        labels = self._labels
+        return [
+            t
+            for t in np.flatnonzero(
+                (self.owners == player_id) & (self.troops > 1)
+            ).tolist()
+            if len(members[labels[t]]) > 1
+        ]
+
+    def connected(self, source: int, target: int) -> bool:
+        """
+        True if both are owned by the same player & linked by a path of its territories
+        """
+        owner = int(self.owners[source])
+        if owner == NO_OWNER or owner != self.owners[target]:
+            return False
+        if owner in self._stale_components:
+            self._rebuild_components(owner)
+        return self._labels[source] == self._labels[target]
+
+    def rebuild_frontier(self):
+        """
+        Recomputes the frontier from the arrays, vectorized.
+        Components are rebuilt lazily, on the next query of each player
+        """
+        self.owner_changes += 1
+        for frontier in self._frontiers:
+            frontier.clear()
+        if self._neighbors is None:
+            return
+        self._members.clear()
+        self._stale_components = set(range(len(self._frontiers)))
+        if self.kernels is not None:
+            enemy_counts = self.kernels.enemy_neighbor_counts(
+                self.owners, self.adjacency_indptr, self.adjacency_indices
+            )
+        else:
+            enemy_counts = self.enemy_neighbor_counts()
+        self._enemy_counts = enemy_counts.tolist()
+        for idx in np.flatnonzero(
+            (self.owners != NO_OWNER) & (self.troops > 1) & (enemy_counts > 0)
+        ).tolist():
+            self._frontiers[self.owners[idx]].add(idx)
+
+    def frontier(self, player_id: int) -> set[int]:
+        """
+        Territory ids the player can attack from. This is the internal set, don't modify it
+        """
+        return self._frontiers[player_id]
+
+    def register_players(self, names: list[str]):
+        """
+        Names must be given in player id order
+        """
+        for name in names:
+            self.get_player_id(name)
+
+    def get_player_id(self, name) -> int:
+        """
+        NO_OWNER for None. Unknown names are registered with the next id
+        """
+        if name is None:
+            return NO_OWNER
+        player_id = self._player_ids.get(name)
+        if player_id is None:
+            player_id = len(self.player_names)
+            self._player_ids[name] = player_id
+            self.player_names.append(name)
+            self._frontiers.append(set())
+        return player_id
+
+    def get_player_name(self, player_id):
+        if player_id == NO_OWNER:
+            return None
+        return self.player_names[player_id]
+
+    def owned_mask(self, player_id: int):
+        return self.owners == player_id
+
+    def territory_counts(self):
+        """
+        (p,) number of territories of each player
+        """
+        owned = self.owners[self.owners != NO_OWNER]
+        return np.bincount(owned, minlength=len(self.player_names))
+
+    def total_troops(self, player_id: int) -> int:
+        return int(self.troops[self.owners == player_id].sum())
+
+    def enemy_neighbor_counts(self):
+        """
+        (t,) number of neighbors owned by someone else than the territory's owner
+        """
+        enemy_edges = (
+            self.owners[self.adjacency_indices] != self.owners[self._edge_sources]
+        )
+        return np.bincount(
+            self._edge_sources[enemy_edges], minlength=self.num_territories
+        )
+
+    def attack_sources(self, player_id: int):
+        """
+        (t,) bool, territories the player can attack from:
+        owned, more than 1 troop and at least 1 enemy neighbor
+        """
+        return (
+            (self.owners == player_id)
+            & (self.troops > 1)
+            & (self.enemy_neighbor_counts() > 0)
+        )
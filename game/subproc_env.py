@@ -0,0 +1,343 @@
+"""
+RiskEnv-Flat-V0 envs stepped in subprocesses, for the object based Game on several cores:
+
+    envs = SubprocRiskVectorEnv(
+        [functools.partial(make_risk_env, "test_map_v0") for _ in range(64)], envs_per_worker=8
+    )
+    obs, info = envs.reset(seed=0)
+    obs, rewards, terminated, truncated, info = envs.step(actions)
+
+Workers write observations, rewards, flags & action masks straight into shared memory arrays,
+only short commands go through the pipes. A worker steps all its envs for each command,
+so more envs per worker means less IPC per step. A crashed worker is restarted with fresh envs,
+its envs come back truncated with info["restarted"] set, without a final observation (it's lost with the worker).
+So is a worker that doesn't answer within timeout.
+Invalid actions are not crashes: step() raises ValueError, like the env, before any env is stepped.
+"""
+
+import multiprocessing as mp
+import time
+import traceback
+
+import numpy as np
+
+import gymnasium as gym
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+
+from game.game import Game
+from game.player import Player_Random, Player_RL
+
+
+def make_risk_env(map_name: str, num_players: int = 2, max_episode_steps: int = 100):
+    """
+    RiskEnv-Flat-V0 against Player_Random opponents, the agent playing last
+    Use functools.partial(make_risk_env, ...) as env_fn, lambdas can't be sent to spawned workers
+    """
+    players = [Player_Random(f"p{i}") for i in range(num_players - 1)]
+    agent = Player_RL(f"p{num_players - 1}")
+    return gym.make(
+        "game/RiskEnv-Flat-V0",
+        game=Game(map_name, players + [agent]),
+        agent_player=agent,
+        max_episode_steps=max_episode_steps,
+        # Observations are reused buffers, on purpose
+        disable_env_checker=True,
+    )
+
+
+# Shared arrays: name -> (ctypes typecode, numpy dtype)
+_SHARED_ARRAYS = {
+    "obs": ("f", np.float32),
+    "final_obs": ("f", np.float32),
+    "rewards": ("d", np.float64),
+    "terminated": ("B", np.bool_),
+    "truncated": ("B", np.bool_),
+    "action_mask": ("B", np.bool_),
+    "actions": ("q", np.int64),
+}
+
+
+def _as_arrays(shared: dict) -> dict:
+    return {
+        name: np.frombuffer(raw, dtype=_SHARED_ARRAYS[name][1]).reshape(shape)
+        for name, (raw, shape) in shared.items()
+    }
+
+
+def _reset_env(env, arrays, i, seed=None):
+    obs, info = env.reset(seed=seed)
+    # On small maps the opponents can win before the agent plays
+    while env.unwrapped.game.is_game_over():
+        obs, info = env.reset()
+    arrays["obs"][i] = obs
+    arrays["action_mask"][i] = info["action_mask"]
+
+
+def _worker(pipe, parent_pipe, env_fns, env_ids, shared):
+    parent_pipe.close()
+    arrays = _as_arrays(shared)
+    envs = []
+    try:
+        envs = [env_fn() for env_fn in env_fns]
+        while True:
+            command, data = pipe.recv()
+            if command == "step":
+                # The whole batch is checked first, so it's never partially applied
+                invalid = [
+                    i
+                    for i in env_ids
+                    if not arrays["action_mask"][i, arrays["actions"][i]]
+                ]
+                if invalid:
+                    pipe.send(
+                        (
+                            "invalid",
+                            f"Invalid actions {arrays['actions'][invalid]} in envs {invalid}",
+                        )
+                    )
+                    continue
+            _run_command(command, data, envs, env_ids, arrays)
+            if command == "close":
+                return
+            pipe.send(("ok", None))
+    except KeyboardInterrupt:
+        pass
+    except Exception:
+        pipe.send(("error", traceback.format_exc()))
+    finally:
+        for env in envs:
+            env.close()
+        pipe.close()
+
+
+def _run_command(command, data, envs, env_ids, arrays):
+    if command == "reset":
+        for i, env in zip(env_ids, envs):
+            _reset_env(env, arrays, i, None if data is None else data + i)
+    elif command == "step":
+        for i, env in zip(env_ids, envs):
+            obs, reward, terminated, truncated, info = env.step(
+                int(arrays["actions"][i])
+            )
+            arrays["rewards"][i] = reward
+            arrays["terminated"][i] = terminated
+            arrays["truncated"][i] = truncated
+            if terminated or truncated:
+                arrays["final_obs"][i] = obs
+                _reset_env(env, arrays, i)
+            else:
+                arrays["obs"][i] = obs
+                arrays["action_mask"][i] = info["action_mask"]
+
+
+class SubprocRiskVectorEnv(VectorEnv):
+    """
+    env_fns: one callable per env, building a RiskEnv with flat observations (see make_risk_env)
+    envs_per_worker: envs stepped one after the other by each worker process
+    context: multiprocessing start method, the platform default if None
+    restart_workers: restart crashed workers, instead of raising
+    timeout: seconds to wait for the workers on each command, a worker late past it is treated as crashed
+    Observations, rewards, flags & info["action_mask"] are the shared buffers, overwritten by the next
+    step() / reset(): copy what you keep
+    """
+
+    metadata = {"autoreset_mode": AutoresetMode.SAME_STEP}
+
+    def __init__(
+        self,
+        env_fns: list,
+        envs_per_worker: int = 1,
+        context: str = None,
+        restart_workers: bool = True,
+        timeout: float = 60.0,
+    ) -> None:
+        self.env_fns = list(env_fns)
+        self.num_envs = len(self.env_fns)
+        self.restart_workers = restart_workers
+        self.timeout = timeout
+
+        env = self.env_fns[0]()
+        self.single_observation_space = env.observation_space
+        self.single_action_space = env.action_space
+        env.close()
+        if not isinstance(self.single_observation_space, gym.spaces.Box):
+            raise ValueError(
+                "Envs need flat observations, see game/RiskEnv-Flat-V0 & make_risk_env"
+            )
+        self.observation_space = batch_space(
+            self.single_observation_space, self.num_envs
+        )
+        self.action_space = batch_space(self.single_action_space, self.num_envs)
+
+        self._context = mp.get_context(context)
+        n = self.num_envs
+        obs_size = self.single_observation_space.shape[0]
+        shapes = {
+            "obs": (n, obs_size),
+            "final_obs": (n, obs_size),
+            "rewards": (n,),
+            "terminated": (n,),
+            "truncated": (n,),
+            "action_mask": (n, self.single_action_space.n),
+            "actions": (n,),
+        }
+        self._shared = {
+            name: (
+                self._context.RawArray(_SHARED_ARRAYS[name][0], int(np.prod(shape))),
+                shape,
+            )
+            for name, shape in shapes.items()
+        }
+        self._arrays = _as_arrays(self._shared)
+
+        num_workers = -(-n // envs_per_worker)
+        self._worker_env_ids = np.array_split(np.arange(n), num_workers)
+        self._pipes = [None] * num_workers
+        self._processes = [None] * num_workers
+        for w in range(num_workers):
+            self._start_worker(w)
+
+    def _start_worker(self, w: int):
+        env_ids = self._worker_env_ids[w]
+        parent_pipe, child_pipe = self._context.Pipe()
+        process = self._context.Process(
+            target=_worker,
+            name=f"SubprocRiskVectorEnv-{w}",
+            args=(
+                child_pipe,
+                parent_pipe,
+                [self.env_fns[i] for i in env_ids],
+                env_ids.tolist(),
+                self._shared,
+            ),
+            daemon=True,
+        )
+        process.start()
+        child_pipe.close()
+        self._pipes[w] = parent_pipe
+        self._processes[w] = process
+
+    def _receive(self, w: int, deadline: float):
+        """
+        Returns tuple: (status, error) of worker w, a crash if it's dead or past the deadline
+        """
+        pipe = self._pipes[w]
+        try:
+            if not pipe.poll(max(deadline - time.monotonic(), 0)):
+                return "error", f"worker timed out after {self.timeout}s"
+            return pipe.recv()
+        except (BrokenPipeError, ConnectionResetError, EOFError):
+            return "error", "worker is dead"
+
+    def _run(self, command: str, data=None):
+        """
+        Sends the command to every worker & waits for all of them.
+        Returns tuple of lists of (worker, error): (crashed, invalid)
+        """
+        crashed = []
+        invalid = []
+        sent = []
+        for w, pipe in enumerate(self._pipes):
+            try:
+                pipe.send((command, data))
+                sent.append(w)
+            except (BrokenPipeError, ConnectionResetError, EOFError):
+                crashed.append((w, "worker is dead"))
+        deadline = time.monotonic() + self.timeout
+        for w in sent:
+            status, error = self._receive(w, deadline)
+            if status == "invalid":
+                invalid.append((w, error))
+            elif status != "ok":
+                crashed.append((w, error))
+        return crashed, invalid
+
+    def _restart(self, errors: list, seed=None):
+        if not self.restart_workers:
+            raise RuntimeError(
+                "Worker(s) crashed:\n" + "\n".join(error for _, error in errors)
+            )
+        for w, _ in errors:
+            self._stop_worker(w)
+            self._start_worker(w)
+            self._pipes[w].send(("reset", seed))
+            status, error = self._receive(w, time.monotonic() + self.timeout)
+            if status != "ok":
+                raise RuntimeError(f"Worker {w} crashed again on reset:\n{error}")
+
+    def _stop_worker(self, w: int):
+        process = self._processes[w]
+        if process.is_alive():
+            process.terminate()
+        process.join()
+        self._pipes[w].close()
+
+    def reset(self, *, seed=None, options=None):
+        """
+        seed: env i is seeded with seed + i
+        """
+        super().reset(seed=seed)
+        errors, invalid = self._run("reset", seed)
+        if errors:
+            self._restart(errors, seed)
+        if invalid:
+            raise ValueError("\n".join(error for _, error in invalid))
+        return self._arrays["obs"], {"action_mask": self._arrays["action_mask"]}
+
+    def step(self, actions):
+        """
+        actions: (n,) target of each agent, must be in info["action_mask"]
+        """
+        arrays = self._arrays
+        actions = np.asarray(actions, dtype=np.int64)
+        rows = np.arange(self.num_envs)
+        in_range = (actions >= 0) & (actions < self.single_action_space.n)
+        valid = in_range & arrays["action_mask"][rows, np.where(in_range, actions, 0)]
+        if not valid.all():
+            invalid = np.flatnonzero(~valid)
+            raise ValueError(f"Invalid actions {actions[invalid]} in envs {invalid}")
+
+        arrays["actions"][:] = actions
+        errors, invalid = self._run("step")
+        info = {}
+        if errors:
+            self._restart(errors)
+            restarted = np.zeros(self.num_envs, dtype=np.bool_)
+            for w, _ in errors:
+                env_ids = self._worker_env_ids[w]
+                restarted[env_ids] = True
+                arrays["rewards"][env_ids] = 0.0
+                arrays["terminated"][env_ids] = False
+                arrays["truncated"][env_ids] = True
+            info["restarted"] = restarted
+            info["errors"] = [error for _, error in errors]
+        if invalid:
+            # Already checked against the mask above, so only if the envs disagree with their own mask
+            raise ValueError("\n".join(error for _, error in invalid))
+
+        finished = arrays["terminated"] | arrays["truncated"]
+        if errors:
+            # No final observation for the envs of restarted workers
+            finished &= ~restarted
+        if finished.any():
+            info["final_obs"] = arrays["final_obs"]
+            info["_final_obs"] = finished
+        info["action_mask"] = arrays["action_mask"]
+        return (
+            arrays["obs"],
+            arrays["rewards"],
+            arrays["terminated"],
+            arrays["truncated"],
+            info,
+        )
+
+    def close_extras(self, **kwargs):
+        for w, pipe in enumerate(self._pipes):
+            try:
+                pipe.send(("close", None))
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+        for w, process in enumerate(self._processes):
+            process.join(timeout=5)
+            self._stop_worker(w)
@@ -1,10 +1,62 @@
+from game.state import GameState
+
+
 class Territory:
+    """
+    View over the territory's slot in a GameState, bound by the Map.
+    A standalone territory gets its own 1 slot state, only made if it's used before being bound.
+    """
+
     def __init__(self, name, id_, adjacent_territories_names: list[str]) -> None:
         self.name = name
         self.id_ = id_
         self.adjacent_territories_names = adjacent_territories_names
-        self.troops = 0
-        self.occupying_player_name = None
+        # Filled by the Map at load time
+        self.adjacent_ids: list[int] = []
+        # Set by the continent this territory belongs to
+        self.continent = None
+        # No _state until bind_state, see __getattr__
+        self._idx = 0
+
+    def __getattr__(self, name):
+        # Only called for missing attributes: _state of a standalone territory
+        if name != "_state":
+            raise AttributeError(name)
+        self._state = GameState(1)
+        return self._state
+
+    def bind_state(self, state: GameState, idx: int):
+        """
+        Move the territory's troops & owner, if it had any, into the slot idx of state
+        """
+        standalone = "_state" in self.__dict__
+        if standalone:
+            troops, owner = self.troops, self.occupying_player_name
+        self._state = state
+        self._idx = idx
+        if standalone:
+            self.troops = troops
+            self.occupying_player_name = owner
+
+    @property
+    def troops(self):
+        return int(self._state.troops[self._idx])
+
+    @troops.setter
+    def troops(self, num_troops):
+        self._state.set_troops(self._idx, num_troops)
+
+    @property
+    def occupying_player_name(self):
+        return self._state.get_player_name(self._state.owners[self._idx])
+
+    @occupying_player_name.setter
+    def occupying_player_name(self, name):
+        self._state.set_owner(self._idx, self._state.get_player_id(name))
+
+    @property
+    def owner_id(self):
+        return int(self._state.owners[self._idx])
 
     def set_troops(self, num_troops):
         self.troops = num_troops
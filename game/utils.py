@@ -1,5 +1,3 @@
-from loguru import logger
-
 from game.dice_rolls import roll_dices
 
 
@@ -7,7 +5,7 @@ def wait_for_cmd_action():
     input("Press Enter to continue...")
 
 
-def attack_once(player, attacker, target, attack_dice_nb, true_random):
+def attack_once(player, attacker, target, attack_dice_nb, true_random, rng=None):
     """
     Compute the lost troops on a dice roll
 
@@ -17,11 +15,12 @@ def attack_once(player, attacker, target, attack_dice_nb, true_random):
         target (_type_): _description_
         attack_dice_nb (_type_): _description_
         true_random (_type_): _description_
+        rng: np.random.Generator or DicePool
 
     Returns:
         _type_: _description_
     """
     attacker_loss, defender_loss = roll_dices(
-        player, attacker, target, attack_dice_nb, true_random
+        player, attacker, target, attack_dice_nb, true_random, rng
     )
     return attacker_loss, defender_loss
@@ -0,0 +1,221 @@
+"""
+N games of RiskEnv-Flat-V0 in one process, over the arrays of a BatchedGame instead of N Game objects:
+
+    envs = RiskVectorEnv("test_map_v0", num_envs=1024, seed=0)
+    obs, info = envs.reset()
+    actions = policy(obs, info["action_mask"])  # (n, D) -> (n,), a single inference
+    obs, rewards, terminated, truncated, info = envs.step(actions)
+
+Same observations, actions & rewards as the env: the agent blitzes from an attacker picked at random,
+the action is the target, and its draft & the opponents' turns (BatchedGame policies) are played in between.
+The dynamics are BatchedGame's though, not Game's: no fortify phase & no territory cards (see game/batched.py).
+A policy trained here plays a different game than on RiskEnv-Flat-V0.
+Finished games are reset in the same step, their last observation is in info["final_obs"].
+"""
+
+import numpy as np
+
+import gymnasium as gym
+from gymnasium.vector import AutoresetMode, VectorEnv
+from gymnasium.vector.utils import batch_space
+
+from game.batched import BatchedGame, _random_choice
+from game.custom_risk_env_v0 import (
+    LOSE_GAME_REWARD,
+    TERRITORY_GAIN_REWARD,
+    WIN_GAME_REWARD,
+    static_observation_blocks,
+)
+from game.dice_rolls import MAX_ATTACK_DICES
+
+
+class RiskVectorEnv(VectorEnv):
+    """
+    agent_id: player id of the agent, the last one by default. The other players use policies
+    Games have no fortify phase & no cards, unlike RiskEnv-Flat-V0, see the module docstring
+    Observations (n, D) & info["action_mask"] (n, T) are buffers of the env, overwritten by the next step() / reset()
+    """
+
+    metadata = {"autoreset_mode": AutoresetMode.SAME_STEP}
+
+    def __init__(
+        self,
+        map_name: str,
+        num_envs: int,
+        num_players: int = 2,
+        agent_id: int = None,
+        policies="random",
+        seed=None,
+        max_episode_steps: int = 100,
+        backend: str = "auto",
+    ) -> None:
+        if agent_id is None:
+            agent_id = num_players - 1
+        if isinstance(policies, str):
+            policies = [policies] * num_players
+        policies = list(policies)
+        # The agent drafts at random, like Player_RL
+        policies[agent_id] = "random"
+        self.batch = BatchedGame(
+            map_name, num_envs, num_players, policies, seed=seed, backend=backend
+        )
+        self.num_envs = num_envs
+        self.agent_id = agent_id
+        self.max_episode_steps = max_episode_steps
+
+        topology = self.batch.topology
+        t, c, p = topology.num_territories, topology.num_continents, num_players
+        self.single_observation_space = gym.spaces.Box(
+            low=-np.inf,
+            high=np.inf,
+            shape=(t * p + c * t + p + t + t * t + t + 1,),
+            dtype=np.float32,
+        )
+        self.single_action_space = gym.spaces.Discrete(t)
+        self.observation_space = batch_space(self.single_observation_space, num_envs)
+        self.action_space = batch_space(self.single_action_space, num_envs)
+
+        self._adjacency = topology.adjacency_matrix
+        self._edge_ids = np.full((t, t), -1, dtype=np.int64)
+        self._edge_ids[self.batch.edge_sources, self.batch.edge_targets] = np.arange(
+            len(self.batch.edge_sources)
+        )
+        self.attacking = np.zeros(num_envs, dtype=np.int64)
+        self.episode_steps = np.zeros(num_envs, dtype=np.int64)
+        self._agent_ids = np.full(num_envs, agent_id, dtype=np.int64)
+        self._action_mask = np.zeros((num_envs, t), dtype=np.bool_)
+        self._build_obs(t, c, p, topology)
+
+    def _build_obs(self, t, c, p, topology):
+        """
+        Same layout as RiskEnv_Choice_is_attack_territory flat observations. Static blocks are written once
+        """
+        self._obs = np.zeros(
+            (self.num_envs, self.single_observation_space.shape[0]), dtype=np.float32
+        )
+        bounds = np.cumsum([t * p, c * t, p, t, t * t, t])
+        (
+            self._obs_owners,
+            continent_territories,
+            player,
+            self._obs_attacking,
+            connexions,
+            self._obs_troops,
+            _,  # troops to deploy, always 0 when the agent attacks
+        ) = np.split(self._obs, bounds, axis=1)
+        connexions[:], continent_territories[:] = static_observation_blocks(topology)
+        # The agent is always the active player when it observes
+        player[:, self.agent_id] = 1
+        self._owner_offsets = np.arange(t) * p
+
+    def _write_obs(self):
+        rows = np.arange(self.num_envs)
+        self._obs_owners.fill(0)
+        self._obs_owners[rows[:, None], self._owner_offsets + self.batch.owners] = 1
+        self._obs_attacking.fill(0)
+        self._obs_attacking[rows, self.attacking] = 1
+        self._obs_troops[:] = self.batch.troops
+        np.logical_and(
+            self._adjacency[self.attacking],
+            self.batch.owners != self.agent_id,
+            out=self._action_mask,
+        )
+        return self._obs
+
+    def _choose_attackers(self, rows):
+        """
+        Random attacker for the agent in each game, like Player_RL.
+        Returns (n,) bool, False where the agent can't attack
+        """
+        batch = self.batch
+        valid = batch.valid_attacks(rows, self._agent_ids[: len(rows)])
+        sources = batch.edges_to_territories(valid)
+        can_attack = sources.any(axis=1)
+        self.attacking[rows[can_attack]] = _random_choice(
+            batch.rng, sources[can_attack]
+        )
+        return can_attack
+
+    def _play_until_agent(self, rows):
+        """
+        Opponents play their turns, then the agent drafts & gets an attacker.
+        Games where the agent can't attack move on to the next turn
+        """
+        batch = self.batch
+        while True:
+            rows = rows[~batch.done[rows]]
+            if len(rows) == 0:
+                return
+            opponents = rows[batch.active_players[rows] != self.agent_id]
+            if len(opponents):
+                batch.draft(opponents)
+                batch.attack(opponents)
+                opponents = opponents[~batch.done[opponents]]
+                batch.next_turn(opponents)
+                continue
+            batch.draft(rows)
+            rows = rows[~self._choose_attackers(rows)]
+            batch.next_turn(rows)
+
+    def _reset_games(self, rows):
+        # Games the opponents win before the agent plays are dealt again
+        while len(rows):
+            self.batch.reset(rows=rows)
+            self.episode_steps[rows] = 0
+            self._play_until_agent(rows)
+            rows = rows[self.batch.done[rows]]
+
+    def reset(self, *, seed=None, options=None):
+        super().reset(seed=seed)
+        if seed is not None:
+            self.batch.seed(seed)
+        self._reset_games(np.arange(self.num_envs))
+        return self._write_obs(), {"action_mask": self._action_mask}
+
+    def step(self, actions):
+        """
+        actions: (n,) target of each agent, must be in info["action_mask"]
+        """
+        batch = self.batch
+        actions = np.asarray(actions, dtype=np.int64)
+        rows = np.arange(self.num_envs)
+        if not self._action_mask[rows, actions].all():
+            invalid = np.flatnonzero(~self._action_mask[rows, actions])
+            raise ValueError(f"Invalid actions {actions[invalid]} in envs {invalid}")
+
+        territories_before = batch.territory_counts()[:, self.agent_id]
+        batch.resolve_attacks(
+            rows,
+            self._agent_ids,
+            self._edge_ids[self.attacking, actions],
+            np.full(self.num_envs, MAX_ATTACK_DICES),
+            np.ones(self.num_envs, dtype=np.bool_),
+        )
+        self.episode_steps += 1
+
+        # The agent keeps attacking as long as it can, like Player_RL
+        running = rows[~batch.done]
+        ending = running[~self._choose_attackers(running)]
+        batch.next_turn(ending)
+        self._play_until_agent(ending)
+
+        rewards = (
+            batch.territory_counts()[:, self.agent_id] - territories_before
+        ) * TERRITORY_GAIN_REWARD
+        terminated = batch.done.copy()
+        rewards[terminated] = np.where(
+            batch.winner[terminated] == self.agent_id,
+            WIN_GAME_REWARD,
+            LOSE_GAME_REWARD,
+        )
+        truncated = ~terminated & (self.episode_steps >= self.max_episode_steps)
+
+        info = {}
+        finished = terminated | truncated
+        if finished.any():
+            info["final_obs"] = self._write_obs().copy()
+            info["_final_obs"] = finished
+            self._reset_games(np.flatnonzero(finished))
+        obs = self._write_obs()
+        info["action_mask"] = self._action_mask
+        return obs, rewards.astype(np.float64), terminated, truncated, info
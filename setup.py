@@ -4,4 +4,5 @@ setup(
     name="RiskBot_RL",
     version="0.0.1",
     install_requires=["gymnasium>=0.29.1", "loguru"],
+    extras_require={"jit": ["numba"]},
 )
@@ -0,0 +1,24 @@
+import itertools
+import json
+
+import pytest
+
+from game.map_generator import generate_map
+
+
+@pytest.fixture
+def generated_map(tmp_path):
+    """
+    generated_map(*args, **kwargs): writes generate_map(*args, **kwargs) to a json file
+    & returns its path, to be used as map_name
+    """
+    counter = itertools.count()
+
+    def write(*args, **kwargs):
+        # Topologies are cached by path, so one file per map
+        path = tmp_path / f"generated_{next(counter)}.json"
+        with open(path, "w") as map_file:
+            json.dump(generate_map(*args, **kwargs), map_file)
+        return str(path)
+
+    return write
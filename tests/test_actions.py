@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+from game.actions import Attack, Deploy
+from game.game import Game
+from game.player import Player_Random
+
+
+def board(game):
+    return (
+        game.game_map.state.troops.tolist(),
+        game.game_map.state.owners.tolist(),
+        [p.is_dead for p in game.players],
+        [[t.id_ for t in p.controlled_territories] for p in game.players],
+        [p.continents_troops_reward for p in game.players],
+        [p.name for p in game.remaining_players],
+        [tuple(p.cards) for p in game.players],
+        game.rng.bit_generator.state,
+    )
+
+
+def random_action(game, rng):
+    state = game.game_map.state
+    player = game.players[rng.integers(len(game.players))]
+    if player.is_dead:
+        return None
+    frontier = sorted(state.frontier(player.id_))
+    if len(frontier) == 0 or rng.random() < 0.3:
+        t = player.controlled_territories[rng.integers(player.territory_count)]
+        return Deploy(t.id_, int(rng.integers(1, 4)))
+    source = game.game_map.get_territory_from_id(frontier[rng.integers(len(frontier))])
+    targets = [t_id for t_id in source.adjacent_ids if not player.owns(t_id)]
+    return Attack(
+        source.id_,
+        targets[rng.integers(len(targets))],
+        attack_dice_nb=int(rng.integers(1, 4)),
+        blitz=bool(rng.random() < 0.5),
+    )
+
+
+@pytest.mark.parametrize("dice_pool_size", [0, 16])
+def test_undo_reverts_apply(generated_map, dice_pool_size):
+    path = generated_map(30, 4, seed=6)
+    players = [Player_Random(f"p{i}") for i in range(3)]
+    game = Game(path, players, seed=2, dice_pool_size=dice_pool_size)
+    game.reset()
+    rng = np.random.default_rng(0)
+    for player in game.players:
+        player.cards = rng.integers(3, size=4).tolist()
+
+    history = []
+    conquests = 0
+    while len(history) < 300 and not game.is_game_over():
+        action = random_action(game, rng)
+        if action is None:
+            continue
+        if isinstance(action, Attack):
+            source = game.game_map.get_territory_from_id(action.source_id)
+            if source.troops < 1 + action.attack_dice_nb and not action.blitz:
+                with pytest.raises(ValueError):
+                    game.apply(action)
+                continue
+        before = board(game)
+        delta = game.apply(action)
+        conquests += delta.conquered
+        history.append((before, delta, board(game)))
+
+    assert conquests > 0
+    # Undoing then re-applying draws the same dices
+    before, delta, after = history[-1]
+    game.undo(delta)
+    assert board(game) == before
+    history[-1] = (before, game.apply(delta.action), after)
+    assert board(game) == after
+
+    for before, delta, _ in reversed(history):
+        game.undo(delta)
+        assert board(game) == before
+        state = game.game_map.state
+        for p in game.players:
+            assert state.frontier(p.id_) == set(
+                np.flatnonzero(state.attack_sources(p.id_)).tolist()
+            )
+
+
+def test_invalid_moves_are_rejected():
+    game = Game("test_map_v0", [Player_Random("p1"), Player_Random("p2")], seed=0)
+    game.reset()
+    player = game.players[0]
+    t = player.controlled_territories[0]
+    with pytest.raises(ValueError):
+        game.apply(Deploy(t.id_, 0))
+    own_neighbor = next((t_id for t_id in t.adjacent_ids if player.owns(t_id)), None)
+    if own_neighbor is not None:
+        with pytest.raises(ValueError):
+            game.apply(Attack(t.id_, own_neighbor))
+
+
+def test_invalid_move_leaves_the_board_unchanged():
+    game = Game("test_map_v0", [Player_Random("p1"), Player_Random("p2")], seed=1)
+    game.reset()
+    player = game.active_player
+    source, target_id = next(
+        (t, t_id)
+        for t in player.controlled_territories
+        for t_id in t.adjacent_ids
+        if not player.owns(t_id)
+    )
+    source.set_troops(10)
+    game.game_map.get_territory_from_id(target_id).set_troops(1)
+    before = board(game)
+    for move in (0, 10, 50):
+        with pytest.raises(ValueError):
+            game.apply(Attack(source.id_, target_id, move=move))
+        assert board(game) == before
+
+    # In range before the rolls, clamped to what they leave
+    game.apply(Attack(source.id_, target_id, move=9))
+    target = game.game_map.get_territory_from_id(target_id)
+    if player.owns(target_id):
+        assert source.troops == 1
+        assert target.troops >= 1
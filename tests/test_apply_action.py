@@ -0,0 +1,158 @@
+import pytest
+
+from game.actions import Attack, Deploy, EndPhase, Fortify
+from game.game import Game
+from game.player import Player_Random
+
+
+def new_game(seed=0, players=2, map_name="test_map_v0"):
+    game = Game(map_name, [Player_Random(f"p{i}") for i in range(players)], seed=seed)
+    game.reset()
+    return game
+
+
+def find_attack(game):
+    player = game.active_player
+    for source_id in sorted(game.game_map.state.frontier(player.id_)):
+        source = game.game_map.get_territory_from_id(source_id)
+        for target_id in source.adjacent_ids:
+            if not player.owns(target_id):
+                return source, game.game_map.get_territory_from_id(target_id)
+
+
+def find_fortify(game):
+    player = game.active_player
+    for source in player.controlled_territories:
+        if source.troops < 2:
+            continue
+        for target_id in source.adjacent_ids:
+            if player.owns(target_id):
+                return source, game.game_map.get_territory_from_id(target_id)
+
+
+def deploy_all(game):
+    t = game.active_player.controlled_territories[0]
+    game.apply_action(Deploy(t.id_, game.troops_to_deploy))
+
+
+def test_deploy():
+    game = new_game()
+    player = game.active_player
+    troops = game.troops_to_deploy
+    assert troops == game.get_deployment_troops(player)
+    t = player.controlled_territories[0]
+    before = t.troops
+
+    with pytest.raises(ValueError):
+        game.apply_action(Deploy(t.id_, troops + 1))
+    with pytest.raises(ValueError):
+        game.apply_action(EndPhase())
+    enemy = next(t for t in game.game_map.territories if not player.owns(t.id_))
+    with pytest.raises(ValueError):
+        game.apply_action(Deploy(enemy.id_, 1))
+
+    result = game.apply_action(Deploy(t.id_, troops))
+    assert t.troops == before + troops
+    assert game.troops_to_deploy == 0
+    assert result.game_phase == "DRAFT"
+    assert game.apply_action(EndPhase()).game_phase == "ATTACK"
+    with pytest.raises(ValueError):
+        game.apply_action(Deploy(t.id_, 1))
+
+
+def test_attack():
+    game = new_game(seed=1)
+    deploy_all(game)
+    source, target = find_attack(game)
+    with pytest.raises(ValueError):
+        game.apply_action(Attack(source.id_, target.id_))
+
+    game.apply_action(EndPhase())
+    result = game.apply_action(Attack(source.id_, target.id_, blitz=True))
+    assert result.attack_remaining == 1 or result.defender_remaining == 0
+    assert result.conquered == (result.defender_remaining == 0)
+    assert game.active_player.owns(target.id_) == result.conquered
+    with pytest.raises(ValueError):
+        game.apply_action(Attack(target.id_, target.id_))
+
+
+def test_blitz_with_few_troops_is_capped():
+    game = new_game(seed=2)
+    deploy_all(game)
+    game.apply_action(EndPhase())
+    source, target = find_attack(game)
+    source.set_troops(3)
+    result = game.apply_action(Attack(source.id_, target.id_, 3, blitz=True))
+    assert result.attack_dice_nb <= 2
+
+
+def test_fortify_ends_the_turn():
+    game = new_game(seed=3)
+    player = game.active_player
+    deploy_all(game)
+    game.apply_action(EndPhase())
+    with pytest.raises(ValueError):
+        game.apply_action(Fortify(0, 1, 1))
+    assert game.apply_action(EndPhase()).game_phase == "FORTIFY"
+
+    source, target = find_fortify(game)
+    with pytest.raises(ValueError):
+        game.apply_action(Fortify(source.id_, target.id_, source.troops))
+    source_troops, target_troops = source.troops, target.troops
+    result = game.apply_action(Fortify(source.id_, target.id_, 1))
+    assert (source.troops, target.troops) == (source_troops - 1, target_troops + 1)
+    assert result.game_phase == "DRAFT"
+    assert game.active_player is not player
+    assert game.troops_to_deploy == game.get_deployment_troops(game.active_player)
+
+
+def test_remaining_players_follow_eliminations():
+    for seed in range(5):
+        game = new_game(seed=seed, players=3)
+        while not game.is_game_over():
+            player = game.active_player
+            assert not player.is_dead
+            game.draft_phase(player)
+            game.attack_phase(player)
+            assert game.remaining_players == [p for p in game.players if not p.is_dead]
+            if not game.is_game_over():
+                game.apply_action(EndPhase())
+                game.apply_action(EndPhase())
+        assert game.remaining_players[0].territory_count == len(
+            game.game_map.territories
+        )
+
+
+def test_fortify_through_connected_territories(generated_map):
+    path = generated_map(40, 4, seed=1)
+    for seed in range(20):
+        game = new_game(seed=seed, map_name=path)
+        player = game.active_player
+        state = game.game_map.state
+        deploy_all(game)
+        game.apply_action(EndPhase())
+        game.apply_action(EndPhase())
+        for source in player.get_fortify_sources():
+            far = [
+                t
+                for t in player.get_fortify_targets(source)
+                if t.id_ not in source.adjacent_ids
+            ]
+            if far:
+                break
+        else:
+            continue
+
+        unreachable = [
+            t
+            for t in player.controlled_territories
+            if t.id_ not in state.component(source.id_)
+        ]
+        for t in unreachable:
+            with pytest.raises(ValueError):
+                game.apply_action(Fortify(source.id_, t.id_, 1))
+        target_troops = far[0].troops
+        game.apply_action(Fortify(source.id_, far[0].id_, 1))
+        assert far[0].troops == target_troops + 1
+        return
+    pytest.fail("No fortify through several territories found")
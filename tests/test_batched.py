@@ -0,0 +1,49 @@
+import numpy as np
+
+from game.batched import BatchedGame, NO_WINNER
+
+
+def check_invariants(batch):
+    counts = batch.territory_counts()
+    assert np.all(batch.troops >= 1)
+    assert np.all((counts == 0) == batch.dead)
+    for g in np.flatnonzero(batch.done):
+        assert np.all(batch.owners[g] == batch.winner[g])
+    assert np.all(batch.winner[~batch.done] == NO_WINNER)
+
+
+def test_setup():
+    batch = BatchedGame("test_map_v0", 500, 3, seed=0)
+    counts = batch.territory_counts()
+    assert np.all(counts.sum(axis=1) == batch.num_territories)
+    assert counts.max() - counts.min() <= 1
+    # Same starting troops for everyone, like Game.init_players
+    for p in range(3):
+        assert np.all(np.where(batch.owners == p, batch.troops, 0).sum(axis=1) == 35)
+    assert np.all(np.sort(batch.order, axis=1) == np.arange(3))
+
+
+def test_games_end_with_a_winner():
+    batch = BatchedGame("test_map_v0", 300, 3, policies="random", seed=1)
+    for _ in range(20):
+        batch.play_turn()
+        check_invariants(batch)
+    batch.run()
+    check_invariants(batch)
+    assert batch.done.all()
+    assert batch.win_rates().sum() == 1.0
+
+
+def test_heuristic_beats_random(generated_map):
+    path = generated_map(60, 8, seed=0)
+    batch = BatchedGame(path, 400, 2, policies=["heuristic", "random"], seed=2)
+    batch.run()
+    check_invariants(batch)
+    assert batch.win_rates()[0] > 0.7
+
+
+def test_seeded_runs_are_reproducible():
+    winners = [
+        BatchedGame("test_map_v0", 100, 2, seed=3).run().tolist() for _ in range(2)
+    ]
+    assert winners[0] == winners[1]
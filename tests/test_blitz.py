@@ -0,0 +1,121 @@
+import functools
+
+import numpy as np
+import pytest
+
+from game.blitz import (
+    BlitzResolver,
+    blitz_outcome_probabilities,
+    blitz_outcome_table,
+)
+from game.dice_rolls import roll_outcome_probabilities
+
+
+def brute_force_blitz(attacker_troops, defender_troops, attack_dice_nb):
+    """
+    Recursive definition of the blitz outcome: dict (attack_remaining, defender_remaining) -> probability
+    """
+
+    @functools.lru_cache(maxsize=None)
+    def outcome(a, d):
+        if a < 2 or d < 1:
+            return {(a, d): 1.0}
+        result = {}
+        for a_loss, d_loss, p in roll_outcome_probabilities(
+            min(attack_dice_nb, a - 1), min(d, 2)
+        ):
+            for final, q in outcome(a - a_loss, d - d_loss).items():
+                result[final] = result.get(final, 0) + p * q
+        return result
+
+    return outcome(attacker_troops, defender_troops)
+
+
+@pytest.mark.parametrize("attacker_troops", [2, 3, 4, 7, 12])
+@pytest.mark.parametrize("defender_troops", [1, 2, 5, 9])
+@pytest.mark.parametrize("attack_dice_nb", [1, 2, 3])
+def test_blitz_distribution_is_exact(attacker_troops, defender_troops, attack_dice_nb):
+    probabilities = blitz_outcome_probabilities(
+        attacker_troops, defender_troops, attack_dice_nb
+    )
+    expected = brute_force_blitz(attacker_troops, defender_troops, attack_dice_nb)
+
+    assert probabilities.sum() == pytest.approx(1.0)
+    for k in range(attacker_troops):
+        assert probabilities[k] == pytest.approx(expected.get((k + 1, 0), 0.0))
+    for j in range(defender_troops):
+        assert probabilities[attacker_troops + j] == pytest.approx(
+            expected.get((1, j + 1), 0.0)
+        )
+
+
+@pytest.mark.parametrize("attack_dice_nb", [1, 2, 3])
+def test_blitz_table_matches_the_chain(attack_dice_nb):
+    table = blitz_outcome_table(15, 6, attack_dice_nb)
+    for a in range(2, 16):
+        probabilities = blitz_outcome_probabilities(a, 6, attack_dice_nb)
+        assert np.allclose(table[a, :a], probabilities[:a])
+        assert not table[a, a:15].any()
+        assert np.allclose(table[a, 15:], probabilities[a:])
+
+
+def test_blitz_cdfs_are_shared_and_bounded():
+    resolver = BlitzResolver()
+    cdf = resolver.get_cdf(12, 4, 3)
+    assert np.allclose(cdf, np.cumsum(blitz_outcome_probabilities(12, 4, 3)))
+    assert not cdf.flags.writeable
+    # Smaller attacker counts are slices of the same table
+    small = resolver.get_cdf(5, 4, 3)
+    assert small.base is cdf.base
+    assert np.allclose(small, np.cumsum(blitz_outcome_probabilities(5, 4, 3)))
+    assert np.allclose(
+        resolver.get_cdf(30, 4, 3), np.cumsum(blitz_outcome_probabilities(30, 4, 3))
+    )
+    assert len(resolver._cdfs) == 1
+
+    # Bounded by bytes, the oldest tables go first
+    tables = {d: resolver._build_cdfs(5, d, 3) for d in (1, 2, 3)}
+    resolver = BlitzResolver(max_bytes=tables[2].nbytes + tables[3].nbytes)
+    for d in (1, 2, 3):
+        resolver.get_cdf(5, d, 3)
+    assert list(resolver._cdfs) == [(2, 3), (3, 3)]
+    assert resolver._nbytes == sum(t.nbytes for t in resolver._cdfs.values())
+    # Growing a table replaces it
+    resolver.get_cdf(8, 3, 3)
+    assert list(resolver._cdfs) == [(3, 3)]
+    assert resolver._nbytes == resolver._cdfs[(3, 3)].nbytes
+    # A table over the budget on its own is still kept while it's in use
+    resolver = BlitzResolver(max_bytes=0)
+    resolver.get_cdf(5, 1, 3)
+    resolver.get_cdf(5, 1, 3)
+    assert list(resolver._cdfs) == [(1, 3)]
+
+
+def test_blitz_resolve_matches_iterative_loop():
+    resolver = BlitzResolver()
+    rng = np.random.default_rng(0)
+    n = 20_000
+    attacker_troops, defender_troops = 10, 8
+
+    sampled = {}
+    iterated = {}
+    for _ in range(n):
+        result = resolver.resolve(attacker_troops, defender_troops, rng=rng)
+        sampled[result] = sampled.get(result, 0) + 1 / n
+        result = resolver.resolve_iteratively(attacker_troops, defender_troops, rng=rng)
+        iterated[result] = iterated.get(result, 0) + 1 / n
+
+    outcomes = set(sampled) | set(iterated)
+    total_variation = (
+        sum(abs(sampled.get(o, 0) - iterated.get(o, 0)) for o in outcomes) / 2
+    )
+    assert total_variation < 0.03
+    for a, d in outcomes:
+        assert (d == 0 and a >= 1) or (a == 1 and d >= 1)
+
+
+def test_blitz_above_cap_falls_back_to_loop():
+    resolver = BlitzResolver(troops_cap=5)
+    a, d = resolver.resolve(50, 3, rng=np.random.default_rng(0))
+    assert (d == 0 and a > 1) or (a == 1 and d > 0)
+    assert resolver._cdfs == {}
@@ -0,0 +1,153 @@
+import itertools
+
+import numpy as np
+import pytest
+
+from game.actions import Attack, Deploy, EndPhase, TradeCards
+from game.cards import (
+    CARD_SETS,
+    WILD,
+    Deck,
+    best_set,
+    best_sets,
+    trade_in_bonus,
+)
+from game.game import Game
+from game.player import Player_RL, Player_Random
+
+
+def search_sets(hand):
+    """
+    Every set of the hand, by trying every combination of 3 cards
+    """
+    cards = [t for t, count in enumerate(hand) for _ in range(count)]
+    sets = set()
+    for combination in itertools.combinations(cards, 3):
+        types = [t for t in combination if t != WILD]
+        if len(set(types)) == 1 or len(set(types)) == len(types):
+            sets.add(tuple(combination.count(t) for t in range(4)))
+    return sets
+
+
+def test_best_set_lookup():
+    hands = list(itertools.product(range(6), range(6), range(6), range(3)))
+    for hand in hands:
+        sets = search_sets(hand)
+        cards = best_set(hand)
+        if not sets:
+            assert cards is None
+            continue
+        assert cards in sets
+        assert cards[WILD] == min(s[WILD] for s in sets)
+        if sum(hand) >= 5:
+            assert cards is not None
+
+    indexes = best_sets(np.array(hands))
+    assert [CARD_SETS[i] if i >= 0 else None for i in indexes] == [
+        best_set(hand) for hand in hands
+    ]
+
+
+def test_trade_in_bonus():
+    assert [trade_in_bonus(i) for i in range(9)] == [4, 6, 8, 10, 12, 15, 20, 25, 30]
+
+
+def test_deck():
+    rng = np.random.default_rng(0)
+    deck = Deck(42)
+    assert len(deck) == 44
+    drawn = [deck.draw(rng) for _ in range(44)]
+    assert [drawn.count(t) for t in range(4)] == [14, 14, 14, 2]
+    assert deck.draw(rng) is None
+
+    deck.discard((1, 1, 0, 1))
+    assert sorted(deck.draw(rng) for _ in range(3)) == [0, 1, 3]
+    assert deck.draw(rng) is None
+
+
+def test_trade_cards():
+    game = Game("test_map_v0", [Player_Random("p1"), Player_Random("p2")], seed=0)
+    game.reset()
+    player = game.active_player
+    troops = game.troops_to_deploy
+    player.cards = [2, 1, 1, 1]
+
+    with pytest.raises(ValueError):
+        game.apply_action(TradeCards((2, 1, 0, 0)))
+    with pytest.raises(ValueError):
+        game.apply_action(TradeCards((0, 0, 3, 0)))
+    t = player.controlled_territories[0]
+    game.apply_action(Deploy(t.id_, troops))
+    # 5 cards: must trade before attacking
+    with pytest.raises(ValueError):
+        game.apply_action(EndPhase())
+
+    game.apply_action(TradeCards((1, 1, 1, 0)))
+    assert player.cards == [1, 0, 0, 1]
+    assert game.troops_to_deploy == 4
+    assert game.deck.discarded == [1, 1, 1, 0]
+    game.apply_action(Deploy(t.id_, 4))
+    game.apply_action(EndPhase())
+    with pytest.raises(ValueError):
+        game.apply_action(TradeCards((2, 0, 0, 1)))
+
+
+def test_cards_go_around(generated_map):
+    path = generated_map(30, 4, seed=2)
+    for seed in range(3):
+        players = [Player_Random("p1"), Player_RL("p2"), Player_Random("p3")]
+        game = Game(path, players, seed=seed)
+        game.reset()
+        total = len(game.game_map.territories) + 2
+        assert len(game.deck) == total
+        drawn = 0
+        for _ in range(60):
+            player = game.active_player
+            game.draft_phase(player)
+            assert sum(player.cards) < 5
+            game.attack_phase(player)
+            conquered = game.conquered_this_turn
+            hand = sum(player.cards)
+            if game.is_game_over():
+                break
+            game.fortify_phase(player)
+            assert sum(player.cards) == hand + conquered
+            drawn += conquered
+            for p in game.players:
+                if p.is_dead:
+                    assert p.cards == [0, 0, 0, 0]
+            assert (
+                sum(sum(p.cards) for p in game.players)
+                + len(game.deck)
+                + sum(game.deck.discarded)
+                == total
+            )
+        assert drawn > 0
+        assert game.sets_traded > 0
+
+
+def test_elimination_hands_cards_over():
+    game = Game("test_map_v0", [Player_Random("p1"), Player_Random("p2")], seed=3)
+    game.reset()
+    player = game.active_player
+    defender = next(p for p in game.players if p is not player)
+    defender.cards = [1, 0, 2, 1]
+    last = defender.controlled_territories[0]
+    for t in list(defender.controlled_territories[1:]):
+        defender.remove_territory(t)
+        player.assign_territory(t)
+    source = next(
+        game.game_map.get_territory_from_id(t_id)
+        for t_id in last.adjacent_ids
+        if player.owns(t_id)
+    )
+    source.set_troops(100)
+    last.set_troops(1)
+
+    delta = game.apply(Attack(source.id_, last.id_))
+    assert delta.eliminated
+    assert player.cards == [1, 0, 2, 1]
+    assert defender.cards == [0, 0, 0, 0]
+    game.undo(delta)
+    assert player.cards == [0, 0, 0, 0]
+    assert defender.cards == [1, 0, 2, 1]
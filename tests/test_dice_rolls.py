@@ -6,11 +6,11 @@ from game.player import Player
 
 
 def test_sanity_checks():
-    attack_player = Player("p1", True)
-    attack_terr = Territory("t1", ["t2"])
+    attack_player = Player("p1")
+    attack_terr = Territory("t1", 0, ["t2"])
     attack_terr.set_troops(3)
     attack_terr.occupying_player_name = attack_player.name
-    target = Territory("t2", ["t1"])
+    target = Territory("t2", 1, ["t1"])
     target.set_troops(2)
     attack_dice = 2
     # Ok
@@ -51,49 +51,73 @@ def test_sanity_checks():
 
 
 def test_rolling_dices():
-    attack_player = Player("p1", True)
-    attack_terr = Territory("t1", ["t2"])
+    attack_player = Player("p1")
+    attack_terr = Territory("t1", 0, ["t2"])
     attack_terr.set_troops(5)
     attack_terr.occupying_player_name = attack_player.name
-    target = Territory("t2", ["t1"])
+    target = Territory("t2", 1, ["t1"])
     target.set_troops(2)
     attack_dice = 2
 
-    np.random.seed(1)
-    # Expected sequence for random.randint(1,6):
-    # [2,5,1,3,1,4,4,4,6,4,2,1,4,1,4]
+    def decode(roll):
+        # Same encoding as the dice tables: 3 attack dices then 2 defend dices
+        return [
+            (roll // DICE_FACES**i) % DICE_FACES + DICE_LOW
+            for i in range(MAX_ATTACK_DICES + MAX_DEFEND_DICES)
+        ]
 
-    # Attack 2,5
-    # Def 1, 3
-    attack_loss, def_loss = roll_dices(attack_player, attack_terr, target, attack_dice)
-    assert attack_loss == 0
-    assert def_loss == 2
+    def expected_losses(dices, attack_dice, defend_dice):
+        attack_dices = sorted(dices[:attack_dice], reverse=True)
+        defender_dices = sorted(dices[MAX_ATTACK_DICES:][:defend_dice], reverse=True)
+        attack_loss, def_loss = 0, 0
+        for a, d in zip(attack_dices, defender_dices):
+            if a > d:
+                def_loss += 1
+            else:
+                attack_loss += 1
+        return attack_loss, def_loss
 
-    # Attack 1, 4, 4
-    # Def 4,6
-    attack_dice = 3
-    attack_loss, def_loss = roll_dices(attack_player, attack_terr, target, attack_dice)
-    assert attack_loss == 2
-    assert def_loss == 0
-
-    # Attack 4,2,1
-    # Def 4
-    target.set_troops(1)
-    attack_loss, def_loss = roll_dices(attack_player, attack_terr, target, attack_dice)
-    assert attack_loss == 1
-    assert def_loss == 0
-
-    np.random.seed(2)
-    # Expected sequence:
-    # [1,1,1,3,2,6,6,3,3,5,2]
-    for i in range(7):
-        # Consuming some to get where we want
-        np.random.randint(1, 6)
-
-    # Attack 3,3
-    # Def 5,2
-    target.set_troops(5)
-    attack_dice = 2
-    attack_loss, def_loss = roll_dices(attack_player, attack_terr, target, attack_dice)
-    assert attack_loss == 1
-    assert def_loss == 1
+    for seed in range(20):
+        for attack_dice in (1, 2, 3):
+            for def_troops in (1, 2, 5):
+                target.set_troops(def_troops)
+                dices = decode(np.random.default_rng(seed).integers(DICE_COMBINATIONS))
+                assert roll_dices(
+                    attack_player,
+                    attack_terr,
+                    target,
+                    attack_dice,
+                    rng=np.random.default_rng(seed),
+                ) == expected_losses(dices, attack_dice, min(def_troops, 2))
+
+
+def test_rolling_dices_batch():
+    n = 100_000
+    rng = np.random.default_rng(0)
+    attack_dice = rng.integers(1, 4, size=n)
+    def_troops = rng.integers(1, 5, size=n)
+
+    attack_loss, def_loss = roll_dices_batch(attack_dice, def_troops, rng)
+    assert attack_loss.shape == (n,)
+    assert def_loss.shape == (n,)
+    # Every compared pair of dices costs exactly 1 troop to one side
+    assert np.all(
+        attack_loss + def_loss == np.minimum(attack_dice, np.minimum(def_troops, 2))
+    )
+
+    # 1 vs 1: attacker wins when strictly higher, 10 cases out of 25 with 5 faces
+    attack_loss, def_loss = roll_dices_batch(
+        np.ones(n, dtype=int), np.ones(n, dtype=int)
+    )
+    assert abs(def_loss.mean() - 10 / 25) < 0.01
+
+
+def test_dice_pool():
+    pool = DicePool(np.random.default_rng(0), block_size=10)
+    rolls = np.concatenate([pool.rolls((7,)), pool.rolls((7,)), [pool.rolls()]])
+    # Rolls come out of the generator stream in the same order, by blocks
+    expected = np.random.default_rng(0).integers(DICE_COMBINATIONS, size=20)
+    assert np.array_equal(rolls, expected[:15])
+
+    attack_loss, def_loss = roll_dices_batch(np.full(50, 3), np.full(50, 2), pool)
+    assert np.all(attack_loss + def_loss == 2)
@@ -0,0 +1,87 @@
+import numpy as np
+import pytest
+
+from game.custom_risk_env_v0 import RiskEnv_Choice_is_attack_territory
+from game.game import Game
+from game.player import Player_Random, Player_RL
+
+
+def new_env(seed=0, flat_obs=False):
+    agent = Player_RL("agent")
+    game = Game("test_map_v0", [Player_Random("p1"), agent], seed=seed)
+    return RiskEnv_Choice_is_attack_territory(game, agent, flat_obs=flat_obs)
+
+
+def test_observation_buffers():
+    env = new_env()
+    obs, _ = env.reset(seed=0)
+    state = env.game.game_map.state
+    topology = env.game.game_map.topology
+
+    assert np.array_equal(obs["num_troops"], state.troops)
+    assert np.array_equal(obs["player_ids_territory"], state.owners)
+    assert np.array_equal(
+        obs["connexions"], topology.adjacency_matrix.astype(np.int64).ravel()
+    )
+    assert np.array_equal(
+        obs["continent_territories"], topology.continent_masks.astype(np.int64).ravel()
+    )
+    assert not obs["connexions"].flags.writeable
+
+    # Static blocks are shared by every env on the map, dynamic ones are reused by steps
+    other, _ = new_env(seed=1).reset(seed=1)
+    assert other["connexions"] is obs["connexions"]
+    assert other["num_troops"] is not obs["num_troops"]
+    action = env.get_masked_action_space()[0]
+    new_obs = env.step(action)[0]
+    assert new_obs["num_troops"] is obs["num_troops"]
+    assert np.array_equal(new_obs["num_troops"], state.troops)
+
+
+def test_flat_observations():
+    env = new_env()
+    flat_env = new_env(flat_obs=True)
+    assert flat_env.observation_space.shape == env.flatten_observation_space().shape
+    assert flat_env.observation_space.dtype == np.float32
+
+    for seed in range(3):
+        obs, _ = env.reset(seed=seed)
+        flat, _ = flat_env.reset(seed=seed)
+        done = False
+        while not done:
+            assert flat.dtype == np.float32
+            assert flat in flat_env.observation_space
+            assert np.array_equal(flat, env.flatten_obs(obs))
+            action = env.get_masked_action_space()[0]
+            obs, _, terminated, truncated, _ = env.step(action)
+            flat, _, _, _, _ = flat_env.step(action)
+            done = terminated or truncated
+
+
+def test_action_mask():
+    env = new_env()
+    for seed in range(3):
+        _, info = env.reset(seed=seed)
+        done = False
+        while not done:
+            mask = info["action_mask"]
+            assert mask.dtype == np.bool_ and mask.shape == (env.action_space.n,)
+            attacker = env.game.attacking_territory
+            expected = [
+                t_id
+                for t_id in attacker.adjacent_ids
+                if not env.agent_player.owns(t_id)
+            ]
+            assert np.flatnonzero(mask).tolist() == sorted(expected)
+
+            # Cached until the attacker or an owner changes
+            key = env._action_mask_key
+            assert env._update_action_mask() is mask
+            assert env._action_mask_key == key
+            invalid = np.flatnonzero(~mask)[0]
+            with pytest.raises(ValueError):
+                env.step(invalid)
+
+            _, _, terminated, truncated, info = env.step(np.flatnonzero(mask)[0])
+            assert info["action_mask"] is mask
+            done = terminated or truncated
@@ -0,0 +1,63 @@
+import json
+import os
+
+from game.events import EventLog, JsonLinesSink, ListSink, DEBUG, INFO
+from game.game import Game
+from game.player import Player_Random
+
+
+def play(game, turns):
+    game.reset(seed=0)
+    for _ in range(turns):
+        for player in game.players:
+            if player.is_dead:
+                continue
+            game.draft_phase(player)
+            game.attack_phase(player)
+        game.next_turn()
+
+
+def test_disabled_events():
+    events = EventLog("DEBUG")
+    assert not events.debug  # No sink
+    events = EventLog("INFO", [ListSink()])
+    assert events.info and not events.debug and not events.trace
+    events.emit(DEBUG, "dropped")
+    events.emit(INFO, "kept", value=1)
+    assert [r["event"] for r in events.sinks[0].records] == ["kept"]
+
+
+def test_game_events():
+    sink = ListSink()
+    game = Game(
+        "test_map_v0",
+        [Player_Random("p1"), Player_Random("p2")],
+        events=EventLog("TRACE", [sink]),
+    )
+    play(game, 3)
+    kinds = {r["event"] for r in sink.records}
+    assert {"player_order", "deploy", "attack", "attack_result", "board"} <= kinds
+    board = next(r for r in sink.records if r["event"] == "board")
+    assert len(board["troops"]) == len(game.game_map.territories)
+
+    # Same game without events
+    quiet = Game("test_map_v0", [Player_Random("p1"), Player_Random("p2")])
+    play(quiet, 3)
+    assert quiet.game_map.state.troops.tolist() == game.game_map.state.troops.tolist()
+
+
+def test_json_lines_sink_rotation(tmp_path):
+    path = str(tmp_path / "events.jsonl")
+    sink = JsonLinesSink(path, max_bytes=2000, backup_count=2, batch_size=10)
+    events = EventLog("DEBUG", [sink])
+    for i in range(500):
+        events.emit(DEBUG, "tick", i=i)
+    events.close()
+
+    assert os.path.exists(f"{path}.1")
+    assert os.path.exists(f"{path}.2")
+    assert not os.path.exists(f"{path}.3")
+    with open(path) as f:
+        records = [json.loads(line) for line in f]
+    assert records[-1]["i"] == 499
+    assert all(r["event"] == "tick" for r in records)
@@ -0,0 +1,175 @@
+import numpy as np
+import pytest
+
+from game.batched import BatchedGame
+from game.dice_rolls import _ATTACK_LOSSES, _DEFENDER_LOSSES, draw_rolls
+from game.game import Game
+from game.kernels import (
+    _resolve_battles_loop,
+    battle_offsets,
+    get_kernels,
+    has_numba,
+    roll_battles,
+)
+from game.player import Player_Random
+
+# Only the numba vs python comparisons need numba, the python backend is checked on its own
+needs_numba = pytest.mark.skipif(not has_numba(), reason="numba is not installed")
+
+
+def random_battles(n=2000, seed=0):
+    rng = np.random.default_rng(seed)
+    attack = rng.integers(1, 60, size=n)
+    defend = rng.integers(0, 60, size=n)
+    dices = rng.integers(1, 4, size=n)
+    blitz = rng.integers(2, size=n).astype(np.bool_)
+    return attack, defend, dices, blitz
+
+
+def test_battle_offsets():
+    offsets, num_rolls = battle_offsets(
+        np.array([5, 1, 3, 10]),
+        np.array([2, 4, 0, 3]),
+        np.array([True, True, False, True]),
+    )
+    # At most 4 + 2, 0 + 4, 1 (single roll) & 9 + 3 rolls
+    assert offsets.tolist() == [0, 6, 10, 11]
+    assert num_rolls == 23
+
+
+def test_python_battles_match_the_loop():
+    attack, defend, dices, blitz = random_battles()
+    offsets, num_rolls = battle_offsets(attack, defend, blitz)
+    rolls = draw_rolls(np.random.default_rng(1), num_rolls)
+
+    # The roll by roll loop, as plain python
+    expected_attack, expected_defend = attack.copy(), defend.copy()
+    _resolve_battles_loop(
+        expected_attack,
+        expected_defend,
+        dices,
+        blitz,
+        rolls,
+        offsets,
+        _ATTACK_LOSSES,
+        _DEFENDER_LOSSES,
+    )
+    a, d = attack.copy(), defend.copy()
+    get_kernels("python").resolve_battles(
+        a, d, dices, blitz, rolls, offsets, _ATTACK_LOSSES, _DEFENDER_LOSSES
+    )
+    assert np.array_equal(a, expected_attack)
+    assert np.array_equal(d, expected_defend)
+    assert np.all((a >= 1) & (d >= 0))
+    assert np.all(~blitz | (a == 1) | (d == 0) | (attack < 2) | (defend < 1))
+    # Single rolls lose 1 or 2 troops in total
+    rolled = ~blitz & (attack > 1) & (defend > 0)
+    losses = (attack - a + defend - d)[rolled]
+    assert np.all((losses >= 1) & (losses <= 2))
+
+
+def test_python_board_kernels_match_the_game(generated_map):
+    path = generated_map(80, 9, seed=1)
+    game = Game(path, [Player_Random(f"p{i}") for i in range(3)], seed=0)
+    game.reset()
+    python = get_kernels("python")
+    state = game.game_map.state
+    topology = game.game_map.topology
+    for _ in range(5):
+        assert np.array_equal(
+            python.enemy_neighbor_counts(
+                state.owners, topology.adjacency_indptr, topology.adjacency_indices
+            ),
+            state.enemy_neighbor_counts(),
+        )
+        alive = [p for p in game.players if not p.is_dead]
+        income = python.deployment_income(
+            np.tile(state.owners, (len(alive), 1)),
+            np.array([p.id_ for p in alive]),
+            topology.territory_continents,
+            topology.continent_sizes,
+            topology.continent_rewards,
+        )
+        assert income.tolist() == [game.get_deployment_troops(p) for p in alive]
+
+        for player in alive:
+            if not game.is_game_over():
+                game.draft_phase(player)
+                game.attack_phase(player)
+
+
+@needs_numba
+def test_battles_match():
+    attack, defend, dices, blitz = random_battles()
+    results = []
+    for backend in ("python", "numba"):
+        a, d = attack.copy(), defend.copy()
+        roll_battles(a, d, dices, blitz, np.random.default_rng(1), get_kernels(backend))
+        results.append((a, d))
+    assert np.array_equal(results[0][0], results[1][0])
+    assert np.array_equal(results[0][1], results[1][1])
+
+
+@needs_numba
+def test_board_kernels_match(generated_map):
+    path = generated_map(80, 9, seed=1)
+    batch = BatchedGame(path, 50, 3, seed=0)
+    player_ids = batch.active_players
+    python, jit = get_kernels("python"), get_kernels("numba")
+    args = (
+        batch.owners,
+        player_ids,
+        batch.territory_continents,
+        batch.continent_sizes,
+        batch.continent_rewards,
+    )
+    assert np.array_equal(python.deployment_income(*args), jit.deployment_income(*args))
+
+    topology = batch.topology
+    for owners in batch.owners[:5]:
+        args = (owners, topology.adjacency_indptr, topology.adjacency_indices)
+        assert np.array_equal(
+            python.enemy_neighbor_counts(*args), jit.enemy_neighbor_counts(*args)
+        )
+
+
+@needs_numba
+def test_batched_game_backends_match():
+    runs = []
+    for backend in ("python", "numba"):
+        batch = BatchedGame(
+            "test_map_v0",
+            200,
+            3,
+            policies=["heuristic", "random", "random"],
+            seed=4,
+            backend=backend,
+        )
+        batch.run(max_turns=30)
+        runs.append((batch.winner, batch.troops, batch.owners))
+    for python, jit in zip(*runs):
+        assert np.array_equal(python, jit)
+
+
+@needs_numba
+def test_game_backends_match():
+    boards = []
+    for backend in ("python", "numba"):
+        # A tiny cap so blitzes go through the rolling kernel
+        game = Game(
+            "test_map_v0",
+            [Player_Random("p1"), Player_Random("p2")],
+            seed=7,
+            blitz_troops_cap=2,
+            backend=backend,
+        )
+        game.reset()
+        for _ in range(10):
+            for player in game.players:
+                if not player.is_dead:
+                    game.draft_phase(player)
+                    game.attack_phase(player)
+        boards.append(
+            (game.game_map.state.troops.tolist(), game.game_map.state.owners.tolist())
+        )
+    assert boards[0] == boards[1]
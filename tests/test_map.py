@@ -0,0 +1,59 @@
+import numpy as np
+
+from game.game import Game
+from game.player import Player_Random
+
+
+def load_test_map():
+    game = Game("test_map_v0", [Player_Random("p1"), Player_Random("p2")])
+    return game.game_map
+
+
+def test_lookups():
+    game_map = load_test_map()
+    for i, t in enumerate(game_map.territories):
+        assert game_map.get_territory_from_id(t.id_) is t
+        assert game_map.get_territory_from_name(t.name) is t
+    for c in game_map.continents:
+        assert game_map.get_continent_from_id(c.id_) is c
+
+
+def test_adjacency():
+    game_map = load_test_map()
+    num_territories = len(game_map.territories)
+    assert game_map.adjacency_matrix.shape == (num_territories, num_territories)
+    assert np.array_equal(game_map.adjacency_matrix, game_map.adjacency_matrix.T)
+
+    for t in game_map.territories:
+        expected = [
+            game_map.get_territory_from_name(name).id_
+            for name in t.adjacent_territories_names
+        ]
+        assert t.adjacent_ids == expected
+        assert game_map.get_neighbor_ids(t.id_).tolist() == expected
+        assert np.flatnonzero(game_map.adjacency_matrix[t.id_]).tolist() == sorted(
+            expected
+        )
+
+
+def test_topology_is_parsed_once():
+    game = Game("test_map_v0", [Player_Random("p1"), Player_Random("p2")])
+    other = Game("test_map_v0", [Player_Random("p3"), Player_Random("p4")])
+    assert game.game_map.topology is other.game_map.topology
+    assert game.game_map.territories[0] is not other.game_map.territories[0]
+    assert not game.game_map.adjacency_matrix.flags.writeable
+    # Neighbor lists are shared too, only the board state is per game
+    assert game.game_map.state._neighbors is other.game_map.state._neighbors
+    assert (
+        game.game_map.territories[0].adjacent_ids
+        is other.game_map.territories[0].adjacent_ids
+    )
+    assert game.game_map.state is not other.game_map.state
+
+    # Reset keeps the same map objects and clears the board
+    game.reset()
+    game_map = game.game_map
+    game.reset()
+    assert game.game_map is game_map
+    assert sum(t.troops for t in game_map.territories) == 2 * 40
+    assert all(t.occupying_player_name is not None for t in game_map.territories)
@@ -0,0 +1,30 @@
+import numpy as np
+
+from game.map import Map, MapTopology, get_map_paths, load_map_topology
+from game.map_compiler import compile_map
+
+
+def test_compiled_map_matches_json(tmp_path):
+    json_path, _ = get_map_paths("test_map_v0")
+    compiled_path = compile_map(json_path, str(tmp_path / "test_map_v0.npz"))
+
+    expected = load_map_topology("test_map_v0")
+    for mmap in (True, False):
+        topology = MapTopology.from_npz(compiled_path, mmap=mmap)
+        assert topology.name == expected.name
+        assert topology.max_players == expected.max_players
+        assert topology.repr == expected.repr
+        for key in MapTopology.ARRAYS:
+            assert np.array_equal(getattr(topology, key), getattr(expected, key))
+        assert np.array_equal(topology.adjacency_matrix, expected.adjacency_matrix)
+        assert topology.adjacent_territories_names == (
+            expected.adjacent_territories_names
+        )
+
+    topology = MapTopology.from_npz(compiled_path)
+    assert isinstance(topology.adjacency_indices, np.memmap)
+    assert not topology.adjacency_indices.flags.writeable
+
+    game_map = Map.from_topology(topology)
+    assert [t.name for t in game_map.territories] == list(expected.territory_names)
+    assert [len(c.territories) for c in game_map.continents] == [1, 3]
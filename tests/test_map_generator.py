@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from game.game import Game
+from game.map import MapTopology
+from game.map_generator import generate_map, validate_map
+from game.player import Player_Random
+
+
+@pytest.mark.parametrize("num_territories", [10, 100, 2000])
+@pytest.mark.parametrize("degree_distribution", ["poisson", "uniform", "fixed"])
+def test_generated_maps_are_valid(num_territories, degree_distribution):
+    map_metadata = generate_map(
+        num_territories, degree_distribution=degree_distribution, seed=0
+    )
+    validate_map(map_metadata)
+    assert len(map_metadata["territories"]) == num_territories
+
+    topology = MapTopology.from_metadata(map_metadata)
+    assert np.array_equal(topology.adjacency_matrix, topology.adjacency_matrix.T)
+    assert not topology.adjacency_matrix.diagonal().any()
+    assert np.all(topology.continent_masks.sum(axis=0) == 1)
+
+
+def test_generation_is_reproducible():
+    assert generate_map(50, 5, seed=1) == generate_map(50, 5, seed=1)
+    assert generate_map(50, 5, seed=1) != generate_map(50, 5, seed=2)
+
+
+def test_validate_map_rejects_disconnected_maps():
+    map_metadata = generate_map(10, 2, seed=0)
+    for t_data in map_metadata["territories"].values():
+        t_data["adjacent_territories_names"] = []
+    with pytest.raises(ValueError):
+        validate_map(map_metadata)
+
+
+def test_play_on_generated_map(generated_map):
+    path = generated_map(60, 6, seed=3)
+
+    game = Game(path, [Player_Random(f"p{i}") for i in range(4)], seed=0)
+    game.reset()
+    assert len(game.game_map.territories) == 60
+    for _ in range(3):
+        for player in game.get_remaining_players():
+            game.draft_phase(player)
+            game.attack_phase(player)
@@ -0,0 +1,75 @@
+import pytest
+
+from game.odds import OddsOracle, expected_losses, win_probability
+
+
+def test_single_roll_odds():
+    # 1 vs 1: attacker wins when strictly higher, 10 cases out of 25 with 5 faces
+    assert win_probability(2, 1, blitz=False) == pytest.approx(10 / 25)
+    attack_loss, defender_loss = expected_losses(2, 1, blitz=False)
+    assert attack_loss == pytest.approx(15 / 25)
+    assert defender_loss == pytest.approx(10 / 25)
+
+    # Not enough troops to roll any dice
+    assert win_probability(1, 3, blitz=False) == 0.0
+
+
+def test_blitz_odds():
+    oracle = OddsOracle()
+    odds = oracle.distribution(10, 5)
+    assert odds.probabilities.sum() == pytest.approx(1.0)
+    assert 0 < odds.win_probability < 1
+    # More attackers, better odds
+    assert oracle.win_probability(20, 5) > oracle.win_probability(10, 5)
+
+    attack_loss, defender_loss = oracle.expected_losses(10, 5)
+    assert 0 < attack_loss <= 9
+    assert 0 < defender_loss <= 5
+
+    # 3 vs 1 by hand: 2 dices win 0.56, else 1 dice vs 1 wins 0.4
+    # (3, 0): 0.56, (2, 0): 0.44 * 0.4 = 0.176, (1, 1): 0.44 * 0.6 = 0.264
+    assert oracle.win_probability(3, 1) == pytest.approx(0.736)
+    attack_loss, defender_loss = oracle.expected_losses(3, 1)
+    assert attack_loss == pytest.approx(0.176 + 2 * 0.264)
+    assert defender_loss == pytest.approx(0.736)
+
+
+def test_cached_odds_are_read_only(tmp_path):
+    oracle = OddsOracle()
+    for blitz in (True, False):
+        odds = oracle.distribution(4, 2, blitz)
+        for array in odds:
+            with pytest.raises(ValueError):
+                array[0] = 0
+
+    path = tmp_path / "odds.npz"
+    oracle.save(path)
+    prewarmed = OddsOracle(prewarm_path=path)
+    with pytest.raises(ValueError):
+        prewarmed.distribution(4, 2).probabilities[0] = 0
+
+
+def test_lru_cache_is_bounded():
+    oracle = OddsOracle(maxsize=2)
+    oracle.distribution(3, 1)
+    oracle.distribution(4, 1)
+    oracle.distribution(3, 1)
+    oracle.distribution(5, 1)
+    assert len(oracle) == 2
+    assert (4, 1, True, 3) not in oracle._cache
+    assert (3, 1, True, 3) in oracle._cache
+
+
+def test_prewarm_from_file(tmp_path):
+    oracle = OddsOracle()
+    oracle.build(5)
+    path = tmp_path / "odds.npz"
+    oracle.save(path)
+
+    prewarmed = OddsOracle(prewarm_path=path)
+    assert len(prewarmed) == len(oracle)
+    for a, d in [(2, 1), (5, 5), (3, 4)]:
+        for blitz in (True, False):
+            assert prewarmed.win_probability(a, d, blitz) == pytest.approx(
+                oracle.win_probability(a, d, blitz)
+            )
@@ -0,0 +1,62 @@
+from game.game import Game
+from game.player import Player_Random
+
+
+def check_continents(game):
+    for player in game.players:
+        mask = 0
+        reward = 0
+        for continent in game.game_map.continents:
+            owned = sum(
+                t.occupying_player_name == player.name for t in continent.territories
+            )
+            assert player.continent_territory_counts.get(continent.id_, 0) == owned
+            if owned == len(continent.territories):
+                mask |= 1 << continent.id_
+                reward += continent.troops_rewards
+            assert continent.is_controlled_by(player) == (
+                owned == len(continent.territories)
+            )
+        assert player.controlled_continents_mask == mask
+        assert player.continents_troops_reward == reward
+
+
+def test_continent_ownership_is_tracked(generated_map):
+    path = generated_map(30, 8, mean_degree=3, seed=1)
+    game = Game(path, [Player_Random("p1"), Player_Random("p2")], seed=0)
+
+    for seed in range(3):
+        game.reset(seed=seed)
+        check_continents(game)
+        for _ in range(10):
+            for player in game.get_remaining_players():
+                game.draft_phase(player)
+                game.attack_phase(player)
+                check_continents(game)
+
+
+def test_territory_ownership_index(generated_map):
+    path = generated_map(40, 6, seed=2)
+    game = Game(path, [Player_Random("p1"), Player_Random("p2")], seed=3)
+    game.reset()
+
+    for _ in range(10):
+        for player in game.get_remaining_players():
+            if player.is_dead:
+                continue
+            game.draft_phase(player)
+            game.attack_phase(player)
+        for player in game.players:
+            owned = {
+                t.id_
+                for t in game.game_map.territories
+                if t.occupying_player_name == player.name
+            }
+            assert {t.id_ for t in player.controlled_territories} == owned
+            assert player.territory_count == len(owned)
+            assert all(player.owns(t_id) for t_id in owned)
+            assert not any(
+                player.owns(t.id_)
+                for t in game.game_map.territories
+                if t.id_ not in owned
+            )
@@ -0,0 +1,53 @@
+import numpy as np
+
+from game.game import Game
+from game.player import Player_Random
+from game.rng import spawn_rngs, spawn_seeds
+
+
+def play_game(seed, dice_pool_size=0):
+    game = Game(
+        "test_map_v0",
+        [Player_Random("p1"), Player_Random("p2"), Player_Random("p3")],
+        seed=seed,
+        dice_pool_size=dice_pool_size,
+    )
+    game.reset()
+    game.play_turns()
+    return (
+        game.turn_number,
+        [p.name for p in game.players],
+        [(t.occupying_player_name, t.troops) for t in game.game_map.territories],
+    )
+
+
+def test_same_seed_same_game():
+    assert play_game(3) == play_game(3)
+    assert play_game(3, dice_pool_size=64) == play_game(3, dice_pool_size=64)
+    results = {str(play_game(seed)) for seed in range(10)}
+    assert len(results) > 1
+
+
+def test_games_are_independent_of_global_state():
+    np.random.seed(0)
+    first = play_game(5)
+    np.random.seed(1)
+    assert play_game(5) == first
+
+
+def test_reset_with_seed():
+    game = Game("test_map_v0", [Player_Random("p1"), Player_Random("p2")])
+    game.reset(seed=7)
+    first = [(t.occupying_player_name, t.troops) for t in game.game_map.territories]
+    game.reset(seed=7)
+    assert first == [
+        (t.occupying_player_name, t.troops) for t in game.game_map.territories
+    ]
+
+
+def test_spawn():
+    seeds = spawn_seeds(42, 4)
+    assert [play_game(s) for s in seeds] == [play_game(s) for s in spawn_seeds(42, 4)]
+
+    draws = [rng.integers(1 << 30, size=4).tolist() for rng in spawn_rngs(42, 4)]
+    assert len({str(d) for d in draws}) == 4
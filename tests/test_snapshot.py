@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from game.game import Game
+from game.player import Player_Random
+
+
+def play_turns(game, turns):
+    for _ in range(turns):
+        for player in game.players:
+            if player.is_dead or game.is_game_over():
+                continue
+            game.active_player = player
+            game.draft_phase(player)
+            game.attack_phase(player)
+        game.turn_number += 1
+
+
+def game_summary(game):
+    return (
+        game.game_map.state.troops.tolist(),
+        game.game_map.state.owners.tolist(),
+        [p.name for p in game.players],
+        [p.is_dead for p in game.players],
+        [[t.id_ for t in p.controlled_territories] for p in game.players],
+        [p.continents_troops_reward for p in game.players],
+        game.active_player.name,
+        game.turn_number,
+    )
+
+
+@pytest.mark.parametrize("dice_pool_size", [0, 64])
+def test_restore_replays_the_same_game(generated_map, dice_pool_size):
+    path = generated_map(50, 6, seed=3)
+    players = [Player_Random(f"p{i}") for i in range(3)]
+    game = Game(path, players, seed=5, dice_pool_size=dice_pool_size)
+    game.reset()
+    play_turns(game, 2)
+
+    snap = game.snapshot()
+    root = game_summary(game)
+    play_turns(game, 3)
+    expected = game_summary(game)
+
+    for _ in range(2):
+        game.restore(snap)
+        assert game_summary(game) == root
+        state = game.game_map.state
+        for p in game.players:
+            assert state.frontier(p.id_) == set(
+                np.flatnonzero(state.attack_sources(p.id_)).tolist()
+            )
+        play_turns(game, 3)
+        assert game_summary(game) == expected
@@ -0,0 +1,157 @@
+import numpy as np
+
+from game.game import Game
+from game.player import Player_Random
+from game.state import NO_OWNER
+from game.territory import Territory
+
+
+def test_standalone_territory():
+    t = Territory("t1", 0, ["t2"])
+    assert t.troops == 0
+    assert t.occupying_player_name is None
+    t.set_troops(3)
+    t.occupying_player_name = "p1"
+    assert t.add_troops(2) == 5
+    assert t.occupying_player_name == "p1"
+
+
+def test_territories_are_views_over_the_state():
+    game = Game("test_map_v0", [Player_Random("p1"), Player_Random("p2")], seed=0)
+    game.reset()
+    state = game.game_map.state
+    for t in game.game_map.territories:
+        assert state.troops[t.id_] == t.troops
+        assert (
+            state.owners[t.id_] == game.get_player_by_name(t.occupying_player_name).id_
+        )
+
+    # Bound straight to the shared state, without a standalone one first
+    assert all(t._state is state for t in game.game_map.territories)
+
+    t = game.game_map.territories[0]
+    t.add_troops(10)
+    assert state.troops[t.id_] == t.troops
+
+    game.reset()
+    assert state.troops.sum() == 80
+    game.game_map.reset()
+    assert np.all(state.owners == NO_OWNER)
+    assert all(t.occupying_player_name is None for t in game.game_map.territories)
+
+
+def test_attack_sources(generated_map):
+    path = generated_map(40, 5, seed=2)
+    players = [Player_Random(f"p{i}") for i in range(3)]
+    game = Game(path, players, seed=0)
+    game.reset()
+    state = game.game_map.state
+
+    for _ in range(5):
+        for player in game.get_remaining_players():
+            game.draft_phase(player)
+            expected = [
+                t.id_
+                for t in player.controlled_territories
+                if t.troops > 1
+                and any(
+                    game.game_map.get_territory_from_name(n).occupying_player_name
+                    != player.name
+                    for n in t.adjacent_territories_names
+                )
+            ]
+            assert np.flatnonzero(state.attack_sources(player.id_)).tolist() == sorted(
+                expected
+            )
+            assert game.has_valid_attack(player) == (len(expected) > 0)
+            assert [t.id_ for t in player.get_attack_frontier()] == sorted(expected)
+            assert player.get_total_troops() == sum(
+                t.troops for t in player.controlled_territories
+            )
+            game.attack_phase(player)
+
+
+def test_frontier_is_maintained(generated_map):
+    path = generated_map(60, 6, mean_degree=3, seed=4)
+    players = [Player_Random(f"p{i}") for i in range(4)]
+    game = Game(path, players, seed=1)
+    state = game.game_map.state
+
+    for seed in range(3):
+        game.reset(seed=seed)
+        for _ in range(8):
+            for player in game.players:
+                if player.is_dead:
+                    continue
+                game.draft_phase(player)
+                game.attack_phase(player)
+                for p in game.players:
+                    assert state.frontier(p.id_) == set(
+                        np.flatnonzero(state.attack_sources(p.id_)).tolist()
+                    )
+
+    # Direct writes need a rebuild
+    state.troops[:] = 2
+    state.rebuild_frontier()
+    for p in game.players:
+        assert state.frontier(p.id_) == set(
+            np.flatnonzero(state.attack_sources(p.id_)).tolist()
+        )
+
+
+def bfs_components(game, player):
+    components = {}
+    for t in player.controlled_territories:
+        if t.id_ in components:
+            continue
+        seen = {t.id_}
+        stack = [t.id_]
+        while stack:
+            for n in game.game_map.get_territory_from_id(stack.pop()).adjacent_ids:
+                if n not in seen and player.owns(n):
+                    seen.add(n)
+                    stack.append(n)
+        for t_id in seen:
+            components[t_id] = seen
+    return components
+
+
+def test_components_are_maintained(generated_map):
+    path = generated_map(60, 6, mean_degree=3, seed=5)
+    players = [Player_Random(f"p{i}") for i in range(4)]
+    game = Game(path, players, seed=1)
+    state = game.game_map.state
+
+    for seed in range(3):
+        game.reset(seed=seed)
+        snap = game.snapshot()
+        for turn in range(10):
+            player = game.active_player
+            game.draft_phase(player)
+            game.attack_phase(player)
+            for p in game.remaining_players:
+                expected = bfs_components(game, p)
+                assert [t.id_ for t in p.get_fortify_sources()] == sorted(
+                    t.id_
+                    for t in p.controlled_territories
+                    if t.troops > 1 and len(expected[t.id_]) > 1
+                )
+                for t in p.controlled_territories:
+                    assert state.component(t.id_) == expected[t.id_]
+                sources = [
+                    t for t in p.controlled_territories if len(expected[t.id_]) > 1
+                ]
+                if sources:
+                    source = sources[0]
+                    assert [t.id_ for t in p.get_fortify_targets(source)] == sorted(
+                        expected[source.id_] - {source.id_}
+                    )
+                    for t in game.game_map.territories:
+                        assert state.connected(source.id_, t.id_) == (
+                            t.id_ in expected[source.id_]
+                        )
+            if game.is_game_over():
+                break
+            game.fortify_phase(player)
+            if turn == 5:
+                game.restore(snap)
@@ -0,0 +1,201 @@
+import functools
+import os
+import signal
+import time
+
+import numpy as np
+import pytest
+
+from game.custom_risk_env_v0 import RiskEnv_Choice_is_attack_territory
+from game.game import Game
+from game.player import Player_Random, Player_RL
+from game.subproc_env import SubprocRiskVectorEnv, make_risk_env
+
+
+def random_actions(rng, mask):
+    keys = rng.random(mask.shape)
+    keys[~mask] = -1.0
+    return keys.argmax(axis=1)
+
+
+def env_fns(n, **kwargs):
+    return [functools.partial(make_risk_env, "test_map_v0", **kwargs)] * n
+
+
+class CrashingEnv:
+    """
+    Env whose step raises once in a while, or hangs with hang=True
+    """
+
+    def __init__(self, every, hang=False):
+        self.env = make_risk_env("test_map_v0")
+        self.every = every
+        self.hang = hang
+        self.steps = 0
+        self.observation_space = self.env.observation_space
+        self.action_space = self.env.action_space
+        self.unwrapped = self.env.unwrapped
+
+    def reset(self, seed=None):
+        return self.env.reset(seed=seed)
+
+    def step(self, action):
+        self.steps += 1
+        if self.steps % self.every == 0:
+            if self.hang:
+                time.sleep(60)
+            raise RuntimeError("boom")
+        return self.env.step(action)
+
+    def close(self):
+        self.env.close()
+
+
+def test_matches_the_env():
+    n = 6
+    envs = SubprocRiskVectorEnv(env_fns(n), envs_per_worker=4)
+    references = [make_risk_env("test_map_v0") for _ in range(n)]
+    assert envs.single_observation_space == references[0].observation_space
+    assert envs.observation_space.shape == (n,) + references[0].observation_space.shape
+
+    obs, info = envs.reset(seed=0)
+    for i, env in enumerate(references):
+        ref_obs, _ = env.reset(seed=i)
+        assert np.array_equal(obs[i], ref_obs)
+        assert np.array_equal(
+            np.flatnonzero(info["action_mask"][i]),
+            sorted(env.unwrapped.get_masked_action_space()),
+        )
+
+    rng = np.random.default_rng(0)
+    for _ in range(20):
+        actions = random_actions(rng, info["action_mask"])
+        obs, rewards, terminated, truncated, info = envs.step(actions)
+        for i, env in enumerate(references):
+            ref_obs, reward, ref_terminated, ref_truncated, _ = env.step(actions[i])
+            assert rewards[i] == reward
+            assert terminated[i] == ref_terminated
+            assert truncated[i] == ref_truncated
+            if ref_terminated or ref_truncated:
+                assert np.array_equal(info["final_obs"][i], ref_obs)
+                assert info["_final_obs"][i]
+                # Reset on their side, follow the worker's env from there
+                references[i] = None
+            else:
+                assert np.array_equal(obs[i], ref_obs)
+        if any(env is None for env in references):
+            break
+    envs.close()
+
+
+def test_steps_with_autoreset():
+    envs = SubprocRiskVectorEnv(env_fns(8, max_episode_steps=10), envs_per_worker=3)
+    rng = np.random.default_rng(1)
+    obs, info = envs.reset(seed=1)
+    finished = 0
+    for _ in range(40):
+        assert info["action_mask"].any(axis=1).all()
+        obs, rewards, terminated, truncated, info = envs.step(
+            random_actions(rng, info["action_mask"])
+        )
+        finished += (terminated | truncated).sum()
+    assert finished >= 8
+    envs.close()
+
+
+def test_restarts_crashed_workers():
+    fns = env_fns(2) + [functools.partial(CrashingEnv, 3)] * 2
+    envs = SubprocRiskVectorEnv(fns, envs_per_worker=2)
+    rng = np.random.default_rng(2)
+    obs, info = envs.reset(seed=0)
+    for step in range(1, 7):
+        obs, rewards, terminated, truncated, info = envs.step(
+            random_actions(rng, info["action_mask"])
+        )
+        if step % 3 == 0:
+            assert np.array_equal(info["restarted"], [False, False, True, True])
+            assert "boom" in info["errors"][0]
+            assert truncated[2:].all() and not terminated[2:].any()
+            # Lost with the worker
+            assert "_final_obs" not in info or not info["_final_obs"][2:].any()
+        else:
+            assert "restarted" not in info
+        assert info["action_mask"].any(axis=1).all()
+
+    # Killed worker
+    os.kill(envs._processes[0].pid, signal.SIGKILL)
+    envs._processes[0].join()
+    obs, rewards, terminated, truncated, info = envs.step(
+        random_actions(rng, info["action_mask"])
+    )
+    assert info["restarted"][:2].all()
+    envs.close()
+
+
+def test_invalid_actions_raise():
+    envs = SubprocRiskVectorEnv(env_fns(4), envs_per_worker=2)
+    obs, info = envs.reset(seed=0)
+    pids = [process.pid for process in envs._processes]
+    actions = random_actions(np.random.default_rng(0), info["action_mask"])
+
+    invalid = actions.copy()
+    invalid[1] = np.flatnonzero(~info["action_mask"][1])[0]
+    with pytest.raises(ValueError):
+        envs.step(invalid)
+    invalid[1] = envs.single_action_space.n
+    with pytest.raises(ValueError):
+        envs.step(invalid)
+
+    # Nothing was stepped nor restarted
+    obs, rewards, terminated, truncated, info = envs.step(actions)
+    assert "restarted" not in info
+    assert [process.pid for process in envs._processes] == pids
+
+    # Workers check their whole batch before stepping any env too
+    before = obs.copy()
+    envs._arrays["actions"][:] = random_actions(
+        np.random.default_rng(1), info["action_mask"]
+    )
+    envs._arrays["actions"][1] = np.flatnonzero(~info["action_mask"][1])[0]
+    errors, invalid = envs._run("step")
+    assert errors == [] and [w for w, _ in invalid] == [0]
+    assert np.array_equal(obs[:2], before[:2])
+    envs.close()
+
+
+def test_restarts_hanging_workers():
+    fns = env_fns(1) + [functools.partial(CrashingEnv, 2, hang=True)]
+    envs = SubprocRiskVectorEnv(fns, timeout=1.0)
+    rng = np.random.default_rng(3)
+    obs, info = envs.reset(seed=0)
+    for step in range(1, 3):
+        start = time.monotonic()
+        obs, rewards, terminated, truncated, info = envs.step(
+            random_actions(rng, info["action_mask"])
+        )
+        assert time.monotonic() - start < 10
+    assert np.array_equal(info["restarted"], [False, True])
+    assert "timed out" in info["errors"][0]
+    assert truncated[1]
+    envs.close()
+
+
+def test_raises_without_restarts():
+    fns = [functools.partial(CrashingEnv, 1)]
+    envs = SubprocRiskVectorEnv(fns, restart_workers=False)
+    obs, info = envs.reset(seed=0)
+    with pytest.raises(RuntimeError, match="boom"):
+        envs.step(random_actions(np.random.default_rng(0), info["action_mask"]))
+    envs.close()
+
+
+def make_dict_env():
+    agent = Player_RL("agent")
+    return RiskEnv_Choice_is_attack_territory(
+        Game("test_map_v0", [Player_Random("p1"), agent]), agent
+    )
+
+
+def test_needs_flat_observations():
+    with pytest.raises(ValueError):
+        SubprocRiskVectorEnv([make_dict_env])
@@ -0,0 +1,86 @@
+import numpy as np
+import pytest
+
+from game.custom_risk_env_v0 import (
+    LOSE_GAME_REWARD,
+    WIN_GAME_REWARD,
+    RiskEnv_Choice_is_attack_territory,
+)
+from game.game import Game
+from game.player import Player_Random, Player_RL
+from game.vector_env import RiskVectorEnv
+
+
+def random_actions(rng, mask):
+    keys = rng.random(mask.shape)
+    keys[~mask] = -1.0
+    return keys.argmax(axis=1)
+
+
+def test_observations_match_the_env():
+    envs = RiskVectorEnv("test_map_v0", 16, seed=0)
+    agent = Player_RL("agent")
+    env = RiskEnv_Choice_is_attack_territory(
+        Game("test_map_v0", [Player_Random("p1"), agent]), agent, flat_obs=True
+    )
+    assert envs.single_observation_space == env.observation_space
+    assert envs.observation_space.shape == (16,) + env.observation_space.shape
+
+    obs, info = envs.reset(seed=0)
+    batch = envs.batch
+    t, p = batch.num_territories, batch.num_players
+    owners = obs[:, : t * p].reshape(16, t, p).argmax(axis=2)
+    assert np.array_equal(owners, batch.owners)
+    assert np.array_equal(obs[:, -t - 1 : -1], batch.troops)
+    assert np.all(batch.active_players == envs.agent_id)
+    assert np.all(batch.owners[np.arange(16), envs.attacking] == envs.agent_id)
+
+    mask = info["action_mask"]
+    adjacency = batch.topology.adjacency_matrix
+    assert np.array_equal(
+        mask, adjacency[envs.attacking] & (batch.owners != envs.agent_id)
+    )
+    assert mask.any(axis=1).all()
+
+
+def test_episodes():
+    envs = RiskVectorEnv("test_map_v0", 32, num_players=3, seed=1)
+    obs, info = envs.reset()
+    rng = np.random.default_rng(0)
+    finished = 0
+    for _ in range(100):
+        actions = random_actions(rng, info["action_mask"])
+        obs, rewards, terminated, truncated, info = envs.step(actions)
+        assert obs.shape == envs.observation_space.shape
+        assert np.all(np.isin(rewards[terminated], [WIN_GAME_REWARD, LOSE_GAME_REWARD]))
+        if (terminated | truncated).any():
+            assert np.array_equal(info["_final_obs"], terminated | truncated)
+        finished += terminated.sum()
+        # Every game is running again, agent to play
+        assert not envs.batch.done.any()
+        assert info["action_mask"].any(axis=1).all()
+        assert np.all(envs.episode_steps <= envs.max_episode_steps)
+    assert finished > 0
+
+    # Attacking its own territory
+    with pytest.raises(ValueError):
+        envs.step(envs.attacking)
+
+
+def test_seeded_runs_are_reproducible():
+    def run(seed):
+        envs = RiskVectorEnv("test_map_v0", 32, seed=seed)
+        obs, info = envs.reset()
+        rng = np.random.default_rng(0)
+        total = 0.0
+        for _ in range(50):
+            obs, rewards, _, _, info = envs.step(
+                random_actions(rng, info["action_mask"])
+            )
+            total += rewards.sum()
+        return total, obs.copy()
+
+    first, obs = run(3)
+    second, same_obs = run(3)
+    assert first == second
+    assert np.array_equal(obs, same_obs)